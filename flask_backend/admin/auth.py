@@ -1,5 +1,6 @@
 from flask_login import UserMixin, LoginManager
 from flask import redirect, request, url_for
+from services.db_service import get_collection
 
 login_manager = LoginManager()
 
@@ -10,15 +11,13 @@ class User(UserMixin):
     def get_id(self):
         return self.username
 
-def init_login(app, mongo):
+def init_login(app):
     login_manager.init_app(app)
     login_manager.login_view = 'admin.login_view'
 
 @login_manager.user_loader
 def load_user(username):
-    from flask import current_app
-    mongo = current_app.mongo
-    user_data = mongo.db.users.find_one({"username": username})
+    user_data = get_collection("users").find_one({"username": username})
     if user_data:
         return User(user_data["username"])
     return None
\ No newline at end of file
@@ -1,11 +1,16 @@
 from flask_admin import expose, AdminIndexView, BaseView
 from flask_admin.contrib.pymongo import ModelView
 from flask_login import current_user, login_user, logout_user
-from flask import url_for, redirect, request, flash, render_template
+from flask import url_for, redirect, request, flash, render_template, jsonify
 from .forms import LoginForm
 from .auth import User
-from bson import ObjectId
-from datetime import datetime
+from services.db_service import get_collection
+from services.approval_service import parse_selection, set_images_status
+from services.upload_index_service import find_pending_uploads, get_pending_count
+import os
+
+# Pending images shown per page of an approval view
+ADMIN_PAGE_SIZE = int(os.getenv("ADMIN_PAGE_SIZE", 20))
 
 
 # 🔒 Secure model view requiring login
@@ -19,10 +24,6 @@ class SecureModelView(ModelView):
 
 # 🏠 Admin Dashboard with login/logout support
 class AdminIndexView(AdminIndexView):
-    def __init__(self, mongo, **kwargs):
-        super().__init__(**kwargs)
-        self.mongo = mongo
-
     @expose('/')
     def index(self):
         if not current_user.is_authenticated:
@@ -33,7 +34,7 @@ class AdminIndexView(AdminIndexView):
     def login_view(self):
         form = LoginForm()
         if request.method == 'POST' and form.validate():
-            user_data = self.mongo.db.users.find_one({"username": form.username.data})
+            user_data = get_collection("users").find_one({"username": form.username.data})
             if user_data and form.password.data == user_data.get("password"):
                 user = User(user_data["username"])
                 login_user(user)
@@ -49,63 +50,96 @@ class AdminIndexView(AdminIndexView):
 
 # ✅ Simple Inline Image Approval View
 class ApprovalAdminView(BaseView):
-    def __init__(self, mongo, collection_name, **kwargs):
+    def __init__(self, collection_name, **kwargs):
         super().__init__(**kwargs)
-        self.mongo = mongo
-        self.collection = mongo.db[collection_name]
+        self.collection_name = collection_name
+
+    def _index_url(self, cursor=None):
+        return url_for(f'{request.endpoint.split(".")[0]}.index', cursor=cursor or None)
 
     @expose('/')
     def index(self):
         if not current_user.is_authenticated:
             return redirect(url_for('admin.login_view'))
 
-        locations = list(self.collection.find({
-            "Images": {
-                "$elemMatch": {
-                    "approved_status": False,
-                    "image_approved_time": None
-                }
-            }
-        }))
-        return self.render('admin/approve_list.html', locations=locations)
-
-    @expose('/approve/<location_id>/<int:image_index>/', methods=['POST'])
-    def approve_image(self, location_id, image_index):
-        if not current_user.is_authenticated:
-            return redirect(url_for('admin.login_view'))
-
-        update_result = self.collection.update_one(
-            {"_id": ObjectId(location_id)},
-            {"$set": {
-                f"Images.{image_index}.approved_status": True,
-                f"Images.{image_index}.image_approved_time": datetime.utcnow().isoformat() + "Z"
-            }}
+        # One page of pending images from the uploads index, oldest first
+        cursor = request.args.get('cursor')
+        try:
+            uploads, next_cursor = find_pending_uploads(self.collection_name, ADMIN_PAGE_SIZE, cursor)
+        except ValueError:
+            flash("⚠️ Invalid page link, showing the first page", "danger")
+            return redirect(self._index_url())
+
+        return self.render(
+            'admin/approve_list.html',
+            uploads=uploads,
+            cursor=cursor,
+            next_cursor=next_cursor,
+            pending_count=get_pending_count(self.collection_name)
         )
 
-        if update_result.modified_count > 0:
-            flash("✅ Image approved successfully", "success")
-        else:
-            flash("⚠️ Failed to approve image", "danger")
-
-        return redirect(url_for(f'{request.endpoint.split(".")[0]}.index'))
-
-    @expose('/reject/<location_id>/<int:image_index>/', methods=['POST'])
-    def reject_image(self, location_id, image_index):
+    def _flash_summary(self, summary, approved):
+        verb = "approved" if approved else "rejected"
+        if summary["updated"]:
+            flash(f"{'✅' if approved else '❌'} {summary['updated']} image(s) {verb}", "success" if approved else "warning")
+        if summary["unchanged"]:
+            flash(f"ℹ️ {summary['unchanged']} image(s) were already {verb}", "info")
+        if summary["not_found"]:
+            flash(f"⚠️ {len(summary['not_found'])} image(s) could not be found", "danger")
+        if summary["conflicts"]:
+            flash(f"⚠️ {len(summary['conflicts'])} image(s) were changed by someone else meanwhile, please review them again", "danger")
+
+    def _moderate(self, pairs, approved):
+        summary = set_images_status(self.collection_name, pairs, approved)
+        self._flash_summary(summary, approved)
+        return redirect(self._index_url(request.form.get('cursor')))
+
+    @expose('/approve/<location_id>/<image_id>/', methods=['POST'])
+    def approve_image(self, location_id, image_id):
         if not current_user.is_authenticated:
             return redirect(url_for('admin.login_view'))
+        return self._moderate([(location_id, image_id)], True)
 
+    @expose('/reject/<location_id>/<image_id>/', methods=['POST'])
+    def reject_image(self, location_id, image_id):
+        if not current_user.is_authenticated:
+            return redirect(url_for('admin.login_view'))
         # Mark as not approved
-        update_result = self.collection.update_one(
-            {"_id": ObjectId(location_id)},
-            {"$set": {
-                f"Images.{image_index}.approved_status": False,
-                f"Images.{image_index}.image_approved_time": datetime.utcnow().isoformat() + "Z"
-            }}
-        )
-
-        if update_result.modified_count > 0:
-            flash("❌ Image rejected", "warning")
-        else:
-            flash("⚠️ Failed to reject image", "danger")
+        return self._moderate([(location_id, image_id)], False)
+
+    @expose('/bulk/', methods=['POST'])
+    def bulk_moderate(self):
+        """
+        Approves or rejects many images at once. Accepts the page's form
+        (action + selected "location_id:image_id" values) or JSON
+        {"action", "images": [{"location_id", "image_id"}]}, which gets the
+        summary back as JSON.
+        """
+        if not current_user.is_authenticated:
+            return redirect(url_for('admin.login_view'))
 
-        return redirect(url_for(f'{request.endpoint.split(".")[0]}.index'))
+        if request.is_json:
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict) or not isinstance(data.get('images'), list):
+                return jsonify({"error": "Expected an object with action and images"}), 400
+            action = data.get('action')
+            try:
+                pairs = parse_selection(
+                    f"{image.get('location_id')}:{image.get('image_id')}" for image in data['images']
+                )
+            except (ValueError, AttributeError) as e:
+                return jsonify({"error": str(e)}), 400
+            if action not in ('approve', 'reject'):
+                return jsonify({"error": "action must be approve or reject"}), 400
+            return jsonify(set_images_status(self.collection_name, pairs, action == 'approve'))
+
+        action = request.form.get('action')
+        try:
+            pairs = parse_selection(request.form.getlist('selected'))
+        except ValueError as e:
+            flash(f"⚠️ {e}", "danger")
+            return redirect(self._index_url(request.form.get('cursor')))
+        if action not in ('approve', 'reject') or not pairs:
+            flash("⚠️ Select at least one image and an action", "danger")
+            return redirect(self._index_url(request.form.get('cursor')))
+        return self._moderate(pairs, action == 'approve')
@@ -1,8 +1,9 @@
-from flask import Flask, redirect
+from flask import Flask, jsonify, redirect
 from flask_cors import CORS
-from flask_pymongo import PyMongo
 from flask_admin import Admin
 from dotenv import load_dotenv
+import threading
+import click
 import os
 from flask_login import LoginManager
 
@@ -12,6 +13,13 @@ from routes.location_routes import location_bp
 from routes.upload_routes import upload_bp
 from routes.events import events_bp
 from routes.vote_routes import vote_bp
+from services.vote_service import ensure_vote_indexes
+from services.leaderboard_service import ensure_leaderboard_indexes
+from services.upload_index_service import ensure_upload_indexes
+from services.report_service import ensure_report_indexes
+from services.moderation_queue import ensure_job_indexes, workers as moderation_workers
+from services.fake_aws import install_fake_clients
+from services.db_service import ping
 
 # Admin views and login
 from admin.views import ApprovalAdminView, AdminIndexView
@@ -19,7 +27,6 @@ from admin.auth import init_login
 
 # Load environment variables
 load_dotenv()
-MONGO_URI = os.getenv("MONGO_URI")
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -28,13 +35,34 @@ CORS(app)
 # Secret key for session management (should be set in .env)
 app.secret_key = os.getenv("SECRET_KEY")
 
-# MongoDB setup
-app.config["MONGO_URI"] = MONGO_URI
-mongo = PyMongo(app)
-app.mongo = mongo  # Exposed for use in login manager
+
+def ensure_indexes():
+    """Creates the indexes the vote, leaderboard, upload, job and report queries rely on."""
+    ensure_vote_indexes()
+    ensure_leaderboard_indexes()
+    ensure_upload_indexes()
+    ensure_job_indexes()
+    ensure_report_indexes()
+
+
+def _ensure_indexes_in_background():
+    try:
+        ensure_indexes()
+    except Exception as e:
+        print("Failed to ensure indexes:", e)
+
+
+# Index creation is started once per process on its first request, in the
+# background, instead of making every import wait on MongoDB
+_indexes_started = threading.Event()
+_indexes_lock = threading.Lock()
+
+# Offline development: S3 and Rekognition are served by in-memory fakes
+if os.getenv("USE_FAKE_AWS") == "1":
+    install_fake_clients()
 
 # Initialize login system
-init_login(app, mongo)
+init_login(app)
 
 # Register blueprints
 app.register_blueprint(location_bp)
@@ -43,24 +71,51 @@ app.register_blueprint(upload_bp)
 app.register_blueprint(events_bp)
 app.register_blueprint(vote_bp)
 
+# Background work runs in processes that serve requests, not in `flask <command>` runs
+@app.before_request
+def start_background_work():
+    moderation_workers.start()
+    if not _indexes_started.is_set():
+        with _indexes_lock:
+            if not _indexes_started.is_set():
+                _indexes_started.set()
+                threading.Thread(target=_ensure_indexes_in_background, name='ensure-indexes', daemon=True).start()
+
+
+@app.cli.command('ensure-indexes')
+def ensure_indexes_command():
+    """Creates the MongoDB indexes the API relies on, e.g. as a deploy step."""
+    ensure_indexes()
+    click.echo("Indexes are in place.")
+
 # Base route
 @app.route('/')
 def home():
     return "Welcome to MobilityMate API"
 
+# Liveness of the app and its MongoDB connection, for load balancers and uptime checks
+@app.route('/health')
+def health():
+    try:
+        return jsonify({"status": "ok", "mongo": {"ok": True, "latency_ms": ping()}}), 200
+    except Exception as e:
+        # Driver errors name hosts and replica set members; they stay in the logs
+        app.logger.error(f"Health check failed: {e}")
+        return jsonify({"status": "unavailable", "mongo": {"ok": False}}), 503
+
 # Admin redirect helper
 @app.route('/admin-redirect')
 def redirect_to_admin():
     return redirect('/admin')
 
 # Admin dashboard setup
-admin = Admin(app, name="MobilityMate Admin", template_mode="bootstrap4", index_view=AdminIndexView(mongo))
+admin = Admin(app, name="MobilityMate Admin", template_mode="bootstrap4", index_view=AdminIndexView())
 
 # Approval-only views for each collection
-admin.add_view(ApprovalAdminView(mongo, "toilets-victoria", name="Toilet Approvals", endpoint="toilet_approval"))
-admin.add_view(ApprovalAdminView(mongo, "trains-victoria", name="Train Approvals", endpoint="train_approval"))
-admin.add_view(ApprovalAdminView(mongo, "trams-victoria", name="Tram Approvals", endpoint="tram_approval"))
-admin.add_view(ApprovalAdminView(mongo, "medical-victoria", name="Hospital Approvals", endpoint="hospital_approval"))
+admin.add_view(ApprovalAdminView("toilets-victoria", name="Toilet Approvals", endpoint="toilet_approval"))
+admin.add_view(ApprovalAdminView("trains-victoria", name="Train Approvals", endpoint="train_approval"))
+admin.add_view(ApprovalAdminView("trams-victoria", name="Tram Approvals", endpoint="tram_approval"))
+admin.add_view(ApprovalAdminView("medical-victoria", name="Hospital Approvals", endpoint="hospital_approval"))
 
 # Run the app
 if __name__ == '__main__':
@@ -1,60 +1,249 @@
 # location_routes.py
-from flask import Blueprint, jsonify
+from flask import Blueprint, current_app, jsonify, request
 from services.db_service import get_collection
+from services.geo_service import GEO_FIELD, build_geo_filter, ensure_geo_index, parse_radius
+from services.location_index import find_nearest
+from services.cache_service import get_cached_response, get_version, make_cached_response, serialize_json
+from services.stream_service import iter_json_array
+from services.columnar_service import (
+    ENCODERS, FORMATS, build_columns, compact_projection, merge_encoded, parse_include
+)
+from services.sync_service import SEQ_FIELD, get_changes, remove_location
+from services.tile_service import get_tile, MAX_ZOOM
+from routes.upload_routes import COLLECTION_MAP
+from concurrent.futures import ThreadPoolExecutor
+from bson import ObjectId
 import logging
+import click
+import os
 
 # Create a Blueprint to group related endpoints
-location_bp = Blueprint('location_routes', __name__)
-
-# Reference your collection names:
-toilet_locations = get_collection("toilets-victoria")
-train_locations = get_collection("trains-victoria")
-tram_locations = get_collection("trams-victoria")
-medical_locations = get_collection("medical-victoria")
+location_bp = Blueprint('location_routes', __name__, cli_group='locations')
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@location_bp.route('/toilet-location-points', methods=['GET'])
-def get_toilet_location_points():
-    """Returns documents from 'toilets-victoria'."""
+# Shared by /locations to query the collections concurrently
+_location_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("LOCATION_FETCH_WORKERS", 4)),
+    thread_name_prefix="location-fetch"
+)
+
+# Internal geo and sync fields are never part of the response
+LOCATION_PROJECTION = {"_id": 0, GEO_FIELD: 0, SEQ_FIELD: 0}
+
+DEFAULT_LOCATION_TYPES = ['toilet', 'train', 'tram', 'healthcare']
+DEFAULT_NEAREST_K = 5
+MAX_NEAREST_K = 50
+
+
+def resolve_location_types(value, default=DEFAULT_LOCATION_TYPES):
+    """
+    Turns a comma separated ?types= value into an ordered {type: collection_name}
+    map using COLLECTION_MAP. Plural and singular names resolve to one entry.
+    Raises ValueError on unknown types.
+    """
+    requested = [t.strip().lower() for t in value.split(',') if t.strip()] if value else default
+    collections = {}
+    for type_name in requested:
+        collection_name = COLLECTION_MAP.get(type_name)
+        if not collection_name:
+            raise ValueError(f'Invalid accessibility type: {type_name}')
+        if collection_name not in collections.values():
+            collections[type_name] = collection_name
+    return collections
+
+
+def parse_location_query(args):
+    """
+    Validates the filters shared by every location endpoint:
+      - ?bbox= or ?lat=&lon=&radius_m= to limit the area
+      - ?since=<cursor> for the changes after that cursor (since=0 for a full sync)
+      - ?format=columnar|msgpack|binary for packed coordinate and dictionary
+        encoded type/name columns; ?include=id,images adds those columns
+    Raises ValueError on malformed parameters.
+    """
+    geo_filter = build_geo_filter(args)
+    since = args.get('since')
+    if since is not None:
+        since = int(since)
+        if since < 0:
+            raise ValueError('since must be a non-negative integer')
+    output_format = args.get('format', 'json').lower()
+    if output_format not in FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+    if output_format != 'json' and since is not None:
+        raise ValueError('since is only supported with format=json')
+    return {
+        'geo_filter': geo_filter,
+        'since': since,
+        'format': output_format,
+        'include': parse_include(args.get('include'))
+    }
+
+
+def build_location_body(collection, label, query):
+    """Serializes one collection's response body for a parsed location query."""
+    geo_filter = query['geo_filter']
+    if geo_filter:
+        ensure_geo_index(collection)
+    if query['since'] is not None:
+        changes = get_changes(collection, query['since'], geo_filter)
+        logger.info(f"Retrieved {len(changes['updated'])} changed {label} documents since {query['since']}.")
+        return serialize_json(changes)
+    if query['format'] != 'json':
+        include = query['include']
+        columns = build_columns(collection.find(geo_filter or {}, compact_projection(include)), include)
+        logger.info(f"Encoded {len(columns['lat'])} {label} documents as {query['format']}.")
+        return ENCODERS[query['format']](columns)
+    # Serialized batch by batch straight from the cursor, no intermediate list
+    body = b"".join(iter_json_array(collection.find(geo_filter or {}, LOCATION_PROJECTION)))
+    logger.info(f"Serialized {label} documents ({len(body)} bytes).")
+    return body
+
+
+def find_location_points(collection, label):
+    """
+    Returns documents from the given collection, filtered as described in
+    parse_location_query. Serialized responses are cached per collection
+    version and revalidated with ETags.
+    """
+    try:
+        query = parse_location_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     try:
-        docs = list(toilet_locations.find({}, {"_id": 0}))
-        logger.info(f"Retrieved {len(docs)} toilet documents.")
-        return jsonify(docs)
+        cache_key = tuple(sorted(request.args.items(multi=True)))
+        entry = get_cached_response(
+            collection.name,
+            cache_key,
+            lambda: build_location_body(collection, label, query),
+            FORMATS[query['format']]
+        )
+        return make_cached_response(entry)
     except Exception as e:
-        logger.error(f"Error fetching toilet locations: {e}")
+        logger.error(f"Error fetching {label} locations: {e}")
         return jsonify({"error": str(e)}), 500
 
+@location_bp.route('/toilet-location-points', methods=['GET'])
+def get_toilet_location_points():
+    """Returns documents from 'toilets-victoria'."""
+    return find_location_points(get_collection("toilets-victoria"), "toilet")
+
 @location_bp.route('/train-location-points', methods=['GET'])
 def get_train_location_points():
     """Returns documents from 'trains-victoria'."""
-    try:
-        docs = list(train_locations.find({}, {"_id": 0}))
-        logger.info(f"Retrieved {len(docs)} train documents.")
-        return jsonify(docs)
-    except Exception as e:
-        logger.error(f"Error fetching train locations: {e}")
-        return jsonify({"error": str(e)}), 500
+    return find_location_points(get_collection("trains-victoria"), "train")
 
 @location_bp.route('/tram-location-points', methods=['GET'])
 def get_tram_location_points():
     """Returns documents from 'trams-victoria'."""
-    try:
-        docs = list(tram_locations.find({}, {"_id": 0}))
-        logger.info(f"Retrieved {len(docs)} tram documents.")
-        return jsonify(docs)
-    except Exception as e:
-        logger.error(f"Error fetching tram locations: {e}")
-        return jsonify({"error": str(e)}), 500
+    return find_location_points(get_collection("trams-victoria"), "tram")
 
 @location_bp.route('/medical-location-points', methods=['GET'])
 def get_medical_location_points():
     """Returns documents from 'medical-victoria'."""
+    return find_location_points(get_collection("medical-victoria"), "medical")
+
+@location_bp.route('/locations', methods=['GET'])
+def get_locations():
+    """
+    Returns several location types in one response, keyed by type, e.g.
+    ?types=toilet,train. Accepts the same filters as the single-type
+    endpoints; the collections are fetched concurrently. Each type has its
+    own sync cursor, so ?since= is only accepted with a single type.
+    """
+    try:
+        collections = resolve_location_types(request.args.get('types'))
+        query = parse_location_query(request.args)
+        if query['since'] is not None and len(collections) > 1:
+            raise ValueError('since needs a single type; each type has its own cursor')
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    app = current_app._get_current_object()
+
+    def fetch(item):
+        type_label, collection_name = item
+        with app.app_context():
+            body = build_location_body(get_collection(collection_name), type_label, query)
+        return type_label, body
+
+    def build_body():
+        parts = list(_location_executor.map(fetch, collections.items()))
+        return merge_encoded(parts, query['format'])
+
     try:
-        docs = list(medical_locations.find({}, {"_id": 0}))
-        logger.info(f"Retrieved {len(docs)} medical documents.")
-        return jsonify(docs)
+        cache_key = tuple(sorted(request.args.items(multi=True)))
+        version = tuple(get_version(name) for name in collections.values())
+        entry = get_cached_response(
+            'locations',
+            cache_key,
+            build_body,
+            FORMATS[query['format']],
+            version=version
+        )
+        return make_cached_response(entry)
     except Exception as e:
-        logger.error(f"Error fetching tram locations: {e}")
+        logger.error(f"Error fetching combined locations: {e}")
         return jsonify({"error": str(e)}), 500
+
+@location_bp.route('/nearest', methods=['GET'])
+def get_nearest_locations():
+    """Returns the k closest facilities of the requested types to ?lat=&lon=."""
+    try:
+        if not request.args.get('lat') or not request.args.get('lon'):
+            raise ValueError('lat and lon are required')
+        lat, lon, _ = parse_radius(request.args['lat'], request.args['lon'], 1)
+        k = int(request.args.get('k', DEFAULT_NEAREST_K))
+        if not 1 <= k <= MAX_NEAREST_K:
+            raise ValueError(f'k must be between 1 and {MAX_NEAREST_K}')
+        collections = resolve_location_types(request.args.get('types'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        results = find_nearest(lat, lon, collections, k)
+        return jsonify(results)
+    except Exception as e:
+        logger.error(f"Error finding nearest locations: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@location_bp.route('/tiles/<location_type>/<int:z>/<int:x>/<int:y>', methods=['GET'])
+def get_location_tile(location_type, z, x, y):
+    """Returns clustered counts (low zoom) or individual points (high zoom) for one map tile."""
+    try:
+        collections = resolve_location_types(location_type)
+        if len(collections) != 1:
+            raise ValueError('Exactly one location type is required')
+        if not 0 <= z <= MAX_ZOOM:
+            raise ValueError(f'z must be between 0 and {MAX_ZOOM}')
+        if not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            raise ValueError('x and y are out of range for this zoom level')
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        collection_name = next(iter(collections.values()))
+        return jsonify(get_tile(collection_name, z, x, y))
+    except Exception as e:
+        logger.error(f"Error building tile {location_type}/{z}/{x}/{y}: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@location_bp.cli.command('remove')
+@click.argument('location_type')
+@click.argument('location_id')
+def remove_location_command(location_type, location_id):
+    """Deletes a location and records a tombstone for delta sync clients."""
+    try:
+        collections = resolve_location_types(location_type)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='LOCATION_TYPE')
+    if not ObjectId.is_valid(location_id):
+        raise click.BadParameter(f'{location_id} is not a valid location id', param_hint='LOCATION_ID')
+    collection_name = next(iter(collections.values()))
+    if remove_location(collection_name, location_id):
+        click.echo(f"Removed {location_id} from {collection_name}.")
+    else:
+        click.echo(f"No location {location_id} in {collection_name}.")
@@ -1,22 +1,78 @@
 from flask import Blueprint, request, jsonify
-from services.db_service import get_collection
-import datetime
+from services.report_service import (
+    BufferFull, DEFAULT_HOTSPOT_HOURS, DEFAULT_REPORT_LIMIT, MAX_REPORT_LIMIT, REPORT_FLUSH_SECONDS,
+    find_hotspots, find_reports, parse_report_query, rebuild_hotspots, submit_report
+)
+import click
+import math
 
-report_bp = Blueprint('report_routes', __name__)
-
-# Get reference to the new MongoDB collection
-reports_collection = get_collection("reports-victoria")
+report_bp = Blueprint('report_routes', __name__, cli_group='reports')
 
 @report_bp.route('/report-issue', methods=['POST'])
 def report_issue():
     try:
         data = request.get_json()
+        if not isinstance(data, dict):
+            return jsonify({"error": "Report must be a JSON object"}), 400
+
+        # Acknowledged once buffered; written to reports-victoria in batches
+        try:
+            report_id = submit_report(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        return jsonify({"message": "Report submitted successfully!", "report_id": report_id}), 201
+    except BufferFull:
+        response = jsonify({"error": "Too many reports right now, please try again shortly."})
+        response.headers['Retry-After'] = str(math.ceil(REPORT_FLUSH_SECONDS))
+        return response, 429
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        # Add a timestamp automatically
-        data['timestamp'] = datetime.datetime.utcnow()
 
-        reports_collection.insert_one(data)
 
-        return jsonify({"message": "Report submitted successfully!"}), 201
+def _parse_limit(args):
+    limit = args.get('limit', DEFAULT_REPORT_LIMIT, type=int)
+    if not 0 < limit <= MAX_REPORT_LIMIT:
+        raise ValueError(f'limit must be between 1 and {MAX_REPORT_LIMIT}')
+    return limit
+
+
+@report_bp.route('/reports', methods=['GET'])
+def get_reports():
+    """Most recent reports, optionally filtered by ?bbox=, ?since=, ?until= and ?issue_type=."""
+    try:
+        try:
+            query = parse_report_query(request.args)
+            limit = _parse_limit(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        reports = find_reports(query, limit)
+        return jsonify({"reports": reports, "count": len(reports)})
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+
+@report_bp.route('/reports/hotspots', methods=['GET'])
+def get_report_hotspots():
+    """Report counts per grid cell, by default over the last 24 hours."""
+    try:
+        try:
+            query = parse_report_query(request.args, default_hours=DEFAULT_HOTSPOT_HOURS)
+            limit = _parse_limit(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify({
+            "since": query["since"].isoformat() + "Z",
+            "until": query["until"].isoformat() + "Z" if query["until"] else None,
+            "hotspots": find_hotspots(query, limit)
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@report_bp.cli.command('rebuild-hotspots')
+def rebuild_hotspots_command():
+    """Recomputes the report hotspot counts from reports-victoria."""
+    cells = rebuild_hotspots()
+    click.echo(f"Rebuilt {cells} hotspot cells.")
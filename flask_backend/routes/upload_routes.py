@@ -1,29 +1,28 @@
 from flask import Blueprint, request, jsonify
-import boto3
 import os
-from datetime import datetime
 from services.db_service import get_collection
-from services.rekognition_service import moderate_image_s3
+from services.moderation_service import (
+    COLLECTION_MAP, ModerationError, find_upload_location, normalize_location_types, validate_upload
+)
+from services.moderation_queue import POLL_SECONDS, enqueue, get_job, job_view, process_available_jobs, workers
+from services.upload_index_service import backfill_image_ids, backfill_uploads
+from services.upload_url_service import (
+    MAX_UPLOAD_FILES, UPLOAD_METHODS, UPLOAD_URL_EXPIRES_SECONDS,
+    parse_upload_files, s3_settings, sign_upload, upload_key
+)
+from services import moderation_cache
+import click
+import time
 
 upload_bp = Blueprint('upload', __name__)
 
-# Map of accessibility types to collection names
-COLLECTION_MAP = {
-    'healthcare': 'medical-victoria',
-    'toilet': 'toilets-victoria',
-    'toilets': 'toilets-victoria',
-    'train': 'trains-victoria',
-    'trains': 'trains-victoria',
-    'tram': 'trams-victoria',
-    'trams': 'trams-victoria'
-}
-
 @upload_bp.route('/generate-upload-url', methods=['POST'])
 def generate_upload_url():
     try:
         # 1. Parse request
         data = request.get_json()
         filename = data.get('filename')
+        location_id = data.get('location_id')
         latitude = data.get('latitude')
         longitude = data.get('longitude')
         accessibility_type = data.get('accessibility_type')
@@ -31,8 +30,8 @@ def generate_upload_url():
         device_id = data.get('device_id')
         username = data.get('username')
 
-        if not all([filename, latitude, longitude, accessibility_type]):
-            return jsonify({'error': 'Filename, latitude, longitude, and accessibility_type are required'}), 400
+        if not all([filename, accessibility_type]) or not (location_id or (latitude and longitude)):
+            return jsonify({'error': 'Filename, accessibility_type, and either location_id or latitude and longitude are required'}), 400
 
         # 2. Get collection
         collection_name = COLLECTION_MAP.get(accessibility_type.lower())
@@ -41,141 +40,167 @@ def generate_upload_url():
         collection = get_collection(collection_name)
 
         # 3. Validate location
-        possible_types = [accessibility_type]
-        if accessibility_type.endswith('s'):
-            possible_types.append(accessibility_type[:-1])
-        else:
-            possible_types.append(accessibility_type + 's')
-
-        location = collection.find_one({
-            'Location_Lat': float(latitude),
-            'Location_Lon': float(longitude),
-            'Accessibility_Type_Name': {'$in': possible_types}
-        })
+        try:
+            location = find_upload_location(collection, location_id, latitude, longitude)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
         if not location:
             return jsonify({'error': 'No matching location found'}), 404
 
         # 4. Setup S3
-        aws_key = os.environ.get('AWS_ACCESS_KEY_ID')
-        aws_secret = os.environ.get('AWS_SECRET_ACCESS_KEY')
-        region = os.environ.get('S3_REGION')
-        if not all([aws_key, aws_secret, region]):
-            raise EnvironmentError("Missing AWS credentials or region in environment variables.")
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=aws_key,
-            aws_secret_access_key=aws_secret,
-            region_name=region
-        )
-        bucket_name = os.environ.get('S3_BUCKET_NAME')
+        s3_client, bucket_name, region = s3_settings()
 
         # 5. Generate key + presigned URL
-        timestamp = datetime.utcnow().strftime('%Y%m%d%H%M%S')
-        key = f"uploads/{timestamp}_{filename}"
-        presigned_url = s3_client.generate_presigned_url(
-            'put_object',
-            Params={
-                'Bucket': bucket_name,
-                'Key': key,
-                'ContentType': content_type,
-            },
-            ExpiresIn=3600
-        )
-        public_url = f"https://{bucket_name}.s3.{region}.amazonaws.com/{key}"
-
-        # 6.2 Add image object to Images array (only if clean) - move this logic to moderation endpoint if needed
-
-        # 7. Return upload + public URL + s3_key to frontend
+        upload = sign_upload(s3_client, bucket_name, region, upload_key(filename), content_type)
+
+        # 6. Return upload + public URL + s3_key to frontend
         return jsonify({
-            "upload_url": presigned_url,
-            "public_url": public_url,
-            "s3_key": key
+            "upload_url": upload["upload_url"],
+            "public_url": upload["public_url"],
+            "s3_key": upload["s3_key"],
+            "location_id": str(location['_id'])
         })
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# New endpoint for post-upload moderation
-@upload_bp.route('/moderate-uploaded-image', methods=['POST'])
-def moderate_uploaded_image():
+@upload_bp.route('/generate-upload-urls', methods=['POST'])
+def generate_upload_urls():
+    """
+    Signs uploads for several photos of one location in a single call. Send
+    "method": "post" to get presigned POST forms that cap size and content type.
+    """
     try:
-        data = request.get_json()
-        bucket_name = data.get('bucket_name') or os.environ.get('S3_BUCKET_NAME')
-        s3_key = data.get('s3_key')
-        device_id = data.get('device_id')
-        username = data.get('username')
+        # 1. Parse request
+        data = request.get_json() or {}
+        location_id = data.get('location_id')
         latitude = data.get('latitude')
         longitude = data.get('longitude')
         accessibility_type = data.get('accessibility_type')
-        public_url = data.get('public_url')
-        if not bucket_name or not s3_key:
-            return jsonify({'error': 'bucket_name and s3_key are required'}), 400
-
-        # 1. Confirm object exists
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
-            aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY'),
-            region_name=os.environ.get('S3_REGION')
-        )
-        try:
-            s3_client.head_object(Bucket=bucket_name, Key=s3_key)
-        except Exception as e:
-            return jsonify({'error': f'File not found in S3: {e}'}), 404
+        method = data.get('method', 'put')
 
-        # 2. Moderate image
+        if not accessibility_type or not (location_id or (latitude and longitude)):
+            return jsonify({'error': 'accessibility_type and either location_id or latitude and longitude are required'}), 400
+        if method not in UPLOAD_METHODS:
+            return jsonify({'error': f"method must be one of: {', '.join(sorted(UPLOAD_METHODS))}"}), 400
         try:
-            is_clean = moderate_image_s3(bucket_name, s3_key)
-        except Exception as e:
-            return jsonify({'error': f'Error in Rekognition: {e}'}), 500
-
-        if not is_clean:
-            # Optionally, delete the image from S3 if not clean
-            s3_client.delete_object(Bucket=bucket_name, Key=s3_key)
-            return jsonify({'error': 'Image failed moderation and was deleted.'}), 400
-
-        # 3. Add image object to Images array (only if clean)
-        if not all([latitude, longitude, accessibility_type]):
-            return jsonify({'error': 'latitude, longitude, and accessibility_type are required to update Images array'}), 400
+            files = parse_upload_files(data.get('files'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
+        # 2. Validate location once for the whole batch
         collection_name = COLLECTION_MAP.get(accessibility_type.lower())
         if not collection_name:
             return jsonify({'error': f'Invalid accessibility type: {accessibility_type}'}), 400
-        collection = get_collection(collection_name)
+        try:
+            location = find_upload_location(get_collection(collection_name), location_id, latitude, longitude)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if not location:
+            return jsonify({'error': 'No matching location found'}), 404
 
-        possible_types = [accessibility_type]
-        if accessibility_type.endswith('s'):
-            possible_types.append(accessibility_type[:-1])
-        else:
-            possible_types.append(accessibility_type + 's')
+        # 3. Sign every upload locally
+        s3_client, bucket_name, region = s3_settings()
+        uploads = []
+        for file in files:
+            upload = sign_upload(
+                s3_client, bucket_name, region,
+                upload_key(file['filename'], unique=True), file['content_type'], method
+            )
+            upload['filename'] = file['filename']
+            uploads.append(upload)
 
-        location = collection.find_one({
-            'Location_Lat': float(latitude),
-            'Location_Lon': float(longitude),
-            'Accessibility_Type_Name': {'$in': possible_types}
+        return jsonify({
+            'location_id': str(location['_id']),
+            'uploads': uploads,
+            'method': method,
+            'expires_in': UPLOAD_URL_EXPIRES_SECONDS,
+            'max_files': MAX_UPLOAD_FILES
         })
 
-        if not location:
-            return jsonify({'error': 'No matching location found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        image_data = {
-            "image_url": public_url,
-            "image_upload_time": datetime.utcnow().isoformat() + "Z",
-            "approved_status": False,  # Always False, pending admin approval
-            "image_approved_time": None,
-            "device_id": device_id,
-            "username": username,
+# Post-upload moderation: queued and processed by the moderation workers
+@upload_bp.route('/moderate-uploaded-image', methods=['POST'])
+def moderate_uploaded_image():
+    try:
+        data = request.get_json() or {}
+        payload = {
+            'bucket_name': data.get('bucket_name') or os.environ.get('S3_BUCKET_NAME'),
+            's3_key': data.get('s3_key'),
+            'device_id': data.get('device_id'),
+            'username': data.get('username'),
+            'location_id': data.get('location_id'),
+            'latitude': data.get('latitude'),
+            'longitude': data.get('longitude'),
+            'accessibility_type': data.get('accessibility_type'),
+            'public_url': data.get('public_url')
         }
+        try:
+            validate_upload(payload)
+        except ModerationError as e:
+            return jsonify({'error': str(e)}), 400
 
-        result = collection.update_one(
-            {'_id': location['_id']},
-            {'$push': {'Images': image_data}}
-        )
+        job = enqueue(payload)
+        return jsonify({
+            'job_id': str(job['_id']),
+            'status': job['status'],
+            'status_url': f"/moderation-jobs/{job['_id']}"
+        }), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        if result.modified_count == 0:
-            return jsonify({'error': 'Failed to update location with new image'}), 500
 
-        return jsonify({'is_clean': is_clean, 'message': 'Image uploaded and added to Images array.'})
+@upload_bp.route('/moderation-jobs/<job_id>', methods=['GET'])
+def get_moderation_job(job_id):
+    try:
+        try:
+            job = get_job(job_id)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        # Picks up jobs left over from before a restart or a fork
+        workers.start()
+        return jsonify(job_view(job))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+
+@upload_bp.route('/moderation-cache/stats', methods=['GET'])
+def get_moderation_cache_stats():
+    # Per process: each worker keeps its own cache
+    return jsonify(moderation_cache.get_stats())
+
+
+@upload_bp.cli.command('backfill-index')
+def backfill_index_command():
+    """Assigns missing image ids, then builds the uploads index from the existing Images arrays."""
+    assigned = backfill_image_ids()
+    click.echo(f"Assigned {assigned} image ids.")
+    indexed = backfill_uploads()
+    click.echo(f"Indexed {indexed} uploaded images.")
+
+
+
+@upload_bp.cli.command('moderation-worker')
+@click.option('--once', is_flag=True, help='Process the jobs that are due and exit.')
+def moderation_worker_command(once):
+    """Processes moderation jobs in the foreground."""
+    while True:
+        processed = process_available_jobs()
+        if processed:
+            click.echo(f"Processed {processed} moderation jobs.")
+        if once:
+            break
+        time.sleep(POLL_SECONDS)
+
+
+
+@upload_bp.cli.command('normalize-types')
+def normalize_types_command():
+    """Rewrites every location's Accessibility_Type_Name to its collection's canonical name."""
+    for collection_name, modified in normalize_location_types().items():
+        click.echo(f"{collection_name}: normalized {modified} locations.")
@@ -1,10 +1,34 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
 from services.db_service import get_collection
+from services.stream_service import stream_json_array
+from services.vote_service import (
+    MAX_BATCH_VOTES, get_device_vote_count, get_devices_vote_counts, get_image_tallies,
+    get_images_tallies, insert_vote, insert_votes, rebuild_vote_counters,
+    record_batch_vote_counters, record_vote_counters
+)
+from services.upload_index_service import count_approved_uploads, find_device_uploads
+from services.leaderboard_service import (
+    UPLOAD_COUNTERS, get_top, get_user_rank, rebuild_leaderboard, record_vote, record_votes
+)
+from services import leaderboard_service
 from bson import ObjectId
+import click
+import time
 
 vote_bp = Blueprint('vote', __name__)
 
+# Votes are deduplicated on these, so they must be plain strings
+VOTE_KEY_FIELDS = ['device_id', 'image_url']
+
+
+def invalid_key_field(vote):
+    """The first of VOTE_KEY_FIELDS that is not a non-empty string, or None."""
+    for field in VOTE_KEY_FIELDS:
+        if not isinstance(vote.get(field), str) or not vote[field]:
+            return field
+    return None
+
 @vote_bp.route('/api/vote', methods=['POST'])
 def submit_vote():
     try:
@@ -15,36 +39,13 @@ def submit_vote():
         for field in required_fields:
             if field not in data:
                 return jsonify({'error': f'Missing required field: {field}'}), 400
+        invalid = invalid_key_field(data)
+        if invalid:
+            return jsonify({'error': f'{invalid} must be a non-empty string'}), 400
 
-        # Get votes collection
-        votes_collection = get_collection('votes')
-        
         # Get username from request if available
         username = data.get('username')
 
-        # Check if this device has already voted on this image
-        existing_vote = votes_collection.find_one({
-            'device_id': data['device_id'],
-            'image_url': data['image_url']
-        })
-
-        if existing_vote:
-            # Return error if device has already voted
-            return jsonify({
-                'error': 'You have already voted on this image',
-                'accurate_count': votes_collection.count_documents({
-                    'image_url': data['image_url'],
-                    'is_accurate': True
-                }),
-                'inaccurate_count': votes_collection.count_documents({
-                    'image_url': data['image_url'],
-                    'is_accurate': False
-                }),
-                'device_vote_count': votes_collection.count_documents({
-                    'device_id': data['device_id']
-                })
-            }), 400
-
         # Create new vote
         current_time = datetime.utcnow()
         vote_doc = {
@@ -56,70 +57,112 @@ def submit_vote():
             'created_at': current_time,
             'updated_at': current_time
         }
-        votes_collection.insert_one(vote_doc)
 
-        # Get vote counts for this image
-        accurate_count = votes_collection.count_documents({
-            'image_url': data['image_url'],
-            'is_accurate': True
-        })
-        inaccurate_count = votes_collection.count_documents({
-            'image_url': data['image_url'],
-            'is_accurate': False
-        })
+        # Insert unless this device has already voted on this image
+        if not insert_vote(vote_doc):
+            # Return error if device has already voted
+            return jsonify({
+                'error': 'You have already voted on this image',
+                **get_image_tallies(data['image_url']),
+                'device_vote_count': get_device_vote_count(data['device_id'])
+            }), 400
 
-        # Get total votes by this device
-        device_vote_count = votes_collection.count_documents({
-            'device_id': data['device_id']
-        })
+        # Update the materialized counters and read back the new tallies
+        tallies = record_vote_counters(data['device_id'], data['image_url'], data['is_accurate'])
+        record_vote(username)
 
         return jsonify({
             'message': 'Vote recorded successfully',
-            'accurate_count': accurate_count,
-            'inaccurate_count': inaccurate_count,
-            'device_vote_count': device_vote_count
+            **tallies
         }), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@vote_bp.route('/api/votes/<path:image_url>', methods=['GET'])
-def get_votes(image_url):
+@vote_bp.route('/api/votes/batch', methods=['POST'])
+def submit_votes_batch():
     try:
-        # Get votes collection
-        votes_collection = get_collection('votes')
+        data = request.get_json()
+
+        # Accept either a bare array of votes or {"votes": [...]}
+        votes = data.get('votes') if isinstance(data, dict) else data
+        if not isinstance(votes, list) or not votes:
+            return jsonify({'error': 'Expected a non-empty array of votes'}), 400
+        if len(votes) > MAX_BATCH_VOTES:
+            return jsonify({'error': f'At most {MAX_BATCH_VOTES} votes per batch'}), 400
 
-        # Get vote counts for this image
-        accurate_count = votes_collection.count_documents({
-            'image_url': image_url,
-            'is_accurate': True
-        })
-        inaccurate_count = votes_collection.count_documents({
-            'image_url': image_url,
-            'is_accurate': False
-        })
+        # Validate required fields per vote; invalid votes are reported, not fatal
+        required_fields = ['device_id', 'location_id', 'image_url', 'is_accurate']
+        results = [None] * len(votes)
+        vote_docs = []
+        index_by_id = {}  # vote _id -> position in the request
+        current_time = datetime.utcnow()
+        for index, vote in enumerate(votes):
+            missing = [field for field in required_fields if not isinstance(vote, dict) or field not in vote]
+            if missing:
+                results[index] = {'index': index, 'status': 'invalid', 'error': f'Missing required field: {missing[0]}'}
+                continue
+            invalid = invalid_key_field(vote)
+            if invalid:
+                results[index] = {'index': index, 'status': 'invalid', 'error': f'{invalid} must be a non-empty string'}
+                continue
+            vote_doc = {
+                '_id': ObjectId(),
+                'device_id': vote['device_id'],
+                'username': vote.get('username'),
+                'location_id': vote['location_id'],
+                'image_url': vote['image_url'],
+                'is_accurate': vote['is_accurate'],
+                'created_at': current_time,
+                'updated_at': current_time
+            }
+            index_by_id[vote_doc['_id']] = index
+            vote_docs.append(vote_doc)
 
+        # One dedupe query and one unordered insert for the whole batch
+        inserted, duplicates = insert_votes(vote_docs)
+        for status, docs in (('recorded', inserted), ('duplicate', duplicates)):
+            for vote_doc in docs:
+                index = index_by_id[vote_doc['_id']]
+                results[index] = {'index': index, 'status': status}
+
+        record_batch_vote_counters(inserted)
+        record_votes(vote_doc['username'] for vote_doc in inserted)
+
+        # Updated tallies for every image and device touched by the batch
         return jsonify({
-            'accurate_count': accurate_count,
-            'inaccurate_count': inaccurate_count
+            'recorded': len(inserted),
+            'duplicates': len(duplicates),
+            'results': results,
+            'tallies': get_images_tallies({vote_doc['image_url'] for vote_doc in vote_docs}),
+            'device_vote_counts': get_devices_vote_counts({vote_doc['device_id'] for vote_doc in vote_docs})
         }), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@vote_bp.route('/api/votes/<path:image_url>', methods=['GET'])
+def get_votes(image_url):
+    try:
+        # Get vote counts for this image from the counters collection
+        return jsonify(get_image_tallies(image_url)), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @vote_bp.route('/api/votes/device/<device_id>', methods=['GET'])
 def get_device_votes(device_id):
     try:
         # Get votes collection
         votes_collection = get_collection('votes')
 
-        # Get all votes for this device
-        votes = list(votes_collection.find(
+        # Stream all votes for this device
+        votes = votes_collection.find(
             {'device_id': device_id},
             {'_id': 0, 'image_url': 1, 'is_accurate': 1, 'created_at': 1}
-        ))
+        )
 
-        return jsonify(votes), 200
+        return stream_json_array(votes)
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500 
@@ -162,91 +205,27 @@ def get_device_vote_summary():
 @vote_bp.route('/api/leaderboard', methods=['GET'])
 def get_leaderboard():
     try:
-        # Get collections
-        votes_collection = get_collection('votes')
-        medical_collection = get_collection('medical-victoria')
-        toilet_collection = get_collection('toilets-victoria')
-        train_collection = get_collection('trains-victoria')
-        tram_collection = get_collection('trams-victoria')
-        
-        # Get vote counts per username
-        vote_pipeline = [
-            {
-                '$match': {
-                    'username': {'$ne': None, '$exists': True}
-                }
-            },
-            {
-                '$group': {
-                    '_id': '$username',
-                    'vote_count': {'$sum': 1}
-                }
-            }
-        ]
-        
-        vote_results = list(votes_collection.aggregate(vote_pipeline))
-        
-        # Create a dictionary to store username -> points
-        user_points = {}
-        
-        # Process vote results (1 point per vote)
-        for result in vote_results:
-            username = result['_id']
-            vote_count = result['vote_count']
-            if username not in user_points:
-                user_points[username] = 0
-            user_points[username] += vote_count
-        
-        # Function to count uploads for a collection
-        def count_uploads_for_collection(collection):
-            upload_counts = {}
-            # Find all documents with Images array
-            cursor = collection.find({"Images": {"$exists": True, "$ne": []}})
-            for doc in cursor:
-                if 'Images' in doc:
-                    for image in doc['Images']:
-                        # Only count approved images for leaderboard points
-                        if (image.get('approved_status') == True and 
-                            'username' in image and image['username']):
-                            username = image['username']
-                            if username not in upload_counts:
-                                upload_counts[username] = 0
-                            upload_counts[username] += 1
-            return upload_counts
-        
-        # Count uploads for each collection (5 points per upload)
-        # Also aggregate upload counts per user for badge system
-        user_upload_counts = {}
-        for collection in [medical_collection, toilet_collection, train_collection, tram_collection]:
-            upload_counts = count_uploads_for_collection(collection)
-            for username, count in upload_counts.items():
-                if username not in user_points:
-                    user_points[username] = 0
-                # 5 points per upload
-                user_points[username] += count * 5
-                # Aggregate upload counts for badge system
-                if username not in user_upload_counts:
-                    user_upload_counts[username] = 0
-                user_upload_counts[username] += count
-        
-        # Convert to list and sort by points
-        leaderboard = [
-            {
-                'username': username,
-                'points': points,
-                'approved_uploads': user_upload_counts.get(username, 0)  # Add approved upload count for badge system
-            }
-            for username, points in user_points.items()
-        ]
-        
-        # Sort by points (descending)
-        leaderboard.sort(key=lambda x: x['points'], reverse=True)
-        
-        # Add rank
-        for i, entry in enumerate(leaderboard):
-            entry['rank'] = i + 1
-        
-        return jsonify(leaderboard), 200
+        # Optional paging: ?limit=N&offset=M (the full leaderboard by default)
+        limit = int(request.args.get('limit', 0))
+        offset = int(request.args.get('offset', 0))
+        if limit < 0 or offset < 0:
+            return jsonify({'error': 'limit and offset must be non-negative'}), 400
+
+        # Served from the materialized leaderboard, already sorted by points
+        return jsonify(get_top(limit, offset)), 200
+
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@vote_bp.route('/api/leaderboard/rank/<username>', methods=['GET'])
+def get_leaderboard_rank(username):
+    try:
+        entry = get_user_rank(username)
+        if not entry:
+            return jsonify({'error': f'{username} is not on the leaderboard'}), 404
+        return jsonify(entry), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -255,33 +234,8 @@ def get_leaderboard():
 @vote_bp.route('/api/uploads/device/<device_id>', methods=['GET'])
 def get_device_uploads(device_id):
     try:
-        # Get collections
-        medical_collection = get_collection('medical-victoria')
-        toilet_collection = get_collection('toilets-victoria')
-        train_collection = get_collection('trains-victoria')
-        tram_collection = get_collection('trams-victoria')
-        
-        # Function to count uploads for a collection by device_id
-        def count_uploads_for_collection(collection, device_id):
-            upload_count = 0
-            # Find all documents with Images array
-            cursor = collection.find({"Images": {"$exists": True, "$ne": []}})
-            for doc in cursor:
-                if 'Images' in doc:
-                    for image in doc['Images']:
-                        # Count only approved images uploaded by this device
-                        if (image.get('device_id') == device_id and 
-                            image.get('approved_status') == True):
-                            upload_count += 1
-            return upload_count
-        
-        # Count total uploads across all collections
-        total_uploads = (
-            count_uploads_for_collection(medical_collection, device_id) +
-            count_uploads_for_collection(toilet_collection, device_id) +
-            count_uploads_for_collection(train_collection, device_id) +
-            count_uploads_for_collection(tram_collection, device_id)
-        )
+        # Count approved uploads for this device from the uploads index
+        total_uploads = count_approved_uploads(device_id)
         
         return jsonify({
             'device_id': device_id,
@@ -294,52 +248,52 @@ def get_device_uploads(device_id):
 @vote_bp.route('/api/uploads/device/<device_id>/images', methods=['GET'])
 def get_device_uploaded_images(device_id):
     try:
-        # Get collections
-        medical_collection = get_collection('medical-victoria')
-        toilet_collection = get_collection('toilets-victoria')
-        train_collection = get_collection('trains-victoria')
-        tram_collection = get_collection('trams-victoria')
-        
-        all_images = []
-        
-        def get_images_from_collection(collection, collection_type):
-            images = []
-            cursor = collection.find({"Images": {"$exists": True, "$ne": []}})
-            for doc in cursor:
-                if 'Images' in doc:
-                    for image in doc['Images']:
-                        if image.get('device_id') == device_id:
-                            # Get location name from either Metadata or Tags
-                            location_name = None
-                            if 'Metadata' in doc and 'name' in doc['Metadata']:
-                                location_name = doc['Metadata']['name']
-                            elif 'Tags' in doc and 'name' in doc['Tags']:
-                                location_name = doc['Tags']['name']
-                            
-                            image_data = {
-                                'image_url': image.get('image_url'),
-                                'location_name': location_name or 'Unknown Location',
-                                'accessibility_type': doc.get('Accessibility_Type_Name', 'Not specified'),
-                                'uploaded_at': image.get('image_upload_time'),
-                                'approved_status': image.get('approved_status', False),
-                                'approved_at': image.get('image_approved_time') if image.get('approved_status') else None
-                            }
-                            images.append(image_data)
-            return images
-        
-        # Get images from all collections
-        all_images.extend(get_images_from_collection(medical_collection, 'hospital'))
-        all_images.extend(get_images_from_collection(toilet_collection, 'toilet'))
-        all_images.extend(get_images_from_collection(train_collection, 'train'))
-        all_images.extend(get_images_from_collection(tram_collection, 'tram'))
-        
-        # Sort images by upload time (most recent first)
-        all_images.sort(key=lambda x: x['uploaded_at'] if x['uploaded_at'] else '', reverse=True)
-        
-        return jsonify({'images': all_images}), 200
-        
+        # Optional cursor pagination: ?limit=N, then ?cursor=<next_cursor>
+        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor')
+        if limit is not None and limit <= 0:
+            return jsonify({'error': 'limit must be a positive integer'}), 400
+
+        # Without a limit, stream every image (most recent first)
+        if not limit:
+            return stream_json_array(find_device_uploads(device_id), key='images')
+
+        images, next_cursor = find_device_uploads(device_id, limit, cursor)
+        return jsonify({'images': images, 'next_cursor': next_cursor}), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    
 
-    
\ No newline at end of file
+
+@vote_bp.cli.command('rebuild-counters')
+def rebuild_counters_command():
+    """Recomputes the per-image and per-device vote counters from the raw votes."""
+    image_count, device_count = rebuild_vote_counters()
+    click.echo(f"Rebuilt counters for {image_count} images and {device_count} devices.")
+
+
+@vote_bp.cli.command('rebuild-leaderboard')
+def rebuild_leaderboard_command():
+    """Recomputes the materialized leaderboard from votes and approved images."""
+    user_count = rebuild_leaderboard()
+    click.echo(f"Rebuilt leaderboard for {user_count} users.")
+
+
+@vote_bp.cli.command('benchmark-upload-stats')
+@click.option('--group-by', type=click.Choice(['username', 'device_id']), default='username')
+@click.option('--repeat', default=3, show_default=True)
+def benchmark_upload_stats_command(group_by, repeat):
+    """Times each approved-upload counting mode against the current database."""
+    results = {}
+    for mode in UPLOAD_COUNTERS:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results[mode] = leaderboard_service.count_approved_uploads(group_by, mode=mode)
+            timings.append(time.perf_counter() - start)
+        click.echo(f"{mode}: best {min(timings) * 1000:.1f} ms over {repeat} runs, {len(results[mode])} {group_by}s")
+
+    if len({tuple(sorted(counts.items())) for counts in results.values()}) > 1:
+        click.echo("Warning: the modes returned different counts.")
@@ -0,0 +1,135 @@
+from pymongo import UpdateOne
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime
+import secrets
+from services.db_service import get_collection
+from services.sync_service import SEQ_FIELD, reserve_sequence
+from services.leaderboard_service import record_upload_approvals
+from services.upload_index_service import set_upload_states
+
+MAX_BULK_APPROVALS = 500
+
+
+def parse_selection(values):
+    """
+    Parses "location_id:image_id" strings from the admin form into pairs.
+    Raises ValueError.
+    """
+    pairs = []
+    for value in values:
+        location_id, _, image_id = (value or '').partition(':')
+        if not location_id or not image_id:
+            raise ValueError(f'Invalid selection: {value}')
+        pairs.append((location_id, image_id))
+    if len(pairs) > MAX_BULK_APPROVALS:
+        raise ValueError(f'At most {MAX_BULK_APPROVALS} images can be moderated at once')
+    return pairs
+
+
+def _is_current(image, approved):
+    # Approving an approved image or rejecting a rejected one changes nothing
+    if approved:
+        return image.get('approved_status') == True
+    return image.get('approved_status') != True and bool(image.get('image_approved_time'))
+
+
+def set_images_status(collection_name, pairs, approved):
+    """
+    Approves or rejects [(location_id, image_id)] in one collection: one read
+    of the current states, one bulk write of conditional updates, one read
+    of what they applied, and one bulk update each for the leaderboard and
+    the uploads index. Images changed by someone else in between are
+    skipped and listed as conflicts.
+    Returns {requested, updated, unchanged, not_found, conflicts}.
+    """
+    collection = get_collection(collection_name)
+    summary = {'requested': len(pairs), 'updated': 0, 'unchanged': 0, 'not_found': [], 'conflicts': []}
+
+    wanted = {}
+    for location_id, image_id in pairs:
+        try:
+            wanted[(ObjectId(location_id), image_id)] = (location_id, image_id)
+        except (InvalidId, TypeError):
+            summary['not_found'].append(f'{location_id}:{image_id}')
+
+    # 1. Current state of every selected image
+    images = {}
+    location_ids = list({location_id for location_id, _ in wanted})
+    for location in collection.find(
+        {'_id': {'$in': location_ids}},
+        {'Images.image_id': 1, 'Images.image_url': 1, 'Images.username': 1,
+         'Images.approved_status': 1, 'Images.image_approved_time': 1}
+    ):
+        for image in location.get('Images', []):
+            if (location['_id'], image.get('image_id')) in wanted:
+                images[(location['_id'], image['image_id'])] = image
+
+    changes = []
+    for key, selection in wanted.items():
+        image = images.get(key)
+        if image is None:
+            summary['not_found'].append(':'.join(selection))
+        elif _is_current(image, approved):
+            summary['unchanged'] += 1
+        else:
+            changes.append((key[0], key[1], image))
+    if not changes:
+        return summary
+
+    # 2. Each image changes only if it still has the state read above, so
+    #    concurrent admins or a resubmitted form can't apply a change twice.
+    #    The token marks the images this request changed.
+    approved_time = datetime.utcnow().isoformat() + "Z"
+    token = secrets.token_hex(8)
+    with reserve_sequence(collection_name) as sequence:
+        collection.bulk_write([
+            UpdateOne(
+                {'_id': location_id, 'Images': {'$elemMatch': {
+                    'image_id': image_id,
+                    'approved_status': image.get('approved_status'),
+                    'image_approved_time': image.get('image_approved_time')
+                }}},
+                {'$set': {
+                    'Images.$.approved_status': approved,
+                    'Images.$.image_approved_time': approved_time,
+                    'Images.$.approval_token': token,
+                    SEQ_FIELD: sequence
+                }}
+            )
+            for location_id, image_id, image in changes
+        ], ordered=False)
+
+    # 3. Which of them were applied
+    marked = set()
+    for location in collection.find(
+        {'_id': {'$in': list({location_id for location_id, _, _ in changes})}, 'Images.approval_token': token},
+        {'Images.image_id': 1, 'Images.approval_token': 1}
+    ):
+        for image in location.get('Images', []):
+            if image.get('approval_token') == token:
+                marked.add((location['_id'], image.get('image_id')))
+    applied = []
+    for location_id, image_id, image in changes:
+        if (location_id, image_id) in marked:
+            applied.append((location_id, image_id, image))
+        else:
+            summary['conflicts'].append(f'{location_id}:{image_id}')
+    summary['updated'] = len(applied)
+    if not applied:
+        return summary
+
+    # 4. Keep the leaderboard and uploads index in step with what was applied
+    deltas = {}
+    for _, _, image in applied:
+        was_approved = image.get('approved_status') == True
+        if approved != was_approved:
+            username = image.get('username')
+            deltas[username] = deltas.get(username, 0) + (1 if approved else -1)
+    record_upload_approvals(deltas)
+    set_upload_states(
+        collection_name,
+        [(location_id, image, approved) for location_id, _, image in applied],
+        approved_time
+    )
+    return summary
@@ -0,0 +1,62 @@
+from botocore.config import Config
+import threading
+import boto3
+import os
+
+# Shared by every client: a connection pool sized for the worker's threads and
+# botocore's standard retry mode (exponential backoff on throttling/5xx)
+CLIENT_CONFIG = Config(
+    max_pool_connections=int(os.getenv("AWS_MAX_POOL_CONNECTIONS", 25)),
+    retries={"max_attempts": int(os.getenv("AWS_MAX_ATTEMPTS", 3)), "mode": "standard"},
+    connect_timeout=5,
+    read_timeout=30
+)
+# Presigned URLs and POST policies must be SigV4 against the regional endpoint
+SERVICE_CONFIGS = {
+    's3': Config(signature_version='s3v4', s3={'addressing_style': 'virtual'})
+}
+
+_clients = {}
+# boto3's default session is not thread-safe, so clients are created under a lock.
+# The clients themselves are thread-safe and shared by all request threads.
+_lock = threading.Lock()
+
+
+def get_client(service_name):
+    """Returns the process-wide client for an AWS service, creating it on first use."""
+    client = _clients.get(service_name)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(service_name)
+        if client is None:
+            client = boto3.client(
+                service_name,
+                aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
+                aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY'),
+                region_name=os.environ.get('S3_REGION'),
+                config=CLIENT_CONFIG.merge(SERVICE_CONFIGS.get(service_name, Config()))
+            )
+            _clients[service_name] = client
+        return client
+
+
+def get_s3_client():
+    return get_client('s3')
+
+
+def get_rekognition_client():
+    return get_client('rekognition')
+
+
+def set_client(service_name, client):
+    """Injects a client (e.g. a moto-backed client or a local fake) for a service."""
+    with _lock:
+        _clients[service_name] = client
+
+
+def reset_clients():
+    """Drops every cached or injected client; the next call creates fresh ones."""
+    with _lock:
+        _clients.clear()
@@ -0,0 +1,144 @@
+from flask import Response, current_app, request
+from pymongo import ReturnDocument
+from services.db_service import get_collection
+from collections import OrderedDict
+import threading
+import hashlib
+import logging
+import gzip
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+# One {_id: collection_name, version: n} document per cached collection
+VERSIONS_COLLECTION = "dataset-versions"
+# How long a worker trusts its last read of a version before asking Mongo again
+VERSION_CHECK_SECONDS = float(os.getenv("DATASET_VERSION_CHECK_SECONDS", 5))
+# Safety net for writes that bypass bump_version (e.g. the ingest notebooks)
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 600))
+# Total size of the cached bodies, plain and gzipped, per worker
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+_versions = {}  # collection_name -> (version, checked_at)
+_responses = OrderedDict()  # (collection_name, key) -> CachedResponse
+_cached_bytes = 0
+_lock = threading.Lock()
+
+
+class CachedResponse:
+    """
+    Pre-serialized body, its gzipped form and a content-derived ETag. The
+    ETag is weak because both encodings of the body share it.
+    """
+
+    def __init__(self, body, version, mimetype="application/json"):
+        self.body = body
+        self.mimetype = mimetype
+        self.gzipped = gzip.compress(body, compresslevel=6, mtime=0)
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.size = len(body) + len(self.gzipped)
+        self.version = version
+        self.created_at = time.monotonic()
+
+    def is_current(self, version):
+        return (self.version == version and
+                time.monotonic() - self.created_at < RESPONSE_CACHE_TTL_SECONDS)
+
+
+def get_version(collection_name, fresh=False):
+    """
+    Returns the collection's current version token (0 if never bumped).
+    Pass fresh=True to skip the short in-process memo.
+    """
+    cached = _versions.get(collection_name)
+    now = time.monotonic()
+    if not fresh and cached and now - cached[1] < VERSION_CHECK_SECONDS:
+        return cached[0]
+
+    doc = get_collection(VERSIONS_COLLECTION).find_one({"_id": collection_name})
+    version = doc["version"] if doc else 0
+    _versions[collection_name] = (version, now)
+    return version
+
+
+def bump_version(collection_name):
+    """
+    Marks a collection as changed. Must be called by every write path that
+    modifies location documents. Returns the new version.
+    """
+    doc = get_collection(VERSIONS_COLLECTION).find_one_and_update(
+        {"_id": collection_name},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    _versions[collection_name] = (doc["version"], time.monotonic())
+    return doc["version"]
+
+
+def clear():
+    """Forgets every cached response and version, e.g. between tests."""
+    global _cached_bytes
+    with _lock:
+        _responses.clear()
+        _cached_bytes = 0
+        _versions.clear()
+
+
+def serialize_json(data):
+    """Serializes data the same way jsonify does, as compact UTF-8 bytes."""
+    return current_app.json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def get_cached_response(collection_name, key, build_body, mimetype="application/json", version=None):
+    """
+    Returns the CachedResponse for (collection_name, key), calling
+    build_body() for fresh bytes when the collection version moved on.
+    Responses spanning several collections pass their combined version.
+    Least recently used responses are evicted beyond RESPONSE_CACHE_MAX_BYTES;
+    a response larger than that is built every time.
+    """
+    global _cached_bytes
+    if version is None:
+        version = get_version(collection_name)
+    cache_key = (collection_name, key)
+
+    with _lock:
+        entry = _responses.get(cache_key)
+        if entry is not None and entry.is_current(version):
+            _responses.move_to_end(cache_key)
+            return entry
+
+    entry = CachedResponse(build_body(), version, mimetype)
+    if entry.size > RESPONSE_CACHE_MAX_BYTES:
+        return entry
+    with _lock:
+        previous = _responses.pop(cache_key, None)
+        if previous is not None:
+            _cached_bytes -= previous.size
+        _responses[cache_key] = entry
+        _cached_bytes += entry.size
+        while _cached_bytes > RESPONSE_CACHE_MAX_BYTES:
+            _, evicted = _responses.popitem(last=False)
+            _cached_bytes -= evicted.size
+    return entry
+
+
+def make_cached_response(entry):
+    """
+    Builds the HTTP response for a CachedResponse: 304 when the client's
+    If-None-Match already has it, gzipped bytes when the client accepts them.
+    """
+    if request.if_none_match.contains_weak(entry.etag):
+        response = Response(status=304)
+    elif "gzip" in request.accept_encodings:
+        response = Response(entry.gzipped, mimetype=entry.mimetype)
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = Response(entry.body, mimetype=entry.mimetype)
+
+    response.set_etag(entry.etag, weak=True)
+    response.vary.add("Accept-Encoding")
+    response.headers["Cache-Control"] = "no-cache"
+    return response
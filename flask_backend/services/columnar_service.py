@@ -0,0 +1,190 @@
+from array import array
+import msgpack
+import base64
+import struct
+import json
+import sys
+
+# Formats the location endpoints can answer with, and their mimetypes
+FORMATS = {
+    "json": "application/json",
+    "columnar": "application/json",
+    "msgpack": "application/msgpack",
+    "binary": "application/octet-stream"
+}
+# Extra columns that are only shipped when asked for with ?include=
+OPTIONAL_COLUMNS = {"id", "images"}
+
+BINARY_MAGIC = b"MMC1"
+MULTI_BINARY_MAGIC = b"MMCM"
+
+
+def compact_projection(include):
+    """Mongo projection holding only what the compact formats need."""
+    projection = {
+        "_id": 1 if "id" in include else 0,
+        "Location_Lat": 1,
+        "Location_Lon": 1,
+        "Accessibility_Type_Name": 1,
+        "Metadata.name": 1,
+        "Tags.name": 1
+    }
+    if "images" in include:
+        projection["Images"] = 1
+    return projection
+
+
+def parse_include(value):
+    """Parses ?include=id,images into a set. Raises ValueError on unknown columns."""
+    include = {c.strip().lower() for c in (value or "").split(",") if c.strip()}
+    unknown = include - OPTIONAL_COLUMNS
+    if unknown:
+        raise ValueError(f"Unknown include column(s): {', '.join(sorted(unknown))}")
+    return include
+
+
+def _little_endian(values):
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class DictionaryColumn:
+    """String column stored as a list of distinct values plus int32 codes (-1 for null)."""
+
+    def __init__(self):
+        self.dictionary = []
+        self.codes = array("i")
+        self._lookup = {}
+
+    def append(self, value):
+        if value is None:
+            self.codes.append(-1)
+            return
+        code = self._lookup.get(value)
+        if code is None:
+            code = self._lookup[value] = len(self.dictionary)
+            self.dictionary.append(value)
+        self.codes.append(code)
+
+
+def build_columns(docs, include=frozenset()):
+    """Turns location documents into packed coordinate and dictionary-encoded columns."""
+    columns = {
+        "lat": array("f"),
+        "lon": array("f"),
+        "type": DictionaryColumn(),
+        "name": DictionaryColumn()
+    }
+    if "id" in include:
+        columns["id"] = []
+    if "images" in include:
+        columns["images"] = []
+
+    for doc in docs:
+        lat, lon = doc.get("Location_Lat"), doc.get("Location_Lon")
+        if not isinstance(lat, (int, float)) or not isinstance(lon, (int, float)):
+            continue
+        columns["lat"].append(lat)
+        columns["lon"].append(lon)
+        columns["type"].append(doc.get("Accessibility_Type_Name"))
+        name = (doc.get("Metadata") or {}).get("name") or (doc.get("Tags") or {}).get("name")
+        columns["name"].append(name)
+        if "id" in columns:
+            columns["id"].append(str(doc["_id"]))
+        if "images" in columns:
+            columns["images"].append(doc.get("Images", []))
+
+    return columns
+
+
+def _raw_payload(columns):
+    """Column values as plain bytes/lists, shared by the msgpack and JSON encoders."""
+    payload = {
+        "count": len(columns["lat"]),
+        "lat": _little_endian(columns["lat"]),
+        "lon": _little_endian(columns["lon"])
+    }
+    for key in ("type", "name"):
+        payload[key] = {
+            "dictionary": columns[key].dictionary,
+            "codes": _little_endian(columns[key].codes)
+        }
+    for key in OPTIONAL_COLUMNS & columns.keys():
+        payload[key] = columns[key]
+    return payload
+
+
+def encode_columnar_json(columns):
+    """JSON payload; packed arrays are base64 encoded little-endian float32/int32."""
+    payload = _raw_payload(columns)
+    payload["lat"] = base64.b64encode(payload["lat"]).decode("ascii")
+    payload["lon"] = base64.b64encode(payload["lon"]).decode("ascii")
+    for key in ("type", "name"):
+        payload[key]["codes"] = base64.b64encode(payload[key]["codes"]).decode("ascii")
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def encode_msgpack(columns):
+    """MessagePack payload with the same layout as the columnar JSON, arrays as raw bytes."""
+    return msgpack.packb(_raw_payload(columns), use_bin_type=True)
+
+
+def _section(key, data):
+    """uint8 key length, key (ascii), uint32 payload length, payload."""
+    key = key.encode("ascii")
+    return struct.pack("<B", len(key)) + key + struct.pack("<I", len(data)) + data
+
+
+def encode_binary(columns):
+    """
+    Length-prefixed little-endian layout:
+      b"MMC1", uint32 row count, then one _section per column:
+        uint8 key length, key (ascii), uint32 payload length, payload
+      lat/lon payloads are float32 arrays; type/name payloads are a uint32
+      entry count, each entry as uint16 length + utf-8 bytes, then int32 codes;
+      id/images payloads are JSON.
+    """
+    parts = [BINARY_MAGIC, struct.pack("<I", len(columns["lat"]))]
+    parts.append(_section("lat", _little_endian(columns["lat"])))
+    parts.append(_section("lon", _little_endian(columns["lon"])))
+    for key in ("type", "name"):
+        column = columns[key]
+        data = [struct.pack("<I", len(column.dictionary))]
+        for value in column.dictionary:
+            encoded = str(value).encode("utf-8")
+            data.append(struct.pack("<H", len(encoded)) + encoded)
+        data.append(_little_endian(column.codes))
+        parts.append(_section(key, b"".join(data)))
+    for key in sorted(OPTIONAL_COLUMNS & columns.keys()):
+        parts.append(_section(key, json.dumps(columns[key], separators=(",", ":")).encode("utf-8")))
+    return b"".join(parts)
+
+
+ENCODERS = {
+    "columnar": encode_columnar_json,
+    "msgpack": encode_msgpack,
+    "binary": encode_binary
+}
+
+
+def merge_encoded(parts, output_format):
+    """
+    Combines already encoded per-type bodies [(type, body), ...] into one
+    payload keyed by type without decoding them again: a JSON object, a
+    MessagePack map, or for binary b"MMCM", uint8 part count and one _section
+    per type holding that type's MMC1 payload.
+    """
+    if output_format == "msgpack":
+        packer = msgpack.Packer(use_bin_type=True)
+        return packer.pack_map_header(len(parts)) + b"".join(
+            packer.pack(key) + body for key, body in parts
+        )
+    if output_format == "binary":
+        return MULTI_BINARY_MAGIC + struct.pack("<B", len(parts)) + b"".join(
+            _section(key, body) for key, body in parts
+        )
+    return b"{" + b",".join(
+        json.dumps(key).encode("utf-8") + b":" + body for key, body in parts
+    ) + b"}"
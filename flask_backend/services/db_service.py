@@ -1,24 +1,95 @@
 from pymongo import MongoClient
 from dotenv import load_dotenv
+import threading
+import time
 import os
 
 # 1) Load environment variables from .env
 load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI")
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "mobility-mate")
 
-# 2) Attempt to connect to MongoDB
-try:
-    client = MongoClient(MONGO_URI)
-    client.server_info()  # Forces a connection attempt; throws if bad credentials
-    print("Connected to MongoDB Atlas!")
-except Exception as e:
-    print("MongoDB connection failed:", e)
-    # Optionally raise an error or exit
+# 2) Connection pool settings, shared by every blueprint and admin view in a process
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 50))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 300000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 30000))
+# primary, primaryPreferred, secondary, secondaryPreferred or nearest
+MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primary")
+
+_client = None
+_pid = None
+_injected = False
+_lock = threading.Lock()
+
+
+def client_options():
+    return {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+        "readPreference": MONGO_READ_PREFERENCE,
+        "appname": "mobility-mate",
+    }
+
+
+def get_client():
+    """
+    The process's MongoClient, created on first use. A client inherited
+    across a fork (e.g. gunicorn workers) is not reused; the child creates
+    its own. Creating the client does not contact the server.
+    """
+    global _client, _pid
+    if _client is not None and (_injected or _pid == os.getpid()):
+        return _client
+    with _lock:
+        if _client is None or not (_injected or _pid == os.getpid()):
+            # The parent's client is left alone: closing it here would tear down its sockets
+            _client = MongoClient(MONGO_URI, **client_options())
+            _pid = os.getpid()
+        return _client
+
+
+def set_client(client):
+    """
+    Uses the given client, e.g. mongomock.MongoClient() or a client for a
+    local mongod, instead of connecting to MONGO_URI. None goes back to
+    MONGO_URI on next use.
+    """
+    global _client, _pid, _injected
+    with _lock:
+        _client = client
+        _pid = os.getpid()
+        _injected = client is not None
+
+
+def reset_client():
+    """Closes this process's client; the next get_client() connects again."""
+    global _client, _pid, _injected
+    with _lock:
+        client, owned = _client, _pid == os.getpid() and not _injected
+        _client, _pid, _injected = None, None, False
+    if client is not None and owned:
+        client.close()
+
+
+# 3) The database that contains the app's data
+def get_db():
+    return get_client()[MONGO_DB_NAME]
 
-# 3) Choose the database name that actually contains your data
-#    Since you said "test-db" in your screenshot, let's use that:
-db = client["mobility-mate"]
 
 # 4) Provide a helper to get a reference to a collection
 def get_collection(name: str):
-    return db[name]
+    return get_db()[name]
+
+
+def ping():
+    """Round trip to the server in milliseconds. Raises if it is unreachable."""
+    started = time.monotonic()
+    get_client().admin.command("ping")
+    return round((time.monotonic() - started) * 1000, 1)
@@ -0,0 +1,200 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from collections import OrderedDict
+from datetime import datetime
+from dotenv import load_dotenv
+import threading
+import requests
+import re
+import logging
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+TICKETMASTER_API_KEY = os.getenv("TICKETMASTER_API_KEY")
+BASE_URL = "https://app.ticketmaster.com/discovery/v2/events.json"
+
+# Served from cache without touching Ticketmaster
+EVENTS_FRESH_SECONDS = int(os.getenv("EVENTS_FRESH_SECONDS", 300))
+# After that, served stale for this long while one background refresh runs
+EVENTS_STALE_SECONDS = int(os.getenv("EVENTS_STALE_SECONDS", 3600))
+EVENTS_CACHE_MAX_ENTRIES = int(os.getenv("EVENTS_CACHE_MAX_ENTRIES", 32))
+EVENTS_REFRESH_WORKERS = int(os.getenv("EVENTS_REFRESH_WORKERS", 2))
+# (connect, read) timeouts for upstream calls
+EVENTS_TIMEOUT = (3.05, float(os.getenv("EVENTS_READ_TIMEOUT_SECONDS", 10)))
+
+# Parameters a client may override, and the Melbourne defaults
+DEFAULT_QUERY = {
+    'postalcode': '3000',  # Melbourne CBD
+    'radius': 100,  # 100km radius
+    'unit': 'km',
+    'countryCode': 'AU',
+    'stateCode': 'VIC',
+    'size': 100  # Maximum allowed by Ticketmaster API
+}
+QUERY_OVERRIDES = {'postalcode': str, 'radius': int, 'size': int}
+# Bounds on the overrides, so clients can't fill the cache with arbitrary queries
+QUERY_LIMITS = {'radius': (1, 100), 'size': (1, 100)}
+POSTCODE_PATTERN = re.compile(r'^\d{4}$')
+
+FRESH, STALE, MISS = 'fresh', 'stale', 'miss'
+
+_session = None
+_entries = OrderedDict()  # cache key -> CachedEvents
+_inflight = {}  # cache key -> Future of the running upstream fetch
+_lock = threading.Lock()
+_refresh_executor = ThreadPoolExecutor(max_workers=EVENTS_REFRESH_WORKERS, thread_name_prefix='events-refresh')
+
+
+class CachedEvents:
+    def __init__(self, data):
+        self.data = data
+        self.fetched_at = time.monotonic()
+
+    def age(self):
+        return time.monotonic() - self.fetched_at
+
+
+def get_session():
+    """Process-wide pooled session, so upstream calls reuse TLS connections."""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                session = requests.Session()
+                session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=EVENTS_REFRESH_WORKERS + 2))
+                _session = session
+    return _session
+
+
+def fetch_ticketmaster(query):
+    response = get_session().get(BASE_URL, params={'apikey': TICKETMASTER_API_KEY, **query}, timeout=EVENTS_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+
+_fetch_upstream = fetch_ticketmaster
+
+
+def set_upstream(fetch):
+    """Replaces the upstream call (query -> JSON) with e.g. a local fake; None restores Ticketmaster."""
+    global _fetch_upstream
+    _fetch_upstream = fetch or fetch_ticketmaster
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+
+def build_query(overrides=None):
+    """
+    Normalized query for the events search: the Melbourne defaults, allowed
+    overrides coerced to their types and checked against their bounds,
+    starting today. Raises ValueError.
+    """
+    query = dict(DEFAULT_QUERY)
+    overrides = overrides if isinstance(overrides, dict) else {}
+    for name, value in overrides.items():
+        if name not in QUERY_OVERRIDES or value in (None, ''):
+            continue
+        try:
+            value = QUERY_OVERRIDES[name](str(value).strip())
+        except ValueError:
+            raise ValueError(f'Invalid {name}: {value}')
+        if name in QUERY_LIMITS:
+            low, high = QUERY_LIMITS[name]
+            if not low <= value <= high:
+                raise ValueError(f'{name} must be between {low} and {high}')
+        elif name == 'postalcode' and not POSTCODE_PATTERN.match(value):
+            raise ValueError(f'Invalid postalcode: {value}')
+        query[name] = value
+    query['startDateTime'] = f"{datetime.now().strftime('%Y-%m-%d')}T00:00:00Z"
+    return query
+
+
+def _cache_key(query):
+    return tuple(sorted((name, str(value)) for name, value in query.items()))
+
+
+def _store(key, data):
+    with _lock:
+        _entries[key] = CachedEvents(data)
+        _entries.move_to_end(key)
+        while len(_entries) > EVENTS_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+
+def _claim(key):
+    """Returns (future, owner): the running fetch for key, or a new one the caller must run."""
+    with _lock:
+        future = _inflight.get(key)
+        if future is not None:
+            return future, False
+        future = _inflight[key] = Future()
+        return future, True
+
+
+def _run_fetch(key, query, future):
+    try:
+        data = _fetch_upstream(query)
+        _store(key, data)
+        future.set_result(data)
+        return data
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+
+
+def _fetch(key, query):
+    """Fetches from upstream, joining a fetch for the same key that is already running."""
+    future, owner = _claim(key)
+    if not owner:
+        return future.result()
+    return _run_fetch(key, query, future)
+
+
+def _refresh(key, query, future):
+    try:
+        _run_fetch(key, query, future)
+    except Exception as e:
+        logger.warning(f"Background events refresh failed: {e}")
+
+
+def _refresh_in_background(key, query):
+    future, owner = _claim(key)
+    if owner:
+        _refresh_executor.submit(_refresh, key, query, future)
+
+
+def get_events(query):
+    """
+    Returns (data, cache_status) for a query from build_query. Fresh entries
+    are served as is; stale ones are served while a background refresh runs.
+    Otherwise the caller waits for upstream; if that fails, any older copy is
+    served instead of the error.
+    """
+    key = _cache_key(query)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+
+    if entry is not None:
+        if entry.age() < EVENTS_FRESH_SECONDS:
+            return entry.data, FRESH
+        if entry.age() < EVENTS_FRESH_SECONDS + EVENTS_STALE_SECONDS:
+            _refresh_in_background(key, query)
+            return entry.data, STALE
+
+    try:
+        return _fetch(key, query), MISS
+    except Exception:
+        if entry is not None:
+            return entry.data, STALE
+        raise
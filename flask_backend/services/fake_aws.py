@@ -0,0 +1,67 @@
+from botocore.exceptions import ClientError
+from services.aws_clients import set_client
+import threading
+import hashlib
+
+
+class FakeS3Client:
+    """
+    In-memory stand-in for the S3 calls the upload pipeline makes. Objects are
+    only tracked by key: generate_presigned_url returns a URL that does not
+    exist, so tests put objects with put_object instead of uploading.
+    """
+
+    def __init__(self):
+        self.objects = {}
+        self._lock = threading.Lock()
+
+    def put_object(self, Bucket, Key, Body=b"", **kwargs):
+        with self._lock:
+            self.objects[(Bucket, Key)] = Body
+        return {}
+
+    def head_object(self, Bucket, Key):
+        with self._lock:
+            if (Bucket, Key) not in self.objects:
+                raise ClientError({'Error': {'Code': '404', 'Message': 'Not Found'}}, 'HeadObject')
+            body = self.objects[(Bucket, Key)]
+            return {'ContentLength': len(body), 'ETag': '"%s"' % hashlib.md5(body).hexdigest()}
+
+    def delete_object(self, Bucket, Key):
+        with self._lock:
+            self.objects.pop((Bucket, Key), None)
+        return {}
+
+    def generate_presigned_url(self, client_method, Params=None, ExpiresIn=3600):
+        return f"http://fake-s3.local/{Params['Bucket']}/{Params['Key']}?method={client_method}"
+
+    def generate_presigned_post(self, Bucket, Key, Fields=None, Conditions=None, ExpiresIn=3600):
+        return {'url': f"http://fake-s3.local/{Bucket}", 'fields': {**(Fields or {}), 'key': Key}}
+
+
+class FakeRekognitionClient:
+    """
+    Answers detect_moderation_labels from a fixed table: keys listed in
+    `flagged` come back with their labels, everything else is clean.
+    """
+
+    def __init__(self, flagged=None):
+        self.flagged = dict(flagged or {})
+        self.calls = []
+
+    def flag(self, key, name='Explicit Nudity', confidence=99.0):
+        self.flagged[key] = [{'Name': name, 'Confidence': confidence}]
+
+    def detect_moderation_labels(self, Image, MinConfidence=80):
+        key = Image['S3Object']['Name']
+        self.calls.append(key)
+        labels = [label for label in self.flagged.get(key, []) if label['Confidence'] >= MinConfidence]
+        return {'ModerationLabels': labels}
+
+
+def install_fake_clients():
+    """Replaces the process-wide S3 and Rekognition clients with fakes. Returns (s3, rekognition)."""
+    s3, rekognition = FakeS3Client(), FakeRekognitionClient()
+    set_client('s3', s3)
+    set_client('rekognition', rekognition)
+    return s3, rekognition
@@ -0,0 +1,101 @@
+from pymongo import GEOSPHERE
+import logging
+
+logger = logging.getLogger(__name__)
+
+# GeoJSON point derived from Location_Lat/Location_Lon, backing the 2dsphere index
+GEO_FIELD = 'Location_Point'
+EARTH_RADIUS_M = 6378100
+MAX_RADIUS_M = 100000
+
+# Collections whose geo index has already been ensured in this process
+_indexed_collections = set()
+
+
+def ensure_geo_index(collection):
+    """
+    Backfills the GeoJSON point on documents that don't have one yet and
+    makes sure the 2dsphere index exists. Runs once per collection per process.
+    """
+    if collection.name in _indexed_collections:
+        return
+
+    result = collection.update_many(
+        {
+            GEO_FIELD: {'$exists': False},
+            'Location_Lat': {'$type': 'number'},
+            'Location_Lon': {'$type': 'number'}
+        },
+        [{'$set': {GEO_FIELD: {
+            'type': 'Point',
+            'coordinates': ['$Location_Lon', '$Location_Lat']
+        }}}]
+    )
+    if result.modified_count:
+        logger.info(f"Backfilled {GEO_FIELD} on {result.modified_count} '{collection.name}' documents.")
+
+    collection.create_index([(GEO_FIELD, GEOSPHERE)])
+    _indexed_collections.add(collection.name)
+
+
+def parse_bbox(value):
+    """Parses 'minLon,minLat,maxLon,maxLat' into a tuple of floats."""
+    parts = value.split(',')
+    if len(parts) != 4:
+        raise ValueError('bbox must be minLon,minLat,maxLon,maxLat')
+    min_lon, min_lat, max_lon, max_lat = (float(p) for p in parts)
+    if not (-180 <= min_lon < max_lon <= 180 and -90 <= min_lat < max_lat <= 90):
+        raise ValueError('bbox is out of range or has min >= max')
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def bbox_polygon(min_lon, min_lat, max_lon, max_lat):
+    """GeoJSON polygon covering a bbox, for $geoWithin queries."""
+    return {
+        'type': 'Polygon',
+        'coordinates': [[
+            [min_lon, min_lat],
+            [max_lon, min_lat],
+            [max_lon, max_lat],
+            [min_lon, max_lat],
+            [min_lon, min_lat]
+        ]]
+    }
+
+
+def parse_radius(lat, lon, radius_m):
+    """Validates a lat/lon/radius_m triple and returns it as floats."""
+    lat, lon, radius_m = float(lat), float(lon), float(radius_m)
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError('lat/lon are out of range')
+    if not (0 < radius_m <= MAX_RADIUS_M):
+        raise ValueError(f'radius_m must be between 0 and {MAX_RADIUS_M}')
+    return lat, lon, radius_m
+
+
+def build_geo_filter(args):
+    """
+    Builds a Mongo filter from optional request args:
+      - bbox=minLon,minLat,maxLon,maxLat
+      - lat, lon and radius_m
+    Returns None when no spatial filter was requested.
+    Raises ValueError on malformed parameters.
+    """
+    bbox = args.get('bbox')
+    radius_params = [args.get('lat'), args.get('lon'), args.get('radius_m')]
+
+    if bbox and any(radius_params):
+        raise ValueError('Use either bbox or lat/lon/radius_m, not both')
+
+    if bbox:
+        return {GEO_FIELD: {'$geoWithin': {'$geometry': bbox_polygon(*parse_bbox(bbox))}}}
+
+    if any(radius_params):
+        if not all(radius_params):
+            raise ValueError('lat, lon and radius_m are all required for a radius query')
+        lat, lon, radius_m = parse_radius(*radius_params)
+        return {GEO_FIELD: {'$geoWithin': {
+            '$centerSphere': [[lon, lat], radius_m / EARTH_RADIUS_M]
+        }}}
+
+    return None
@@ -0,0 +1,210 @@
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from services.db_service import get_collection
+import os
+
+# {_id: username, points, vote_count, approved_uploads}
+LEADERBOARD_COLLECTION = 'leaderboard'
+LOCATION_COLLECTIONS = ['medical-victoria', 'toilets-victoria', 'trains-victoria', 'trams-victoria']
+
+VOTE_POINTS = 1
+UPLOAD_POINTS = 5
+
+# How approved uploads are counted when rebuilding: 'pipeline' or 'python'
+UPLOAD_STATS_MODE = os.getenv('UPLOAD_STATS_MODE', 'pipeline')
+
+# Ranking order; (points, _id) is unique so ranks are stable between pages
+LEADERBOARD_SORT = [('points', DESCENDING), ('_id', ASCENDING)]
+
+
+def ensure_leaderboard_indexes():
+    get_collection(LEADERBOARD_COLLECTION).create_index(LEADERBOARD_SORT)
+
+
+def record_vote(username):
+    """Adds the points for one vote by username."""
+    if not username:
+        return
+    get_collection(LEADERBOARD_COLLECTION).update_one(
+        {'_id': username},
+        {'$inc': {'points': VOTE_POINTS, 'vote_count': 1, 'approved_uploads': 0}},
+        upsert=True
+    )
+
+
+def record_votes(usernames):
+    """Adds the points for a batch of votes with a single bulk write."""
+    vote_counts = {}
+    for username in usernames:
+        if username:
+            vote_counts[username] = vote_counts.get(username, 0) + 1
+    if not vote_counts:
+        return
+    get_collection(LEADERBOARD_COLLECTION).bulk_write([
+        UpdateOne(
+            {'_id': username},
+            {'$inc': {'points': VOTE_POINTS * count, 'vote_count': count, 'approved_uploads': 0}},
+            upsert=True
+        )
+        for username, count in vote_counts.items()
+    ], ordered=False)
+
+
+def record_upload_approval(username, delta):
+    """
+    Adjusts a user's approved uploads by delta: +1 when an image becomes
+    approved, -1 when a previously approved image is rejected.
+    """
+    if not username or not delta:
+        return
+    get_collection(LEADERBOARD_COLLECTION).update_one(
+        {'_id': username},
+        {'$inc': {'points': UPLOAD_POINTS * delta, 'approved_uploads': delta, 'vote_count': 0}},
+        upsert=True
+    )
+
+
+def record_upload_approvals(deltas):
+    """Applies {username: delta} approved upload changes with a single bulk write."""
+    operations = [
+        UpdateOne(
+            {'_id': username},
+            {'$inc': {'points': UPLOAD_POINTS * delta, 'approved_uploads': delta, 'vote_count': 0}},
+            upsert=True
+        )
+        for username, delta in deltas.items()
+        if username and delta
+    ]
+    if operations:
+        get_collection(LEADERBOARD_COLLECTION).bulk_write(operations, ordered=False)
+
+
+def _entry(doc, rank):
+    return {
+        'username': doc['_id'],
+        'points': doc['points'],
+        'approved_uploads': doc.get('approved_uploads', 0),  # Approved upload count for badge system
+        'rank': rank
+    }
+
+
+def get_top(limit=None, offset=0):
+    """Returns leaderboard entries ordered by points, starting at offset."""
+    cursor = get_collection(LEADERBOARD_COLLECTION).find({'points': {'$gt': 0}}).sort(LEADERBOARD_SORT).skip(offset)
+    if limit:
+        cursor = cursor.limit(limit)
+    return [_entry(doc, offset + i + 1) for i, doc in enumerate(cursor)]
+
+
+def get_user_rank(username):
+    """
+    Returns a single user's leaderboard entry, or None. The rank is one more
+    than the number of users ordered before them, counted on the (points, _id)
+    index. The count walks those index entries, so it costs O(rank) rather
+    than O(log n); fine at this app's user counts, but not a substitute for
+    a cached rank if the leaderboard grows large.
+    """
+    leaderboard = get_collection(LEADERBOARD_COLLECTION)
+    doc = leaderboard.find_one({'_id': username, 'points': {'$gt': 0}})
+    if not doc:
+        return None
+    ahead = leaderboard.count_documents({'$or': [
+        {'points': {'$gt': doc['points']}},
+        {'points': doc['points'], '_id': {'$lt': username}}
+    ]})
+    return _entry(doc, ahead + 1)
+
+
+def _count_uploads_python(group_field, match_value=None):
+    upload_counts = {}
+    for collection_name in LOCATION_COLLECTIONS:
+        # Find all documents with Images array
+        cursor = get_collection(collection_name).find(
+            {"Images": {"$exists": True, "$ne": []}},
+            {"Images.approved_status": 1, f"Images.{group_field}": 1}
+        )
+        for doc in cursor:
+            for image in doc.get('Images', []):
+                # Only count approved images
+                key = image.get(group_field)
+                if image.get('approved_status') == True and key:
+                    if match_value is not None and key != match_value:
+                        continue
+                    upload_counts[key] = upload_counts.get(key, 0) + 1
+    return upload_counts
+
+
+def _count_uploads_pipeline(group_field, match_value=None):
+    image_match = {'approved_status': True, group_field: {'$nin': [None, '']}}
+    if match_value is not None:
+        image_match[group_field] = match_value
+
+    def approved_images():
+        return [
+            {'$match': {'Images': {'$elemMatch': image_match}}},
+            {'$unwind': '$Images'},
+            {'$match': {f'Images.{k}': v for k, v in image_match.items()}},
+            {'$project': {'_id': 0, 'key': f'$Images.{group_field}'}}
+        ]
+
+    # Unwind every collection inside MongoDB; only per-key counts come back
+    first, *others = LOCATION_COLLECTIONS
+    pipeline = approved_images()
+    for collection_name in others:
+        pipeline.append({'$unionWith': {'coll': collection_name, 'pipeline': approved_images()}})
+    pipeline.append({'$group': {'_id': '$key', 'count': {'$sum': 1}}})
+
+    return {result['_id']: result['count'] for result in get_collection(first).aggregate(pipeline)}
+
+
+UPLOAD_COUNTERS = {
+    'python': _count_uploads_python,
+    'pipeline': _count_uploads_pipeline
+}
+
+
+def count_approved_uploads(group_field='username', match_value=None, mode=None):
+    """
+    Counts approved images per username (or per device_id) across all
+    location collections. UPLOAD_STATS_MODE selects between the
+    $unwind/$unionWith aggregation ('pipeline') and the original Python loop
+    ('python') so the two can be benchmarked against each other.
+    """
+    mode = mode or UPLOAD_STATS_MODE
+    if mode not in UPLOAD_COUNTERS:
+        raise ValueError(f"UPLOAD_STATS_MODE must be one of: {', '.join(UPLOAD_COUNTERS)}")
+    return UPLOAD_COUNTERS[mode](group_field, match_value)
+
+
+def rebuild_leaderboard():
+    """
+    Recomputes the leaderboard from the raw votes and the Images arrays, then
+    swaps it in with a single rename. Returns the number of users written.
+    """
+    vote_counts = {
+        result['_id']: result['vote_count']
+        for result in get_collection('votes').aggregate([
+            {'$match': {'username': {'$ne': None, '$exists': True}}},
+            {'$group': {'_id': '$username', 'vote_count': {'$sum': 1}}}
+        ])
+    }
+    upload_counts = count_approved_uploads('username')
+
+    docs = [
+        {
+            '_id': username,
+            'vote_count': vote_counts.get(username, 0),
+            'approved_uploads': upload_counts.get(username, 0),
+            'points': vote_counts.get(username, 0) * VOTE_POINTS + upload_counts.get(username, 0) * UPLOAD_POINTS
+        }
+        for username in set(vote_counts) | set(upload_counts)
+    ]
+
+    staging = get_collection(LEADERBOARD_COLLECTION + '-rebuild')
+    staging.drop()
+    if docs:
+        staging.insert_many(docs)
+        staging.create_index(LEADERBOARD_SORT)
+        staging.rename(LEADERBOARD_COLLECTION, dropTarget=True)
+    else:
+        get_collection(LEADERBOARD_COLLECTION).delete_many({})
+    return len(docs)
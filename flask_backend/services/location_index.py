@@ -0,0 +1,110 @@
+from services.db_service import get_collection
+from services.cache_service import get_version
+from services.spatial_index import KDTree, project, haversine_m
+import threading
+import logging
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+# Snapshots reload when the collection version changes, and at the latest after this
+SNAPSHOT_TTL_SECONDS = int(os.getenv("LOCATION_INDEX_TTL_SECONDS", 600))
+
+SNAPSHOT_PROJECTION = {
+    "_id": 1,
+    "Location_Lat": 1,
+    "Location_Lon": 1,
+    "Accessibility_Type_Name": 1,
+    "Metadata.name": 1,
+    "Tags.name": 1
+}
+
+_snapshots = {}
+_lock = threading.Lock()
+
+
+def location_name(doc):
+    """Gets a location's name from either Metadata or Tags."""
+    for key in ("Metadata", "Tags"):
+        value = doc.get(key)
+        if isinstance(value, dict) and value.get("name"):
+            return value["name"]
+    return None
+
+
+class LocationSnapshot:
+    """Light-weight copy of one location collection with a spatial index over it."""
+
+    def __init__(self, collection_name, points, version):
+        self.collection_name = collection_name
+        self.version = version
+        self.points = points
+        self.tree = KDTree([project(p["Location_Lat"], p["Location_Lon"]) for p in points])
+        # Per zoom level tile payloads, filled lazily by tile_service
+        self.tiles = {}
+        self.loaded_at = time.monotonic()
+
+    def is_stale(self, version):
+        return (self.version != version or
+                time.monotonic() - self.loaded_at > SNAPSHOT_TTL_SECONDS)
+
+
+def _load_snapshot(collection_name, version):
+    points = []
+    cursor = get_collection(collection_name).find(
+        {"Location_Lat": {"$type": "number"}, "Location_Lon": {"$type": "number"}},
+        SNAPSHOT_PROJECTION
+    )
+    for doc in cursor:
+        points.append({
+            "id": str(doc["_id"]),
+            "name": location_name(doc),
+            "Accessibility_Type_Name": doc.get("Accessibility_Type_Name"),
+            "Location_Lat": doc["Location_Lat"],
+            "Location_Lon": doc["Location_Lon"]
+        })
+    logger.info(f"Loaded {len(points)} '{collection_name}' points into the spatial index.")
+    return LocationSnapshot(collection_name, points, version)
+
+
+def get_snapshot(collection_name):
+    """Returns the current snapshot for a collection, (re)loading it if needed."""
+    version = get_version(collection_name)
+    snapshot = _snapshots.get(collection_name)
+    if snapshot is not None and not snapshot.is_stale(version):
+        return snapshot
+
+    with _lock:
+        snapshot = _snapshots.get(collection_name)
+        if snapshot is None or snapshot.is_stale(version):
+            snapshot = _load_snapshot(collection_name, version)
+            _snapshots[collection_name] = snapshot
+        return snapshot
+
+
+def invalidate(collection_name=None):
+    """Drops one (or every) snapshot so the next lookup reloads it."""
+    with _lock:
+        if collection_name is None:
+            _snapshots.clear()
+        else:
+            _snapshots.pop(collection_name, None)
+
+
+def find_nearest(lat, lon, collections, k):
+    """
+    Returns the k closest facilities to (lat, lon) across the given collections.
+    `collections` maps a type label to a collection name.
+    """
+    x, y = project(lat, lon)
+    candidates = []
+    for type_label, collection_name in collections.items():
+        snapshot = get_snapshot(collection_name)
+        for _, i in snapshot.tree.nearest(x, y, k):
+            point = snapshot.points[i]
+            distance = haversine_m(lat, lon, point["Location_Lat"], point["Location_Lon"])
+            candidates.append({**point, "type": type_label, "distance_m": round(distance, 1)})
+
+    candidates.sort(key=lambda c: c["distance_m"])
+    return candidates[:k]
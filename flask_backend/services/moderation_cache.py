@@ -0,0 +1,61 @@
+from collections import OrderedDict
+import threading
+import time
+import os
+
+# Re-uploads of the same photo have the same S3 ETag (the MD5 of the body for
+# single-part uploads), so one Rekognition verdict serves all of them
+MODERATION_CACHE_TTL_SECONDS = int(os.getenv("MODERATION_CACHE_TTL_SECONDS", 24 * 3600))
+MODERATION_CACHE_MAX_ENTRIES = int(os.getenv("MODERATION_CACHE_MAX_ENTRIES", 10000))
+
+_results = OrderedDict()  # (etag, min_confidence) -> (is_clean, stored_at)
+_stats = {"hits": 0, "misses": 0}
+_lock = threading.Lock()
+
+
+def _cache_key(etag, min_confidence):
+    return (etag.strip('"'), float(min_confidence))
+
+
+def get_result(etag, min_confidence):
+    """Returns the cached is_clean verdict for an object's ETag, or None."""
+    cache_key = _cache_key(etag, min_confidence)
+    with _lock:
+        entry = _results.get(cache_key)
+        if entry is not None and time.monotonic() - entry[1] < MODERATION_CACHE_TTL_SECONDS:
+            _results.move_to_end(cache_key)
+            _stats["hits"] += 1
+            return entry[0]
+        if entry is not None:
+            del _results[cache_key]
+        _stats["misses"] += 1
+        return None
+
+
+def store_result(etag, min_confidence, is_clean):
+    cache_key = _cache_key(etag, min_confidence)
+    with _lock:
+        _results[cache_key] = (is_clean, time.monotonic())
+        _results.move_to_end(cache_key)
+        while len(_results) > MODERATION_CACHE_MAX_ENTRIES:
+            _results.popitem(last=False)
+
+
+def get_stats():
+    """Hit/miss counters for this process since it started (or since clear())."""
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {
+            "hits": _stats["hits"],
+            "misses": _stats["misses"],
+            "hit_rate": _stats["hits"] / lookups if lookups else 0.0,
+            "entries": len(_results),
+            "max_entries": MODERATION_CACHE_MAX_ENTRIES,
+            "ttl_seconds": MODERATION_CACHE_TTL_SECONDS
+        }
+
+
+def clear():
+    with _lock:
+        _results.clear()
+        _stats["hits"] = _stats["misses"] = 0
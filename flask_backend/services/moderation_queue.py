@@ -0,0 +1,213 @@
+from pymongo import ASCENDING, ReturnDocument
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime, timedelta
+from services.db_service import get_collection
+from services.moderation_service import ModerationError, moderate_upload
+import threading
+import random
+import os
+
+# {_id, status, payload, attempts, max_attempts, available_at, lease_expires_at,
+#  result, error, created_at, updated_at}
+MODERATION_JOBS_COLLECTION = 'moderation-jobs'
+
+QUEUED, RUNNING, DONE, REJECTED, FAILED = 'queued', 'running', 'done', 'rejected', 'failed'
+
+# Threads per process processing jobs; 0 leaves them to `flask upload moderation-worker`
+MODERATION_WORKERS = int(os.getenv('MODERATION_WORKERS', 2))
+MAX_ATTEMPTS = int(os.getenv('MODERATION_MAX_ATTEMPTS', 5))
+# A claimed job is handed to another worker if not finished within the lease
+LEASE_SECONDS = int(os.getenv('MODERATION_LEASE_SECONDS', 120))
+RETRY_BASE_SECONDS = float(os.getenv('MODERATION_RETRY_BASE_SECONDS', 5))
+RETRY_MAX_SECONDS = float(os.getenv('MODERATION_RETRY_MAX_SECONDS', 300))
+# How long an idle worker sleeps before looking for retries that became due
+POLL_SECONDS = float(os.getenv('MODERATION_POLL_SECONDS', 2))
+
+
+def ensure_job_indexes():
+    jobs = get_collection(MODERATION_JOBS_COLLECTION)
+    jobs.create_index([('status', ASCENDING), ('available_at', ASCENDING)])
+    jobs.create_index([('status', ASCENDING), ('lease_expires_at', ASCENDING)])
+
+
+def _timestamp(value):
+    return value.isoformat() + "Z" if value else None
+
+
+def job_view(job):
+    """The job as returned by the status endpoint."""
+    return {
+        'job_id': str(job['_id']),
+        'status': job['status'],
+        'attempts': job['attempts'],
+        'result': job.get('result'),
+        'error': job.get('error'),
+        'created_at': _timestamp(job.get('created_at')),
+        'updated_at': _timestamp(job.get('updated_at'))
+    }
+
+
+def enqueue(payload):
+    """Stores a moderation job and wakes a worker. Returns the job document."""
+    now = datetime.utcnow()
+    job = {
+        'status': QUEUED,
+        'payload': payload,
+        'attempts': 0,
+        'max_attempts': MAX_ATTEMPTS,
+        'available_at': now,
+        'lease_expires_at': None,
+        'result': None,
+        'error': None,
+        'created_at': now,
+        'updated_at': now
+    }
+    job['_id'] = get_collection(MODERATION_JOBS_COLLECTION).insert_one(job).inserted_id
+    workers.notify()
+    return job
+
+
+def get_job(job_id):
+    """Returns the job document, or None. Raises ValueError on a malformed id."""
+    try:
+        job_id = ObjectId(job_id)
+    except (InvalidId, TypeError):
+        raise ValueError('Invalid job id')
+    return get_collection(MODERATION_JOBS_COLLECTION).find_one({'_id': job_id})
+
+
+def claim_job():
+    """
+    Atomically takes the oldest job that is due, or one whose worker's lease
+    ran out, and leases it to the caller. Returns None when there is nothing to do.
+    """
+    now = datetime.utcnow()
+    return get_collection(MODERATION_JOBS_COLLECTION).find_one_and_update(
+        {'$or': [
+            {'status': QUEUED, 'available_at': {'$lte': now}},
+            {'status': RUNNING, 'lease_expires_at': {'$lte': now}}
+        ]},
+        {
+            '$set': {
+                'status': RUNNING,
+                'lease_expires_at': now + timedelta(seconds=LEASE_SECONDS),
+                'updated_at': now
+            },
+            '$inc': {'attempts': 1}
+        },
+        sort=[('available_at', ASCENDING)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter, in seconds, after the given number of attempts."""
+    delay = min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _finish(job, fields):
+    fields['lease_expires_at'] = None
+    fields['updated_at'] = datetime.utcnow()
+    # Only the worker that still holds the lease may record the outcome
+    get_collection(MODERATION_JOBS_COLLECTION).update_one(
+        {'_id': job['_id'], 'status': RUNNING, 'attempts': job['attempts']},
+        {'$set': fields}
+    )
+
+
+def run_job(job):
+    """Runs one claimed job and records its outcome, scheduling a retry on transient errors."""
+    if job['attempts'] > job['max_attempts']:
+        _finish(job, {'status': FAILED, 'error': job.get('error') or 'Too many attempts'})
+        return
+
+    try:
+        result = moderate_upload(job['payload'])
+    except ModerationError as e:
+        _finish(job, {'status': FAILED, 'error': str(e)})
+    except Exception as e:
+        if job['attempts'] >= job['max_attempts']:
+            _finish(job, {'status': FAILED, 'error': str(e)})
+        else:
+            _finish(job, {
+                'status': QUEUED,
+                'error': str(e),
+                'available_at': datetime.utcnow() + timedelta(seconds=retry_delay(job['attempts']))
+            })
+    else:
+        _finish(job, {
+            'status': DONE if result['is_clean'] else REJECTED,
+            'result': result,
+            'error': None
+        })
+
+
+def process_available_jobs():
+    """Runs due jobs until there are none left. Returns how many were run."""
+    processed = 0
+    job = claim_job()
+    while job:
+        run_job(job)
+        processed += 1
+        job = claim_job()
+    return processed
+
+
+class ModerationWorkers:
+    """
+    A fixed number of threads draining the jobs collection, which caps how many
+    moderations run at once per process. Threads are started lazily and again
+    after a fork, since they do not survive into a forked worker process.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+
+    def running(self):
+        return self._pid == os.getpid() and bool(self._threads) and all(t.is_alive() for t in self._threads)
+
+    def start(self):
+        if self.size <= 0 or self.running():
+            return
+        with self._lock:
+            if self.running():
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._threads = [
+                threading.Thread(target=self._run, name=f'moderation-worker-{i}', daemon=True)
+                for i in range(self.size)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def notify(self):
+        self.start()
+        self._wakeup.set()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                processed = process_available_jobs()
+            except Exception as e:
+                print("Moderation worker error:", e)
+                processed = 0
+            if not processed:
+                self._wakeup.wait(POLL_SECONDS)
+                self._wakeup.clear()
+
+
+workers = ModerationWorkers(MODERATION_WORKERS)
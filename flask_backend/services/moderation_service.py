@@ -0,0 +1,188 @@
+from botocore.exceptions import ClientError
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime
+from services.db_service import get_collection
+from services.geo_service import GEO_FIELD, ensure_geo_index
+from services.rekognition_service import moderate_image_s3
+from services.aws_clients import get_s3_client
+from services.sync_service import SEQ_FIELD, reserve_sequence
+from services.upload_index_service import record_upload
+import os
+
+# Map of accessibility types to collection names
+COLLECTION_MAP = {
+    'healthcare': 'medical-victoria',
+    'toilet': 'toilets-victoria',
+    'toilets': 'toilets-victoria',
+    'train': 'trains-victoria',
+    'trains': 'trains-victoria',
+    'tram': 'trams-victoria',
+    'trams': 'trams-victoria'
+}
+
+# Canonical Accessibility_Type_Name of each location collection
+COLLECTION_TYPES = {
+    'medical-victoria': 'healthcare',
+    'toilets-victoria': 'toilets',
+    'trains-victoria': 'trains',
+    'trams-victoria': 'trams'
+}
+
+# How far an upload's coordinates may be from the location they belong to
+LOCATION_MATCH_TOLERANCE_M = float(os.getenv('LOCATION_MATCH_TOLERANCE_M', 25))
+
+MISSING_OBJECT_CODES = {'404', 'NoSuchKey', 'NotFound'}
+
+
+class ModerationError(Exception):
+    """An upload that can never be moderated successfully; retrying will not help."""
+
+
+def resolve_collection_name(accessibility_type):
+    """Raises ModerationError for an unknown accessibility type."""
+    collection_name = COLLECTION_MAP.get((accessibility_type or '').lower())
+    if not collection_name:
+        raise ModerationError(f'Invalid accessibility type: {accessibility_type}')
+    return collection_name
+
+
+def parse_coordinates(latitude, longitude):
+    """Returns (lat, lon) as floats. Raises ValueError."""
+    try:
+        lat, lon = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        raise ValueError('latitude and longitude must be numbers')
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError('latitude/longitude are out of range')
+    return lat, lon
+
+
+def validate_upload(payload):
+    """Checks a moderation request before it is queued. Raises ModerationError."""
+    if not payload.get('bucket_name') or not payload.get('s3_key') or not payload.get('public_url'):
+        raise ModerationError('bucket_name, s3_key and public_url are required')
+    if not payload.get('accessibility_type') or not (
+            payload.get('location_id') or (payload.get('latitude') and payload.get('longitude'))):
+        raise ModerationError('accessibility_type and either location_id or latitude and longitude are required to update Images array')
+    resolve_collection_name(payload['accessibility_type'])
+    if not payload.get('location_id'):
+        try:
+            parse_coordinates(payload['latitude'], payload['longitude'])
+        except ValueError as e:
+            raise ModerationError(str(e))
+
+
+def find_upload_location(collection, location_id=None, latitude=None, longitude=None):
+    """
+    Resolves the location an upload belongs to: by its id (the `id` the
+    location endpoints return with ?include=id) when given, otherwise the
+    nearest location within LOCATION_MATCH_TOLERANCE_M of the coordinates,
+    found on the 2dsphere index. Returns None when nothing matches.
+    Raises ValueError on a malformed id or coordinates.
+    """
+    if location_id:
+        try:
+            return collection.find_one({'_id': ObjectId(location_id)})
+        except (InvalidId, TypeError):
+            raise ValueError(f'Invalid location_id: {location_id}')
+
+    lat, lon = parse_coordinates(latitude, longitude)
+    ensure_geo_index(collection)
+    return collection.find_one({GEO_FIELD: {'$nearSphere': {
+        '$geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+        '$maxDistance': LOCATION_MATCH_TOLERANCE_M
+    }}})
+
+
+def normalize_location_types():
+    """
+    Rewrites Accessibility_Type_Name to its canonical name in every location
+    collection (e.g. 'toilet' -> 'toilets'). Returns {collection_name: modified}.
+    """
+    modified = {}
+    for collection_name, type_name in COLLECTION_TYPES.items():
+        collection = get_collection(collection_name)
+        query = {'Accessibility_Type_Name': {'$ne': type_name}}
+        if not collection.count_documents(query, limit=1):
+            modified[collection_name] = 0
+            continue
+        with reserve_sequence(collection_name) as seq:
+            result = collection.update_many(query, {'$set': {
+                'Accessibility_Type_Name': type_name,
+                SEQ_FIELD: seq
+            }})
+        modified[collection_name] = result.modified_count
+    return modified
+
+
+def moderate_upload(payload):
+    """
+    Moderates an image that was uploaded to S3 and, if it is clean, adds it to
+    the location's Images array as pending admin approval. Returns
+    {'is_clean', 'message'}. Raises ModerationError for permanent failures;
+    any other exception (S3, Rekognition, Mongo) is worth retrying.
+    Safe to run again for the same upload: the image is only pushed once.
+    """
+    # Jobs queued before a validation rule existed fail here instead of retrying
+    validate_upload(payload)
+    bucket_name = payload['bucket_name']
+    s3_key = payload['s3_key']
+
+    # 1. Confirm object exists
+    s3_client = get_s3_client()
+    try:
+        head = s3_client.head_object(Bucket=bucket_name, Key=s3_key)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in MISSING_OBJECT_CODES:
+            raise ModerationError(f'File not found in S3: {e}')
+        raise
+
+    # 2. Moderate image (re-uploads of the same content reuse the cached verdict)
+    if not moderate_image_s3(bucket_name, s3_key, etag=head.get('ETag')):
+        s3_client.delete_object(Bucket=bucket_name, Key=s3_key)
+        return {'is_clean': False, 'message': 'Image failed moderation and was deleted.'}
+
+    # 3. Add image object to Images array (only if clean)
+    collection_name = resolve_collection_name(payload['accessibility_type'])
+    collection = get_collection(collection_name)
+    try:
+        location = find_upload_location(
+            collection, payload.get('location_id'), payload.get('latitude'), payload.get('longitude')
+        )
+    except ValueError as e:
+        raise ModerationError(str(e))
+    if not location:
+        raise ModerationError('No matching location found')
+
+    public_url = payload['public_url']
+    for image in location.get('Images', []):
+        if image.get('s3_key') == s3_key or image.get('image_url') == public_url:
+            # Pushed by an earlier attempt of this job
+            record_upload(collection_name, location, image)
+            return {'is_clean': True, 'message': 'Image uploaded and added to Images array.'}
+
+    image_data = {
+        "image_id": str(ObjectId()),  # Stable handle for approvals; array positions can shift
+        "image_url": public_url,
+        "s3_key": s3_key,
+        "image_upload_time": datetime.utcnow().isoformat() + "Z",
+        "approved_status": False,  # Always False, pending admin approval
+        "image_approved_time": None,
+        "device_id": payload.get('device_id'),
+        "username": payload.get('username'),
+    }
+
+    # A retried job must not push the same image twice
+    with reserve_sequence(collection_name) as seq:
+        result = collection.update_one(
+            {'_id': location['_id'], 'Images.s3_key': {'$ne': s3_key}, 'Images.image_url': {'$ne': public_url}},
+            {
+                '$push': {'Images': image_data},
+                '$set': {SEQ_FIELD: seq}
+            }
+        )
+    if result.modified_count:
+        record_upload(collection_name, location, image_data)
+
+    return {'is_clean': True, 'message': 'Image uploaded and added to Images array.'}
@@ -1,19 +1,21 @@
-import boto3
-import os
+from services.aws_clients import get_rekognition_client
+from services import moderation_cache
 
-def moderate_image_s3(bucket_name, image_key, min_confidence=80):
+def moderate_image_s3(bucket_name, image_key, min_confidence=80, etag=None):
     """
     Checks an image in S3 for inappropriate content using AWS Rekognition.
     Returns (is_clean, labels):
       - is_clean: True if no inappropriate content, False otherwise
       - labels: List of moderation labels (if any)
+    When the object's ETag is given, a cached verdict for the same content
+    and min_confidence is returned without calling Rekognition.
     """
-    rekognition = boto3.client(
-        'rekognition',
-        aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
-        aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY'),
-        region_name=os.environ.get('S3_REGION')
-    )
+    if etag:
+        cached = moderation_cache.get_result(etag, min_confidence)
+        if cached is not None:
+            return cached
+
+    rekognition = get_rekognition_client()
     response = rekognition.detect_moderation_labels(
         Image={
             'S3Object': {
@@ -25,4 +27,6 @@ def moderate_image_s3(bucket_name, image_key, min_confidence=80):
     )
     labels = response.get('ModerationLabels', [])
     is_clean = len(labels) == 0
+    if etag:
+        moderation_cache.store_result(etag, min_confidence, is_clean)
     return is_clean 
\ No newline at end of file
@@ -0,0 +1,314 @@
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, UpdateOne
+from pymongo.errors import BulkWriteError
+from bson import ObjectId
+from services.db_service import get_collection
+from services.geo_service import bbox_polygon, parse_bbox
+from services.write_buffer import BufferFull, WriteBuffer
+import datetime
+import atexit
+import math
+import os
+
+REPORTS_COLLECTION = "reports-victoria"
+# {cell_x, cell_y, hour, issue_type, count}: reports per grid cell, hour and issue type
+HOTSPOTS_COLLECTION = "report-hotspots"
+# rebuild_hotspots builds and indexes the counts here before swapping them in
+HOTSPOTS_REBUILD_COLLECTION = "report-hotspots-rebuild"
+
+# 'buffered' batches inserts in the background; 'sync' inserts within the request (tests, debugging)
+REPORT_WRITE_MODE = os.getenv("REPORT_WRITE_MODE", "buffered")
+REPORT_BUFFER_MAX = int(os.getenv("REPORT_BUFFER_MAX", 1000))
+REPORT_BATCH_SIZE = int(os.getenv("REPORT_BATCH_SIZE", 100))
+REPORT_FLUSH_SECONDS = float(os.getenv("REPORT_FLUSH_SECONDS", 1.0))
+
+# GeoJSON point built from a report's optional latitude/longitude
+REPORT_GEO_FIELD = "location"
+# Hotspot grid cell size in degrees (0.01 is roughly 1.1km x 0.9km in Melbourne)
+HOTSPOT_CELL_DEG = float(os.getenv("HOTSPOT_CELL_DEG", 0.01))
+DEFAULT_HOTSPOT_HOURS = 24
+MAX_ISSUE_TYPE_LENGTH = 64
+DEFAULT_REPORT_LIMIT = 100
+MAX_REPORT_LIMIT = 1000
+
+# Fields the read API returns; device ids and usernames stay private
+REPORT_PROJECTION = {
+    "issue_type": 1,
+    "issues": 1,
+    "knowledge_source": 1,
+    "timestamp": 1,
+    REPORT_GEO_FIELD: 1
+}
+
+DUPLICATE_KEY_ERROR = 11000
+
+# Set by the server; client values for these are discarded
+SERVER_FIELDS = ("_id", "timestamp", REPORT_GEO_FIELD)
+
+
+def ensure_report_indexes():
+    reports = get_collection(REPORTS_COLLECTION)
+    # bbox + time window (+ issue type); reports without a location are left out
+    reports.create_index([(REPORT_GEO_FIELD, GEOSPHERE), ("timestamp", DESCENDING), ("issue_type", ASCENDING)])
+    reports.create_index([("issue_type", ASCENDING), ("timestamp", DESCENDING)])
+    reports.create_index([("timestamp", DESCENDING)])
+
+    _ensure_hotspot_indexes(get_collection(HOTSPOTS_COLLECTION))
+
+
+def _ensure_hotspot_indexes(hotspots):
+    hotspots.create_index(
+        [("cell_x", ASCENDING), ("cell_y", ASCENDING), ("hour", ASCENDING), ("issue_type", ASCENDING)],
+        unique=True
+    )
+    hotspots.create_index([("hour", ASCENDING), ("cell_y", ASCENDING), ("cell_x", ASCENDING)])
+
+
+def hotspot_cell(lon, lat):
+    return math.floor(lon / HOTSPOT_CELL_DEG), math.floor(lat / HOTSPOT_CELL_DEG)
+
+
+def _hotspot_key(report):
+    lon, lat = report[REPORT_GEO_FIELD]["coordinates"]
+    cell_x, cell_y = hotspot_cell(lon, lat)
+    hour = report["timestamp"].replace(minute=0, second=0, microsecond=0)
+    return cell_x, cell_y, hour, report.get("issue_type")
+
+
+def record_hotspots(reports):
+    """Adds newly inserted reports to the hotspot counts with one bulk write."""
+    counts = {}
+    for report in reports:
+        if report.get(REPORT_GEO_FIELD):
+            key = _hotspot_key(report)
+            counts[key] = counts.get(key, 0) + 1
+    if not counts:
+        return
+    get_collection(HOTSPOTS_COLLECTION).bulk_write([
+        UpdateOne(
+            {"cell_x": cell_x, "cell_y": cell_y, "hour": hour, "issue_type": issue_type},
+            {"$inc": {"count": count}},
+            upsert=True
+        )
+        for (cell_x, cell_y, hour, issue_type), count in counts.items()
+    ], ordered=False)
+
+
+def insert_reports(reports):
+    """
+    Inserts a batch of reports and counts them into the hotspots. Their _ids
+    are assigned up front, so on a retry the reports that already made it in
+    fail with duplicate keys and are neither inserted nor counted again.
+    Reports rejected for other reasons raise after the rest are counted.
+    """
+    inserted = reports
+    try:
+        get_collection(REPORTS_COLLECTION).insert_many(reports, ordered=False)
+    except BulkWriteError as e:
+        failed = {error["index"] for error in e.details["writeErrors"]}
+        inserted = [report for i, report in enumerate(reports) if i not in failed]
+        if any(error["code"] != DUPLICATE_KEY_ERROR for error in e.details["writeErrors"]):
+            # Count what did go in now; on the retry those are duplicates and skipped
+            record_hotspots(inserted)
+            raise
+    record_hotspots(inserted)
+
+
+report_buffer = WriteBuffer(
+    insert_reports,
+    max_size=REPORT_BUFFER_MAX,
+    batch_size=REPORT_BATCH_SIZE,
+    flush_seconds=REPORT_FLUSH_SECONDS,
+    name='report-buffer'
+)
+atexit.register(report_buffer.close)
+
+
+def _report_location(data):
+    """GeoJSON point from optional latitude/longitude, or None. Raises ValueError."""
+    latitude, longitude = data.pop("latitude", None), data.pop("longitude", None)
+    if latitude is None and longitude is None:
+        return None
+    try:
+        lat, lon = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        raise ValueError("latitude and longitude must both be numbers")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError("latitude/longitude are out of range")
+    return {"type": "Point", "coordinates": [lon, lat]}
+
+
+def _issue_type(value):
+    """The report's issue type, stripped. Raises ValueError."""
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError("issue_type must be a non-empty string")
+    if len(value.strip()) > MAX_ISSUE_TYPE_LENGTH:
+        raise ValueError(f"issue_type must be at most {MAX_ISSUE_TYPE_LENGTH} characters")
+    return value.strip()
+
+
+def submit_report(data):
+    """
+    Timestamps a report and queues it for insertion (or inserts it now in
+    'sync' mode). Returns the report id. Raises BufferFull, and ValueError on
+    a bad issue type or coordinates.
+    """
+    report = {name: value for name, value in data.items() if name not in SERVER_FIELDS}
+    report["issue_type"] = _issue_type(report.get("issue_type"))
+    report["_id"] = ObjectId()
+    location = _report_location(report)
+    if location:
+        report[REPORT_GEO_FIELD] = location
+    # Add a timestamp automatically
+    report["timestamp"] = datetime.datetime.utcnow()
+
+    if REPORT_WRITE_MODE == "sync":
+        insert_reports([report])
+    else:
+        report_buffer.submit(report)
+    return str(report["_id"])
+
+
+def parse_time(value):
+    """Parses an ISO 8601 timestamp into naive UTC. Raises ValueError."""
+    try:
+        parsed = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid timestamp: {value}")
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def parse_report_query(args, default_hours=None):
+    """
+    Reads bbox, since, until and issue_type from request args. Without
+    since, default_hours (if given) limits the window to the last hours.
+    Raises ValueError.
+    """
+    query = {
+        "bbox": parse_bbox(args["bbox"]) if args.get("bbox") else None,
+        "since": parse_time(args["since"]) if args.get("since") else None,
+        "until": parse_time(args["until"]) if args.get("until") else None,
+        "issue_type": args.get("issue_type") or None
+    }
+    if query["since"] is None and default_hours:
+        query["since"] = (query["until"] or datetime.datetime.utcnow()) - datetime.timedelta(hours=default_hours)
+    if query["since"] and query["until"] and query["since"] >= query["until"]:
+        raise ValueError("since must be before until")
+    return query
+
+
+def _time_range(since, until):
+    time_range = {}
+    if since:
+        time_range["$gte"] = since
+    if until:
+        time_range["$lt"] = until
+    return time_range
+
+
+def _report_view(report):
+    view = {
+        "report_id": str(report["_id"]),
+        "timestamp": report["timestamp"].isoformat() + "Z",
+        "issue_type": report.get("issue_type"),
+        "issues": report.get("issues", []),
+        "knowledge_source": report.get("knowledge_source")
+    }
+    if report.get(REPORT_GEO_FIELD):
+        view["longitude"], view["latitude"] = report[REPORT_GEO_FIELD]["coordinates"]
+    return view
+
+
+def find_reports(query, limit=DEFAULT_REPORT_LIMIT):
+    """Most recent reports matching a parse_report_query query."""
+    mongo_query = {}
+    if query["bbox"]:
+        mongo_query[REPORT_GEO_FIELD] = {"$geoWithin": {"$geometry": bbox_polygon(*query["bbox"])}}
+    time_range = _time_range(query["since"], query["until"])
+    if time_range:
+        mongo_query["timestamp"] = time_range
+    if query["issue_type"]:
+        mongo_query["issue_type"] = query["issue_type"]
+
+    cursor = get_collection(REPORTS_COLLECTION).find(mongo_query, REPORT_PROJECTION) \
+        .sort("timestamp", DESCENDING).limit(limit)
+    return [_report_view(report) for report in cursor]
+
+
+def find_hotspots(query, limit=DEFAULT_REPORT_LIMIT):
+    """
+    Report counts per grid cell over the query's window, busiest first,
+    read from the precomputed hourly cells instead of the reports.
+    """
+    match = {}
+    hour_range = _time_range(
+        query["since"].replace(minute=0, second=0, microsecond=0) if query["since"] else None,
+        query["until"]
+    )
+    if hour_range:
+        match["hour"] = hour_range
+    if query["bbox"]:
+        min_lon, min_lat, max_lon, max_lat = query["bbox"]
+        (min_x, min_y), (max_x, max_y) = hotspot_cell(min_lon, min_lat), hotspot_cell(max_lon, max_lat)
+        match["cell_x"] = {"$gte": min_x, "$lte": max_x}
+        match["cell_y"] = {"$gte": min_y, "$lte": max_y}
+    if query["issue_type"]:
+        match["issue_type"] = query["issue_type"]
+
+    results = get_collection(HOTSPOTS_COLLECTION).aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": {"x": "$cell_x", "y": "$cell_y", "issue_type": "$issue_type"},
+            "count": {"$sum": "$count"}
+        }},
+        {"$group": {
+            "_id": {"x": "$_id.x", "y": "$_id.y"},
+            "count": {"$sum": "$count"},
+            "issue_types": {"$push": {"issue_type": "$_id.issue_type", "count": "$count"}}
+        }},
+        {"$sort": {"count": -1}},
+        {"$limit": limit}
+    ])
+    return [
+        {
+            "latitude": round((result["_id"]["y"] + 0.5) * HOTSPOT_CELL_DEG, 6),
+            "longitude": round((result["_id"]["x"] + 0.5) * HOTSPOT_CELL_DEG, 6),
+            "count": result["count"],
+            "issue_types": {item["issue_type"] or "unknown": item["count"] for item in result["issue_types"]}
+        }
+        for result in results
+    ]
+
+
+def rebuild_hotspots():
+    """
+    Recomputes the hotspot counts from the reports into a separate
+    collection, indexes it, and renames it over the live one, so the unique
+    cell index is never missing. Returns the number of cells written.
+    """
+    get_collection(REPORTS_COLLECTION).aggregate([
+        {"$match": {REPORT_GEO_FIELD: {"$exists": True}}},
+        {"$group": {
+            "_id": {
+                "cell_x": {"$floor": {"$divide": [{"$arrayElemAt": [f"${REPORT_GEO_FIELD}.coordinates", 0]}, HOTSPOT_CELL_DEG]}},
+                "cell_y": {"$floor": {"$divide": [{"$arrayElemAt": [f"${REPORT_GEO_FIELD}.coordinates", 1]}, HOTSPOT_CELL_DEG]}},
+                "hour": {"$dateTrunc": {"date": "$timestamp", "unit": "hour"}},
+                "issue_type": "$issue_type"
+            },
+            "count": {"$sum": 1}
+        }},
+        {"$project": {
+            "_id": 0,
+            "cell_x": {"$toInt": "$_id.cell_x"},
+            "cell_y": {"$toInt": "$_id.cell_y"},
+            "hour": "$_id.hour",
+            "issue_type": "$_id.issue_type",
+            "count": 1
+        }},
+        {"$out": HOTSPOTS_REBUILD_COLLECTION}
+    ])
+    rebuilt = get_collection(HOTSPOTS_REBUILD_COLLECTION)
+    _ensure_hotspot_indexes(rebuilt)
+    rebuilt.rename(HOTSPOTS_COLLECTION, dropTarget=True)
+    return get_collection(HOTSPOTS_COLLECTION).estimated_document_count()
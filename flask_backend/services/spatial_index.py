@@ -0,0 +1,79 @@
+from heapq import heappush, heapreplace
+import math
+
+EARTH_RADIUS_M = 6371000
+# Victoria spans a few degrees of latitude, so a single reference latitude
+# keeps the equirectangular projection accurate enough for ranking neighbours
+REFERENCE_LAT = -37.0
+_COS_REF = math.cos(math.radians(REFERENCE_LAT))
+
+
+def project(lat, lon):
+    """Projects lat/lon to planar metres (equirectangular around REFERENCE_LAT)."""
+    return (
+        EARTH_RADIUS_M * math.radians(lon) * _COS_REF,
+        EARTH_RADIUS_M * math.radians(lat)
+    )
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+class KDTree:
+    """
+    Static 2-d tree over planar (x, y) points.
+    Nodes are (point_index, axis, left, right) tuples.
+    """
+
+    def __init__(self, points):
+        self.points = points
+        self.root = self._build(list(range(len(points))), 0)
+
+    def __len__(self):
+        return len(self.points)
+
+    def _build(self, indexes, depth):
+        if not indexes:
+            return None
+        axis = depth % 2
+        indexes.sort(key=lambda i: self.points[i][axis])
+        mid = len(indexes) // 2
+        return (
+            indexes[mid],
+            axis,
+            self._build(indexes[:mid], depth + 1),
+            self._build(indexes[mid + 1:], depth + 1)
+        )
+
+    def nearest(self, x, y, k=1):
+        """Returns up to k (squared_distance, point_index) pairs, closest first."""
+        if k <= 0:
+            return []
+        heap = []  # max-heap on distance via negated keys
+        target = (x, y)
+
+        def visit(node):
+            if node is None:
+                return
+            i, axis, left, right = node
+            px, py = self.points[i]
+            dist = (px - x) ** 2 + (py - y) ** 2
+            if len(heap) < k:
+                heappush(heap, (-dist, i))
+            elif dist < -heap[0][0]:
+                heapreplace(heap, (-dist, i))
+
+            diff = target[axis] - self.points[i][axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            visit(near)
+            if len(heap) < k or diff * diff < -heap[0][0]:
+                visit(far)
+
+        visit(self.root)
+        return sorted((-d, i) for d, i in heap)
@@ -0,0 +1,54 @@
+from flask import Response, current_app, stream_with_context
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Documents fetched per Mongo round trip and serialized per yielded chunk
+DEFAULT_BATCH_SIZE = 500
+
+
+def iter_json_array(cursor, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Serializes a Mongo cursor as a JSON array, yielding one bytes chunk per
+    batch so only batch_size documents are held in memory at a time.
+    Must run inside an app context (uses the app's JSON provider).
+    """
+    cursor.batch_size(batch_size)
+    dumps = current_app.json.dumps
+
+    yield b"["
+    batch = []
+    first = True
+    for doc in cursor:
+        batch.append(dumps(doc, separators=(",", ":")))
+        if len(batch) >= batch_size:
+            yield (b"" if first else b",") + ",".join(batch).encode("utf-8")
+            batch = []
+            first = False
+    if batch:
+        yield (b"" if first else b",") + ",".join(batch).encode("utf-8")
+    yield b"]"
+
+
+def stream_json_array(cursor, key=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Returns a streaming application/json response for a Mongo cursor.
+    With key set, the array is wrapped as {"<key>": [...]}.
+
+    Headers (and the 200 status) are sent before the cursor is drained, so a
+    failure mid-stream can only be logged; the client sees truncated JSON.
+    """
+    def generate():
+        try:
+            if key:
+                yield b'{"' + key.encode("utf-8") + b'":'
+            yield from iter_json_array(cursor, batch_size)
+            if key:
+                yield b"}"
+        except Exception as e:
+            logger.error(f"Error while streaming JSON response: {e}")
+            raise
+        finally:
+            cursor.close()
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
@@ -0,0 +1,125 @@
+from services.db_service import get_collection
+from services.cache_service import bump_version, get_version
+from services.geo_service import GEO_FIELD
+from contextlib import contextmanager
+from bson import ObjectId
+from datetime import datetime, timedelta
+import os
+
+# Per-document change sequence, taken from the collection version at write time
+SEQ_FIELD = "Sync_Seq"
+TOMBSTONES_COLLECTION = "location-tombstones"
+# {collection, floor, reserved_at}: one per write in progress. Its sequence
+# is above floor, so cursors handed out stay at or below it until it is done
+RESERVATIONS_COLLECTION = "sync-reservations"
+# A reservation older than this belongs to a writer that died; it no longer holds cursors back
+RESERVATION_TIMEOUT_SECONDS = int(os.getenv("SYNC_RESERVATION_TIMEOUT_SECONDS", 300))
+
+DELTA_PROJECTION = {GEO_FIELD: 0, SEQ_FIELD: 0}
+
+# Collections whose sync indexes have already been ensured in this process
+_indexed_collections = set()
+
+
+@contextmanager
+def reserve_sequence(collection_name):
+    """
+    Reserves the sequence number for a write to location documents. The
+    write stores it under SEQ_FIELD inside the with block; until the block
+    exits, get_changes hands out cursors below it. The version is bumped
+    again on exit, after the write.
+
+        with reserve_sequence(name) as seq:
+            collection.update_one(..., {'$set': {SEQ_FIELD: seq}})
+    """
+    reservations = get_collection(RESERVATIONS_COLLECTION)
+    floor = get_version(collection_name, fresh=True)
+    reservation_id = reservations.insert_one({
+        "collection": collection_name,
+        "floor": floor,
+        "reserved_at": datetime.utcnow()
+    }).inserted_id
+    try:
+        yield bump_version(collection_name)
+    finally:
+        try:
+            # Responses cached between the reservation and the write hold the
+            # old documents under the reserved version; moving on invalidates them
+            bump_version(collection_name)
+        finally:
+            reservations.delete_one({"_id": reservation_id})
+
+
+def committed_sequence(collection_name):
+    """
+    Highest sequence below which every write has landed: the current version,
+    lowered to the floor of any write still in progress.
+    """
+    # Version first: a write it already counts is either still reserved or visible
+    version = get_version(collection_name, fresh=True)
+    pending = get_collection(RESERVATIONS_COLLECTION).find_one(
+        {
+            "collection": collection_name,
+            "reserved_at": {"$gt": datetime.utcnow() - timedelta(seconds=RESERVATION_TIMEOUT_SECONDS)}
+        },
+        sort=[("floor", 1)]
+    )
+    return min(version, pending["floor"]) if pending else version
+
+
+def ensure_sync_indexes(collection):
+    if collection.name in _indexed_collections:
+        return
+    collection.create_index(SEQ_FIELD, sparse=True)
+    get_collection(TOMBSTONES_COLLECTION).create_index([("collection", 1), ("seq", 1)])
+    get_collection(RESERVATIONS_COLLECTION).create_index([("collection", 1), ("floor", 1)])
+    _indexed_collections.add(collection.name)
+
+
+def remove_location(collection_name, location_id):
+    """Deletes a location document and leaves a tombstone for delta sync clients."""
+    collection = get_collection(collection_name)
+    result = collection.delete_one({"_id": ObjectId(location_id)})
+    if result.deleted_count == 0:
+        return False
+
+    with reserve_sequence(collection_name) as seq:
+        get_collection(TOMBSTONES_COLLECTION).insert_one({
+            "collection": collection_name,
+            "location_id": str(location_id),
+            "seq": seq,
+            "removed_at": datetime.utcnow()
+        })
+    return True
+
+
+def get_changes(collection, since, geo_filter=None):
+    """
+    Returns everything a client holding cursor `since` needs to catch up:
+      - cursor: the value to send as ?since= next time (see committed_sequence)
+      - updated: documents (with their id) added or modified after `since`
+      - removed: ids of documents deleted after `since`
+    since=0 returns the whole collection. An optional geo filter limits the
+    updated documents to an area; tombstones are not filtered.
+    """
+    ensure_sync_indexes(collection)
+    # Read the cursor before querying so nothing written meanwhile is skipped
+    cursor = committed_sequence(collection.name)
+
+    query = dict(geo_filter or {})
+    if since > 0:
+        query[SEQ_FIELD] = {"$gt": since}
+    updated = []
+    for doc in collection.find(query, DELTA_PROJECTION):
+        doc["id"] = str(doc.pop("_id"))
+        updated.append(doc)
+
+    removed = []
+    if since > 0:
+        tombstones = get_collection(TOMBSTONES_COLLECTION).find(
+            {"collection": collection.name, "seq": {"$gt": since}},
+            {"_id": 0, "location_id": 1}
+        )
+        removed = [t["location_id"] for t in tombstones]
+
+    return {"cursor": max(cursor, since), "updated": updated, "removed": removed}
@@ -0,0 +1,82 @@
+from services.location_index import get_snapshot
+import threading
+import math
+
+MAX_ZOOM = 22
+# From this zoom level on, tiles carry individual points instead of clusters
+CLUSTER_MAX_ZOOM = 14
+# Each tile is split into GRID_SIZE x GRID_SIZE cells when clustering
+GRID_SIZE = 8
+MAX_MERCATOR_LAT = 85.05112878
+
+_lock = threading.Lock()
+
+
+def lonlat_to_tile(lon, lat, z):
+    """Returns fractional Web Mercator (slippy map) tile coordinates."""
+    lat = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, lat))
+    n = 2 ** z
+    x = (lon + 180.0) / 360.0 * n
+    lat_rad = math.radians(lat)
+    y = (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n
+    return min(max(x, 0.0), n - 1e-9), min(max(y, 0.0), n - 1e-9)
+
+
+def build_zoom_level(points, z):
+    """
+    Buckets every point into its tile for zoom z. Below CLUSTER_MAX_ZOOM the
+    points in a tile are merged per grid cell into {count, centroid} clusters.
+    Returns {(x, y): tile_payload}.
+    """
+    clustered = z < CLUSTER_MAX_ZOOM
+    cells = {}
+    for point in points:
+        fx, fy = lonlat_to_tile(point["Location_Lon"], point["Location_Lat"], z)
+        tile = (int(fx), int(fy))
+        if clustered:
+            cell = (int((fx - tile[0]) * GRID_SIZE), int((fy - tile[1]) * GRID_SIZE))
+            cells.setdefault(tile, {}).setdefault(cell, []).append(point)
+        else:
+            cells.setdefault(tile, []).append(point)
+
+    tiles = {}
+    for tile, content in cells.items():
+        if not clustered:
+            tiles[tile] = {"clustered": False, "count": len(content), "points": content}
+            continue
+
+        clusters = []
+        for members in content.values():
+            if len(members) == 1:
+                clusters.append({"count": 1, **members[0]})
+                continue
+            clusters.append({
+                "count": len(members),
+                "Location_Lat": sum(m["Location_Lat"] for m in members) / len(members),
+                "Location_Lon": sum(m["Location_Lon"] for m in members) / len(members)
+            })
+        tiles[tile] = {
+            "clustered": True,
+            "count": sum(c["count"] for c in clusters),
+            "clusters": clusters
+        }
+    return tiles
+
+
+def get_tile(collection_name, z, x, y):
+    """
+    Returns the payload for tile z/x/y. Each zoom level is computed once per
+    snapshot of the collection and kept on that snapshot.
+    """
+    snapshot = get_snapshot(collection_name)
+    tiles = snapshot.tiles.get(z)
+    if tiles is None:
+        with _lock:
+            tiles = snapshot.tiles.get(z)
+            if tiles is None:
+                tiles = build_zoom_level(snapshot.points, z)
+                snapshot.tiles[z] = tiles
+
+    empty = {"clustered": z < CLUSTER_MAX_ZOOM, "count": 0}
+    empty["clusters" if empty["clustered"] else "points"] = []
+    return {"z": z, "x": x, "y": y, **tiles.get((x, y), empty)}
@@ -0,0 +1,294 @@
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+from services.db_service import get_collection
+from services.location_index import location_name
+from bson import ObjectId
+import base64
+
+# One record per uploaded image, already in the shape the profile API returns:
+# {image_id, image_url, device_id, username, collection, location_id, location_name,
+#  accessibility_type, uploaded_at, approval_state, approved_status, approved_at}
+UPLOADS_COLLECTION = 'uploads'
+LOCATION_COLLECTIONS = ['medical-victoria', 'toilets-victoria', 'trains-victoria', 'trams-victoria']
+
+PENDING, APPROVED, REJECTED = 'pending', 'approved', 'rejected'
+
+# {_id: collection_name, pending}: pending uploads per collection, for the admin badge
+PENDING_COUNTS_COLLECTION = 'upload-pending-counts'
+
+UPLOAD_SORT = [('uploaded_at', DESCENDING), ('_id', DESCENDING)]
+# The admin approval queue is worked oldest first
+PENDING_SORT = [('uploaded_at', ASCENDING), ('_id', ASCENDING)]
+PENDING_PROJECTION = {
+    'image_id': 1,
+    'image_url': 1,
+    'location_id': 1,
+    'location_name': 1,
+    'username': 1,
+    'uploaded_at': 1
+}
+UPLOAD_PROJECTION = {
+    '_id': 0,
+    'image_url': 1,
+    'location_name': 1,
+    'accessibility_type': 1,
+    'uploaded_at': 1,
+    'approved_status': 1,
+    'approved_at': 1
+}
+
+
+def ensure_upload_indexes():
+    uploads = get_collection(UPLOADS_COLLECTION)
+    uploads.create_index([('device_id', ASCENDING)] + UPLOAD_SORT)
+    # Identity of an image, used by the approval views and the backfill
+    uploads.create_index(
+        [('collection', ASCENDING), ('location_id', ASCENDING), ('image_url', ASCENDING)],
+        unique=True
+    )
+    # Only pending images, so the admin queue stays cheap however many uploads are approved
+    uploads.create_index(
+        [('collection', ASCENDING)] + PENDING_SORT,
+        partialFilterExpression={'approval_state': PENDING}
+    )
+
+
+def approval_state(image):
+    """Derives pending/approved/rejected from an Images entry."""
+    if image.get('approved_status') == True:
+        return APPROVED
+    if image.get('image_approved_time'):
+        return REJECTED
+    return PENDING
+
+
+def _upload_record(collection_name, location, image):
+    state = approval_state(image)
+    return {
+        'image_id': image.get('image_id'),
+        'image_url': image.get('image_url'),
+        'device_id': image.get('device_id'),
+        'username': image.get('username'),
+        'collection': collection_name,
+        'location_id': str(location['_id']),
+        'location_name': location_name(location) or 'Unknown Location',
+        'accessibility_type': location.get('Accessibility_Type_Name', 'Not specified'),
+        'uploaded_at': image.get('image_upload_time'),
+        'approval_state': state,
+        'approved_status': state == APPROVED,
+        'approved_at': image.get('image_approved_time') if state == APPROVED else None
+    }
+
+
+def _identity(collection_name, location_id, image_url):
+    return {'collection': collection_name, 'location_id': str(location_id), 'image_url': image_url}
+
+
+def _add_pending(collection_name, delta):
+    get_collection(PENDING_COUNTS_COLLECTION).update_one(
+        {'_id': collection_name}, {'$inc': {'pending': delta}}, upsert=True
+    )
+
+
+def record_upload(collection_name, location, image):
+    """Indexes an image that was just pushed onto a location's Images array."""
+    record = _upload_record(collection_name, location, image)
+    result = get_collection(UPLOADS_COLLECTION).update_one(
+        _identity(collection_name, location['_id'], record['image_url']),
+        {'$set': record},
+        upsert=True
+    )
+    if result.upserted_id is not None and record['approval_state'] == PENDING:
+        _add_pending(collection_name, 1)
+
+
+def set_upload_state(collection_name, location_id, image_url, approved, approved_at):
+    """Mirrors an admin approval or rejection onto the upload record."""
+    previous = get_collection(UPLOADS_COLLECTION).find_one_and_update(
+        _identity(collection_name, location_id, image_url),
+        {'$set': {
+            'approval_state': APPROVED if approved else REJECTED,
+            'approved_status': approved,
+            'approved_at': approved_at if approved else None
+        }},
+        projection={'_id': 0, 'approval_state': 1},
+        return_document=ReturnDocument.BEFORE
+    )
+    if previous and previous.get('approval_state') == PENDING:
+        _add_pending(collection_name, -1)
+
+
+def set_upload_states(collection_name, changes, approved_at):
+    """
+    Bulk version of set_upload_state for [(location_id, previous_image,
+    approved)], where previous_image is the Images entry before the change.
+    """
+    if not changes:
+        return
+    get_collection(UPLOADS_COLLECTION).bulk_write([
+        UpdateOne(
+            _identity(collection_name, location_id, image.get('image_url')),
+            {'$set': {
+                'approval_state': APPROVED if approved else REJECTED,
+                'approved_status': approved,
+                'approved_at': approved_at if approved else None
+            }}
+        )
+        for location_id, image, approved in changes
+    ], ordered=False)
+    was_pending = sum(1 for _, image, _ in changes if approval_state(image) == PENDING)
+    if was_pending:
+        _add_pending(collection_name, -was_pending)
+
+
+def get_pending_count(collection_name):
+    """Number of images awaiting approval in a collection, read from its counter."""
+    counts = get_collection(PENDING_COUNTS_COLLECTION).find_one({'_id': collection_name}) or {}
+    return max(counts.get('pending', 0), 0)
+
+
+def rebuild_pending_counts():
+    """Recounts pending uploads per collection from the uploads index."""
+    counts = {name: 0 for name in LOCATION_COLLECTIONS}
+    for result in get_collection(UPLOADS_COLLECTION).aggregate([
+        {'$match': {'approval_state': PENDING}},
+        {'$group': {'_id': '$collection', 'pending': {'$sum': 1}}}
+    ]):
+        counts[result['_id']] = result['pending']
+    pending_counts = get_collection(PENDING_COUNTS_COLLECTION)
+    for collection_name, pending in counts.items():
+        pending_counts.update_one({'_id': collection_name}, {'$set': {'pending': pending}}, upsert=True)
+    return counts
+
+
+def count_approved_uploads(device_id):
+    return get_collection(UPLOADS_COLLECTION).count_documents(
+        {'device_id': device_id, 'approval_state': APPROVED}
+    )
+
+
+def encode_cursor(record):
+    raw = f"{record['uploaded_at'] or ''}|{record['_id']}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Raises ValueError on a malformed cursor."""
+    try:
+        uploaded_at, record_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').rsplit('|', 1)
+        return uploaded_at or None, ObjectId(record_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def find_device_uploads(device_id, limit=None, cursor=None):
+    """
+    Returns a device's uploads, most recent first. Without a limit this is a
+    cursor over all of them; with one it returns (page, next_cursor).
+    """
+    query = {'device_id': device_id}
+    uploads = get_collection(UPLOADS_COLLECTION)
+
+    if not limit:
+        return uploads.find(query, UPLOAD_PROJECTION).sort(UPLOAD_SORT)
+
+    if cursor:
+        uploaded_at, record_id = decode_cursor(cursor)
+        if uploaded_at is None:
+            # Records without an upload time sort last
+            query['$or'] = [{'uploaded_at': None, '_id': {'$lt': record_id}}]
+        else:
+            query['$or'] = [
+                {'uploaded_at': {'$lt': uploaded_at}},
+                {'uploaded_at': uploaded_at, '_id': {'$lt': record_id}},
+                {'uploaded_at': None}
+            ]
+    records = list(uploads.find(query, {**UPLOAD_PROJECTION, '_id': 1}).sort(UPLOAD_SORT).limit(limit + 1))
+    next_cursor = encode_cursor(records[limit - 1]) if len(records) > limit else None
+    page = [{k: v for k, v in r.items() if k != '_id'} for r in records[:limit]]
+    return page, next_cursor
+
+
+def find_pending_uploads(collection_name, limit, cursor=None):
+    """
+    Returns (page, next_cursor) of a collection's images awaiting approval,
+    oldest first, served from the partial pending index.
+    Raises ValueError on a malformed cursor.
+    """
+    query = {'collection': collection_name, 'approval_state': PENDING}
+    if cursor:
+        uploaded_at, record_id = decode_cursor(cursor)
+        if uploaded_at is None:
+            # Records without an upload time sort first
+            query['$or'] = [{'uploaded_at': {'$ne': None}}, {'uploaded_at': None, '_id': {'$gt': record_id}}]
+        else:
+            query['$or'] = [
+                {'uploaded_at': {'$gt': uploaded_at}},
+                {'uploaded_at': uploaded_at, '_id': {'$gt': record_id}}
+            ]
+    records = list(get_collection(UPLOADS_COLLECTION).find(query, PENDING_PROJECTION).sort(PENDING_SORT).limit(limit + 1))
+    next_cursor = encode_cursor(records[limit - 1]) if len(records) > limit else None
+    return records[:limit], next_cursor
+
+
+def backfill_image_ids(batch_size=1000):
+    """
+    Gives every Images entry that predates image ids a stable image_id.
+    Each update is guarded by the image's URL so a concurrent push can't
+    shift it onto another image. Returns the number of ids assigned.
+    """
+    assigned = 0
+    for collection_name in LOCATION_COLLECTIONS:
+        collection = get_collection(collection_name)
+        operations = []
+        cursor = collection.find(
+            {'Images': {'$elemMatch': {'image_id': {'$exists': False}}}},
+            {'Images.image_id': 1, 'Images.image_url': 1}
+        )
+        for location in cursor:
+            for index, image in enumerate(location['Images']):
+                if image.get('image_id'):
+                    continue
+                operations.append(UpdateOne(
+                    {'_id': location['_id'], f'Images.{index}.image_url': image.get('image_url')},
+                    {'$set': {f'Images.{index}.image_id': str(ObjectId())}}
+                ))
+                if len(operations) >= batch_size:
+                    assigned += collection.bulk_write(operations, ordered=False).modified_count
+                    operations = []
+        if operations:
+            assigned += collection.bulk_write(operations, ordered=False).modified_count
+    return assigned
+
+
+def backfill_uploads(batch_size=1000):
+    """
+    Upserts an upload record for every image in the location collections
+    and recounts the pending images. Returns the number of images indexed.
+    """
+    uploads = get_collection(UPLOADS_COLLECTION)
+    indexed = 0
+    for collection_name in LOCATION_COLLECTIONS:
+        operations = []
+        cursor = get_collection(collection_name).find(
+            {'Images': {'$exists': True, '$ne': []}},
+            {'Images': 1, 'Metadata.name': 1, 'Tags.name': 1, 'Accessibility_Type_Name': 1}
+        )
+        for location in cursor:
+            for image in location['Images']:
+                if not image.get('image_url'):
+                    continue
+                record = _upload_record(collection_name, location, image)
+                operations.append(UpdateOne(
+                    _identity(collection_name, location['_id'], record['image_url']),
+                    {'$set': record},
+                    upsert=True
+                ))
+                if len(operations) >= batch_size:
+                    uploads.bulk_write(operations, ordered=False)
+                    indexed += len(operations)
+                    operations = []
+        if operations:
+            uploads.bulk_write(operations, ordered=False)
+            indexed += len(operations)
+    rebuild_pending_counts()
+    return indexed
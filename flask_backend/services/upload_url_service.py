@@ -0,0 +1,86 @@
+from datetime import datetime
+from services.aws_clients import get_s3_client
+import secrets
+import os
+
+MAX_UPLOAD_FILES = int(os.getenv("MAX_UPLOAD_FILES", 10))
+UPLOAD_URL_EXPIRES_SECONDS = int(os.getenv("UPLOAD_URL_EXPIRES_SECONDS", 3600))
+# Only enforceable with presigned POST; a presigned PUT accepts any size
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 10 * 1024 * 1024))
+ALLOWED_CONTENT_TYPES = {"image/jpeg", "image/png", "image/heic", "image/webp"}
+UPLOAD_METHODS = {"put", "post"}
+
+
+def s3_settings():
+    """Returns (s3_client, bucket_name, region). Raises EnvironmentError when AWS is not configured."""
+    aws_key = os.environ.get('AWS_ACCESS_KEY_ID')
+    aws_secret = os.environ.get('AWS_SECRET_ACCESS_KEY')
+    region = os.environ.get('S3_REGION')
+    if not all([aws_key, aws_secret, region]):
+        raise EnvironmentError("Missing AWS credentials or region in environment variables.")
+    return get_s3_client(), os.environ.get('S3_BUCKET_NAME'), region
+
+
+def upload_key(filename, unique=False):
+    """S3 key for an uploaded file; unique keys keep same-named files in one batch apart."""
+    timestamp = datetime.utcnow().strftime('%Y%m%d%H%M%S')
+    if unique:
+        return f"uploads/{timestamp}_{secrets.token_hex(4)}_{filename}"
+    return f"uploads/{timestamp}_{filename}"
+
+
+def parse_upload_files(files):
+    """
+    Validates [{filename, content_type}, ...] from a batch request and fills in
+    the default content type. Raises ValueError.
+    """
+    if not isinstance(files, list) or not files:
+        raise ValueError('files must be a non-empty list')
+    if len(files) > MAX_UPLOAD_FILES:
+        raise ValueError(f'At most {MAX_UPLOAD_FILES} files can be uploaded at once')
+
+    parsed = []
+    for index, file in enumerate(files):
+        if not isinstance(file, dict) or not file.get('filename'):
+            raise ValueError(f'files[{index}]: filename is required')
+        content_type = file.get('content_type', 'image/jpeg')
+        if content_type not in ALLOWED_CONTENT_TYPES:
+            raise ValueError(f'files[{index}]: unsupported content_type {content_type}')
+        parsed.append({'filename': file['filename'], 'content_type': content_type})
+    return parsed
+
+
+def sign_upload(s3_client, bucket_name, region, key, content_type, method="put"):
+    """
+    Signs one upload. This only uses the client's credentials; no request is
+    made to S3. A POST policy additionally makes S3 reject bodies over
+    MAX_UPLOAD_BYTES or with a different Content-Type.
+    """
+    upload = {
+        "s3_key": key,
+        "public_url": f"https://{bucket_name}.s3.{region}.amazonaws.com/{key}"
+    }
+    if method == "post":
+        post = s3_client.generate_presigned_post(
+            Bucket=bucket_name,
+            Key=key,
+            Fields={'Content-Type': content_type},
+            Conditions=[
+                {'Content-Type': content_type},
+                ['content-length-range', 1, MAX_UPLOAD_BYTES]
+            ],
+            ExpiresIn=UPLOAD_URL_EXPIRES_SECONDS
+        )
+        upload["upload_url"] = post['url']
+        upload["fields"] = post['fields']
+    else:
+        upload["upload_url"] = s3_client.generate_presigned_url(
+            'put_object',
+            Params={
+                'Bucket': bucket_name,
+                'Key': key,
+                'ContentType': content_type,
+            },
+            ExpiresIn=UPLOAD_URL_EXPIRES_SECONDS
+        )
+    return upload
@@ -0,0 +1,206 @@
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from services.db_service import get_collection
+
+VOTES_COLLECTION = 'votes'
+# {_id: image_url, accurate_count, inaccurate_count}
+IMAGE_COUNTERS_COLLECTION = 'vote-image-counters'
+# {_id: device_id, vote_count}
+DEVICE_COUNTERS_COLLECTION = 'vote-device-counters'
+
+MAX_BATCH_VOTES = 200
+DUPLICATE_KEY_ERROR = 11000
+
+
+def ensure_vote_indexes():
+    """
+    Creates the indexes the vote queries rely on. The unique (device_id,
+    image_url) index makes one vote per device and image hold under
+    concurrent requests and also serves the per-device lookups; it fails to
+    build while duplicate votes exist.
+    """
+    votes = get_collection(VOTES_COLLECTION)
+    votes.create_index([('device_id', ASCENDING), ('image_url', ASCENDING)], unique=True)
+
+
+def insert_vote(vote_doc):
+    """
+    Stores a vote with a single conditional write. Returns False when the
+    device has already voted on the image.
+    """
+    try:
+        result = get_collection(VOTES_COLLECTION).update_one(
+            {'device_id': vote_doc['device_id'], 'image_url': vote_doc['image_url']},
+            {'$setOnInsert': vote_doc},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Two concurrent upserts for the same pair; the other one won
+        return False
+    return result.upserted_id is not None
+
+
+def insert_votes(vote_docs):
+    """
+    Stores a batch of votes with one lookup for existing (device_id,
+    image_url) pairs and one unordered insert_many for the rest. Pairs that
+    repeat inside the batch keep their first vote.
+    Returns (inserted, duplicates) as lists of vote documents.
+    """
+    votes = get_collection(VOTES_COLLECTION)
+    pairs = {}
+    duplicates = []
+    for vote_doc in vote_docs:
+        pair = (vote_doc['device_id'], vote_doc['image_url'])
+        if pair in pairs:
+            duplicates.append(vote_doc)
+        else:
+            pairs[pair] = vote_doc
+    if not pairs:
+        return [], duplicates
+
+    existing = votes.find(
+        {'$or': [{'device_id': device_id, 'image_url': image_url} for device_id, image_url in pairs]},
+        {'_id': 0, 'device_id': 1, 'image_url': 1}
+    )
+    for vote in existing:
+        # Legacy data may hold the same pair more than once
+        vote_doc = pairs.pop((vote['device_id'], vote['image_url']), None)
+        if vote_doc is not None:
+            duplicates.append(vote_doc)
+
+    inserted = list(pairs.values())
+    if not inserted:
+        return inserted, duplicates
+    try:
+        votes.insert_many(inserted, ordered=False)
+    except BulkWriteError as e:
+        # Votes that raced with a concurrent request hit the unique index
+        failed = {error['index'] for error in e.details['writeErrors']}
+        if any(error['code'] != DUPLICATE_KEY_ERROR for error in e.details['writeErrors']):
+            raise
+        duplicates.extend(inserted[i] for i in sorted(failed))
+        inserted = [vote_doc for i, vote_doc in enumerate(inserted) if i not in failed]
+    return inserted, duplicates
+
+
+def _tally_field(is_accurate):
+    # Mirrors the old count_documents filters, which only matched real booleans
+    if is_accurate is True:
+        return 'accurate_count'
+    if is_accurate is False:
+        return 'inaccurate_count'
+    return None
+
+
+def record_vote_counters(device_id, image_url, is_accurate):
+    """
+    Increments the per-image and per-device counters for a vote that was just
+    inserted. Returns the updated tallies.
+    """
+    image_inc = {'accurate_count': 0, 'inaccurate_count': 0}
+    field = _tally_field(is_accurate)
+    if field:
+        image_inc[field] = 1
+
+    image_counters = get_collection(IMAGE_COUNTERS_COLLECTION).find_one_and_update(
+        {'_id': image_url},
+        {'$inc': image_inc},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    device_counters = get_collection(DEVICE_COUNTERS_COLLECTION).find_one_and_update(
+        {'_id': device_id},
+        {'$inc': {'vote_count': 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return {
+        'accurate_count': image_counters['accurate_count'],
+        'inaccurate_count': image_counters['inaccurate_count'],
+        'device_vote_count': device_counters['vote_count']
+    }
+
+
+def record_batch_vote_counters(vote_docs):
+    """Increments the counters for a batch of inserted votes with one bulk write per collection."""
+    image_incs = {}
+    device_incs = {}
+    for vote_doc in vote_docs:
+        inc = image_incs.setdefault(vote_doc['image_url'], {'accurate_count': 0, 'inaccurate_count': 0})
+        field = _tally_field(vote_doc['is_accurate'])
+        if field:
+            inc[field] += 1
+        device_incs[vote_doc['device_id']] = device_incs.get(vote_doc['device_id'], 0) + 1
+
+    if image_incs:
+        get_collection(IMAGE_COUNTERS_COLLECTION).bulk_write([
+            UpdateOne({'_id': image_url}, {'$inc': inc}, upsert=True)
+            for image_url, inc in image_incs.items()
+        ], ordered=False)
+    if device_incs:
+        get_collection(DEVICE_COUNTERS_COLLECTION).bulk_write([
+            UpdateOne({'_id': device_id}, {'$inc': {'vote_count': count}}, upsert=True)
+            for device_id, count in device_incs.items()
+        ], ordered=False)
+
+
+def get_images_tallies(image_urls):
+    """Returns {image_url: tallies} for several images with one query."""
+    tallies = {url: {'accurate_count': 0, 'inaccurate_count': 0} for url in image_urls}
+    for counters in get_collection(IMAGE_COUNTERS_COLLECTION).find({'_id': {'$in': list(tallies)}}):
+        tallies[counters['_id']] = {
+            'accurate_count': counters.get('accurate_count', 0),
+            'inaccurate_count': counters.get('inaccurate_count', 0)
+        }
+    return tallies
+
+
+def get_devices_vote_counts(device_ids):
+    """Returns {device_id: vote_count} for several devices with one query."""
+    counts = {device_id: 0 for device_id in device_ids}
+    for counters in get_collection(DEVICE_COUNTERS_COLLECTION).find({'_id': {'$in': list(counts)}}):
+        counts[counters['_id']] = counters.get('vote_count', 0)
+    return counts
+
+
+def get_image_tallies(image_url):
+    """Returns the accurate/inaccurate counts for an image."""
+    counters = get_collection(IMAGE_COUNTERS_COLLECTION).find_one({'_id': image_url}) or {}
+    return {
+        'accurate_count': counters.get('accurate_count', 0),
+        'inaccurate_count': counters.get('inaccurate_count', 0)
+    }
+
+
+def get_device_vote_count(device_id):
+    """Returns the number of votes cast by a device."""
+    counters = get_collection(DEVICE_COUNTERS_COLLECTION).find_one({'_id': device_id}) or {}
+    return counters.get('vote_count', 0)
+
+
+def rebuild_vote_counters():
+    """
+    Recomputes both counter collections from the raw votes. Each $out
+    replaces its target collection atomically once the aggregation finishes.
+    Returns the number of image and device counter documents written.
+    """
+    votes = get_collection(VOTES_COLLECTION)
+
+    votes.aggregate([
+        {'$group': {
+            '_id': '$image_url',
+            'accurate_count': {'$sum': {'$cond': [{'$eq': ['$is_accurate', True]}, 1, 0]}},
+            'inaccurate_count': {'$sum': {'$cond': [{'$eq': ['$is_accurate', False]}, 1, 0]}}
+        }},
+        {'$out': IMAGE_COUNTERS_COLLECTION}
+    ])
+    votes.aggregate([
+        {'$group': {'_id': '$device_id', 'vote_count': {'$sum': 1}}},
+        {'$out': DEVICE_COUNTERS_COLLECTION}
+    ])
+
+    return (
+        get_collection(IMAGE_COUNTERS_COLLECTION).estimated_document_count(),
+        get_collection(DEVICE_COUNTERS_COLLECTION).estimated_document_count()
+    )
@@ -0,0 +1,140 @@
+import threading
+import logging
+import queue
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+# Longest a blocked flusher goes without checking whether it should stop
+POLL_SECONDS = 0.1
+# Tries for each half once a failing batch has been split
+SPLIT_ATTEMPTS = 2
+
+
+class BufferFull(Exception):
+    """The buffer is at capacity; the caller should back off and retry."""
+
+
+class WriteBuffer:
+    """
+    Bounded in-process queue of documents written in batches by one
+    background thread. A batch is written once it reaches batch_size or its
+    oldest document has waited flush_seconds. write_batch(docs) must be safe
+    to call again with the same documents after a failure. A batch that still
+    fails after max_attempts is split to find the documents that can never be
+    written, which are logged and dropped.
+    """
+
+    def __init__(self, write_batch, max_size=1000, batch_size=100, flush_seconds=1.0, name='write-buffer',
+                 max_attempts=5):
+        self.write_batch = write_batch
+        self.max_attempts = max_attempts
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.name = name
+        self._queue = queue.Queue(maxsize=max_size)
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def start(self):
+        # The flusher thread does not survive a fork, so each process starts its own
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def submit(self, doc):
+        """Queues a document without blocking. Raises BufferFull."""
+        self.start()
+        try:
+            self._queue.put_nowait(doc)
+        except queue.Full:
+            raise BufferFull(f'{self.name} is full')
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _take_batch(self, wait):
+        """
+        Collects up to batch_size documents. With wait, blocks for the first
+        one and then until flush_seconds after it, in short polls so that
+        close() is noticed; without, only takes what is already queued.
+        """
+        batch = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            if deadline is not None and time.monotonic() >= deadline:
+                wait = False
+            try:
+                if wait and not self._stopping.is_set():
+                    batch.append(self._queue.get(timeout=POLL_SECONDS))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                if not wait or self._stopping.is_set():
+                    break
+                continue
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_seconds
+        return batch
+
+    def _write(self, batch, attempts):
+        """
+        Writes a batch, retrying with backoff. Gives up after `attempts` tries,
+        or 3 once the buffer is closing.
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                self.write_batch(batch)
+                return True
+            except Exception as e:
+                if attempt >= attempts or (self._stopping.is_set() and attempt >= 3):
+                    logger.warning(f"{self.name}: write of {len(batch)} documents failed {attempt} times: {e}")
+                    return False
+                logger.warning(f"{self.name}: write of {len(batch)} documents failed, retrying: {e}")
+                time.sleep(min(0.5 * 2 ** (attempt - 1), 30))
+
+    def _write_or_split(self, batch, attempts):
+        """
+        Writes a batch; if it keeps failing, writes its halves separately so
+        that only the documents that fail on their own are dropped. Returns
+        the number written.
+        """
+        if self._write(batch, attempts):
+            return len(batch)
+        if len(batch) == 1:
+            logger.error(f"{self.name}: dropping document that could not be written: {batch[0]!r}")
+            return 0
+        middle = len(batch) // 2
+        return (self._write_or_split(batch[:middle], SPLIT_ATTEMPTS) +
+                self._write_or_split(batch[middle:], SPLIT_ATTEMPTS))
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._take_batch(wait=True)
+            if batch:
+                self._write_or_split(batch, self.max_attempts)
+
+    def flush(self, attempts=3):
+        """Writes everything queued so far from the calling thread. Returns the number written."""
+        written = 0
+        batch = self._take_batch(wait=False)
+        while batch:
+            written += self._write_or_split(batch, attempts)
+            batch = self._take_batch(wait=False)
+        return written
+
+    def close(self, timeout=10):
+        """Stops the flusher thread and drains what is left; registered with atexit."""
+        self._stopping.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+        return self.flush()
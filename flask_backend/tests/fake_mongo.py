@@ -0,0 +1,23 @@
+import mongomock
+from mongomock.collection import BulkOperationBuilder
+
+# pymongo >= 4.9 passes sort= for UpdateOne/ReplaceOne, which mongomock does not accept yet
+_add_update = BulkOperationBuilder.add_update
+_add_replace = BulkOperationBuilder.add_replace
+
+
+def _without_sort(add):
+    def wrapper(self, *args, sort=None, **kwargs):
+        if sort is not None:
+            raise NotImplementedError('sort in bulk updates is not supported by mongomock')
+        return add(self, *args, **kwargs)
+    return wrapper
+
+
+BulkOperationBuilder.add_update = _without_sort(_add_update)
+BulkOperationBuilder.add_replace = _without_sort(_add_replace)
+
+
+def fake_client():
+    """An in-memory client for db_service.set_client()."""
+    return mongomock.MongoClient()
@@ -0,0 +1,130 @@
+import unittest
+from unittest.mock import patch
+from contextlib import contextmanager
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fake_mongo import fake_client
+from services import db_service
+from services.approval_service import parse_selection, set_images_status
+from services.leaderboard_service import LEADERBOARD_COLLECTION, UPLOAD_POINTS
+from services.upload_index_service import (
+    APPROVED, PENDING, REJECTED, UPLOADS_COLLECTION, backfill_uploads, get_pending_count
+)
+
+COLLECTION = 'toilets-victoria'
+
+
+def image(image_id, username, approved_status, approved_time):
+    return {
+        'image_id': image_id,
+        'image_url': f'https://bucket/{image_id}.jpg',
+        'username': username,
+        'approved_status': approved_status,
+        'image_approved_time': approved_time,
+        'image_upload_time': '2024-01-01T00:00:00Z'
+    }
+
+
+class TestSetImagesStatus(unittest.TestCase):
+    def setUp(self):
+        db_service.set_client(fake_client())
+        self.locations = db_service.get_collection(COLLECTION)
+        self.location_id = str(self.locations.insert_one({'Tags': {'name': 'Loo'}, 'Images': [
+            image('pending', 'alice', False, None),
+            image('approved', 'bob', True, '2024-01-02T00:00:00Z'),
+            image('rejected', 'alice', False, '2024-01-02T00:00:00Z'),
+        ]}).inserted_id)
+        backfill_uploads()
+
+    def tearDown(self):
+        db_service.set_client(None)
+
+    def pairs(self, *image_ids):
+        return [(self.location_id, image_id) for image_id in image_ids]
+
+    def images(self):
+        return {i['image_id']: i for i in self.locations.find_one()['Images']}
+
+    def approved_uploads(self, username):
+        entry = db_service.get_collection(LEADERBOARD_COLLECTION).find_one({'_id': username}) or {}
+        return entry.get('approved_uploads', 0), entry.get('points', 0)
+
+    def upload_state(self, image_id):
+        return db_service.get_collection(UPLOADS_COLLECTION).find_one(
+            {'image_url': f'https://bucket/{image_id}.jpg'}
+        )['approval_state']
+
+    def test_mixed_selection(self):
+        summary = set_images_status(
+            COLLECTION, self.pairs('pending', 'approved', 'rejected', 'missing') + [('not-an-id', 'x')], True
+        )
+        self.assertEqual(summary['requested'], 5)
+        self.assertEqual(summary['updated'], 2)
+        self.assertEqual(summary['unchanged'], 1)
+        self.assertEqual(sorted(summary['not_found']), sorted([f'{self.location_id}:missing', 'not-an-id:x']))
+        self.assertEqual(summary['conflicts'], [])
+
+        images = self.images()
+        self.assertTrue(all(images[i]['approved_status'] for i in ('pending', 'approved', 'rejected')))
+        self.assertEqual(images['approved']['image_approved_time'], '2024-01-02T00:00:00Z')
+
+    def test_leaderboard_deltas(self):
+        set_images_status(COLLECTION, self.pairs('pending', 'rejected'), True)
+        self.assertEqual(self.approved_uploads('alice'), (2, 2 * UPLOAD_POINTS))
+
+        set_images_status(COLLECTION, self.pairs('pending', 'approved'), False)
+        self.assertEqual(self.approved_uploads('alice'), (1, UPLOAD_POINTS))
+        self.assertEqual(self.approved_uploads('bob'), (-1, -UPLOAD_POINTS))
+
+    def test_repeated_request_pays_once(self):
+        set_images_status(COLLECTION, self.pairs('pending'), True)
+        summary = set_images_status(COLLECTION, self.pairs('pending'), True)
+        self.assertEqual((summary['updated'], summary['unchanged']), (0, 1))
+        self.assertEqual(self.approved_uploads('alice'), (1, UPLOAD_POINTS))
+
+    def test_pending_counter(self):
+        self.assertEqual(get_pending_count(COLLECTION), 1)
+        set_images_status(COLLECTION, self.pairs('rejected'), True)
+        self.assertEqual(get_pending_count(COLLECTION), 1)
+        set_images_status(COLLECTION, self.pairs('pending'), False)
+        self.assertEqual(get_pending_count(COLLECTION), 0)
+        self.assertEqual(self.upload_state('pending'), REJECTED)
+        self.assertEqual(self.upload_state('rejected'), APPROVED)
+        # Rejecting again is a no-op, not a second decrement
+        set_images_status(COLLECTION, self.pairs('pending'), False)
+        self.assertEqual(get_pending_count(COLLECTION), 0)
+
+    def test_change_made_meanwhile_is_a_conflict(self):
+        @contextmanager
+        def approve_elsewhere(collection_name):
+            # Another admin approves the image between the read and the write
+            self.locations.update_one(
+                {'Images.image_id': 'pending'},
+                {'$set': {'Images.$.approved_status': True, 'Images.$.image_approved_time': 'other'}}
+            )
+            yield 1
+
+        with patch('services.approval_service.reserve_sequence', approve_elsewhere):
+            summary = set_images_status(COLLECTION, self.pairs('pending'), False)
+        self.assertEqual(summary['updated'], 0)
+        self.assertEqual(summary['conflicts'], [f'{self.location_id}:pending'])
+        self.assertEqual(self.images()['pending']['image_approved_time'], 'other')
+        self.assertEqual(self.approved_uploads('alice'), (0, 0))
+        self.assertEqual(get_pending_count(COLLECTION), 1)
+        self.assertEqual(self.upload_state('pending'), PENDING)
+
+
+class TestParseSelection(unittest.TestCase):
+    def test_pairs(self):
+        self.assertEqual(parse_selection(['a:b', 'c:d']), [('a', 'b'), ('c', 'd')])
+
+    def test_invalid(self):
+        for value in ('a', 'a:', ':b', None):
+            with self.assertRaises(ValueError):
+                parse_selection([value])
+
+
+if __name__ == '__main__':
+    unittest.main()
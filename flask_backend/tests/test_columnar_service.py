@@ -0,0 +1,74 @@
+import unittest
+import struct
+import base64
+import os
+import sys
+from array import array
+
+import msgpack
+
+# Add the parent directory to sys.path to import columnar_service
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services import columnar_service
+
+DOCS = [
+    {'_id': 'a', 'Location_Lat': -37.8136, 'Location_Lon': 144.9631, 'Accessibility_Type_Name': 'toilet',
+     'Tags': {'name': 'Flinders St'}, 'Images': [{'image_url': 'u1'}]},
+    {'_id': 'b', 'Location_Lat': -37.8183, 'Location_Lon': 144.9526, 'Accessibility_Type_Name': 'toilet',
+     'Metadata': {'name': 'Southern Cross'}},
+    {'_id': 'c', 'Location_Lat': -37.80, 'Location_Lon': 144.90, 'Accessibility_Type_Name': 'train'},
+    {'_id': 'd', 'Location_Lat': None, 'Location_Lon': 144.90}
+]
+
+class TestColumnarService(unittest.TestCase):
+    def test_build_columns(self):
+        columns = columnar_service.build_columns(DOCS, {'id'})
+        self.assertEqual(len(columns['lat']), 3)
+        self.assertEqual(columns['type'].dictionary, ['toilet', 'train'])
+        self.assertEqual(list(columns['type'].codes), [0, 0, 1])
+        self.assertEqual(list(columns['name'].codes), [0, 1, -1])
+        self.assertEqual(columns['id'], ['a', 'b', 'c'])
+        self.assertNotIn('images', columns)
+
+    def test_columnar_json(self):
+        columns = columnar_service.build_columns(DOCS)
+        payload = msgpack.unpackb(columnar_service.encode_msgpack(columns))
+        lat = array('f', payload['lat'])
+        self.assertEqual(payload['count'], 3)
+        self.assertAlmostEqual(lat[0], -37.8136, places=4)
+        self.assertEqual(list(array('i', payload['name']['codes'])), [0, 1, -1])
+
+        encoded = columnar_service.encode_columnar_json(columns)
+        self.assertIn(base64.b64encode(payload['lat']), encoded)
+
+    def test_binary_layout(self):
+        columns = columnar_service.build_columns(DOCS, {'images'})
+        data = columnar_service.encode_binary(columns)
+        self.assertEqual(data[:4], columnar_service.BINARY_MAGIC)
+        (count,) = struct.unpack_from('<I', data, 4)
+        self.assertEqual(count, 3)
+
+        sections = {}
+        offset = 8
+        while offset < len(data):
+            key_length = data[offset]
+            key = data[offset + 1:offset + 1 + key_length].decode('ascii')
+            (length,) = struct.unpack_from('<I', data, offset + 1 + key_length)
+            start = offset + 5 + key_length
+            sections[key] = data[start:start + length]
+            offset = start + length
+
+        self.assertEqual(set(sections), {'lat', 'lon', 'type', 'name', 'images'})
+        self.assertEqual(len(sections['lon']), 3 * 4)
+        (entries,) = struct.unpack_from('<I', sections['type'], 0)
+        self.assertEqual(entries, 2)
+        self.assertEqual(sections['images'], b'[[{"image_url":"u1"}],[],[]]')
+
+    def test_parse_include(self):
+        self.assertEqual(columnar_service.parse_include('ID, images'), {'id', 'images'})
+        self.assertEqual(columnar_service.parse_include(None), set())
+        with self.assertRaises(ValueError):
+            columnar_service.parse_include('tags')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services import db_service
+
+
+class TestDbService(unittest.TestCase):
+    def setUp(self):
+        db_service.set_client(None)
+
+    def tearDown(self):
+        db_service.set_client(None)
+
+    @patch('services.db_service.MongoClient')
+    def test_client_is_created_lazily_and_reused(self, mock_client):
+        mock_client.assert_not_called()
+        db_service.get_collection('votes')
+        db_service.get_collection('reports-victoria')
+        mock_client.assert_called_once()
+        options = mock_client.call_args.kwargs
+        self.assertEqual(options['maxPoolSize'], db_service.MONGO_MAX_POOL_SIZE)
+        self.assertEqual(options['readPreference'], db_service.MONGO_READ_PREFERENCE)
+
+    @patch('services.db_service.MongoClient')
+    def test_new_client_after_fork(self, mock_client):
+        mock_client.side_effect = lambda *args, **kwargs: MagicMock()
+        parent = db_service.get_client()
+        with patch('services.db_service.os.getpid', return_value=os.getpid() + 1):
+            child = db_service.get_client()
+            self.assertIs(db_service.get_client(), child)
+        self.assertIsNot(parent, child)
+        parent.close.assert_not_called()
+
+    @patch('services.db_service.MongoClient')
+    def test_injected_client(self, mock_client):
+        injected = MagicMock()
+        db_service.set_client(injected)
+        with patch('services.db_service.os.getpid', return_value=os.getpid() + 1):
+            self.assertIs(db_service.get_client(), injected)
+        db_service.get_collection('votes')
+        injected.__getitem__.assert_called_with(db_service.MONGO_DB_NAME)
+        mock_client.assert_not_called()
+
+    def test_reset_closes_own_client_only(self):
+        injected = MagicMock()
+        db_service.set_client(injected)
+        db_service.reset_client()
+        injected.close.assert_not_called()
+        with patch('services.db_service.MongoClient') as mock_client:
+            db_service.get_client()
+            db_service.reset_client()
+            mock_client.return_value.close.assert_called_once()
+
+    def test_ping(self):
+        injected = MagicMock()
+        db_service.set_client(injected)
+        self.assertGreaterEqual(db_service.ping(), 0)
+        injected.admin.command.assert_called_once_with('ping')
+
+
+if __name__ == '__main__':
+    unittest.main()
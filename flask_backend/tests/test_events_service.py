@@ -0,0 +1,99 @@
+import unittest
+from unittest.mock import patch
+import threading
+import os
+import sys
+
+# Add the parent directory to sys.path to import events_service
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services import events_service
+
+class FakeTicketmaster:
+    """Local stand-in for the Ticketmaster search; can be held open or made to fail."""
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, query):
+        self.calls += 1
+        self.release.wait(5)
+        if self.fail:
+            raise RuntimeError('upstream down')
+        return {'_embedded': {'events': [{'name': f"event {self.calls}"}]}, 'postalcode': query['postalcode']}
+
+class TestEventsCache(unittest.TestCase):
+    def setUp(self):
+        events_service.clear()
+        self.upstream = FakeTicketmaster()
+        events_service.set_upstream(self.upstream)
+
+    def tearDown(self):
+        events_service.set_upstream(None)
+        events_service.clear()
+
+    def test_fresh_hit(self):
+        query = events_service.build_query()
+        self.assertEqual(events_service.get_events(query)[1], events_service.MISS)
+        data, status = events_service.get_events(events_service.build_query())
+        self.assertEqual(status, events_service.FRESH)
+        self.assertEqual(self.upstream.calls, 1)
+
+    def test_query_is_normalized(self):
+        events_service.get_events(events_service.build_query({'radius': '100', 'ignored': 'x'}))
+        events_service.get_events(events_service.build_query({'radius': 100}))
+        self.assertEqual(self.upstream.calls, 1)
+        data, _ = events_service.get_events(events_service.build_query({'postalcode': '3121'}))
+        self.assertEqual((data['postalcode'], self.upstream.calls), ('3121', 2))
+        with self.assertRaises(ValueError):
+            events_service.build_query({'size': 'many'})
+
+    def test_overrides_are_bounded(self):
+        for overrides in ({'size': 1000}, {'radius': 0}, {'radius': 20000}, {'postalcode': '30001'}, {'postalcode': 'abc'}):
+            with self.assertRaises(ValueError):
+                events_service.build_query(overrides)
+        query = events_service.build_query({'size': '10', 'radius': '5', 'postalcode': '3121'})
+        self.assertEqual((query['size'], query['radius'], query['postalcode']), (10, 5, '3121'))
+
+    @patch.object(events_service, 'EVENTS_FRESH_SECONDS', 0)
+    def test_stale_served_while_refreshing(self):
+        query = events_service.build_query()
+        first, _ = events_service.get_events(query)
+        self.upstream.release.clear()
+        data, status = events_service.get_events(query)
+        self.assertEqual((data, status), (first, events_service.STALE))
+        # Further stale hits don't start another refresh
+        events_service.get_events(query)
+        refresh = next(iter(events_service._inflight.values()))
+        self.upstream.release.set()
+        refresh.result(5)
+        self.assertEqual(self.upstream.calls, 2)
+
+    def test_single_flight(self):
+        query = events_service.build_query()
+        self.upstream.release.clear()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(events_service.get_events(query))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        self.upstream.release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(self.upstream.calls, 1)
+        self.assertEqual(len(results), 5)
+
+    @patch.object(events_service, 'EVENTS_FRESH_SECONDS', 0)
+    @patch.object(events_service, 'EVENTS_STALE_SECONDS', 0)
+    def test_old_copy_served_when_upstream_fails(self):
+        query = events_service.build_query()
+        first, _ = events_service.get_events(query)
+        self.upstream.fail = True
+        self.assertEqual(events_service.get_events(query), (first, events_service.STALE))
+        events_service.clear()
+        with self.assertRaises(RuntimeError):
+            events_service.get_events(query)
+
+if __name__ == '__main__':
+    unittest.main()
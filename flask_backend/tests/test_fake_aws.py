@@ -0,0 +1,43 @@
+import unittest
+import os
+import sys
+
+# Add the parent directory to sys.path to import the services
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from botocore.exceptions import ClientError
+from services import aws_clients, rekognition_service
+from services.fake_aws import install_fake_clients
+
+class TestFakeAwsClients(unittest.TestCase):
+    def setUp(self):
+        self.s3, self.rekognition = install_fake_clients()
+
+    def tearDown(self):
+        aws_clients.reset_clients()
+
+    def test_fakes_are_installed(self):
+        self.assertIs(aws_clients.get_s3_client(), self.s3)
+        self.assertIs(aws_clients.get_rekognition_client(), self.rekognition)
+
+    def test_clean_image(self):
+        self.assertTrue(rekognition_service.moderate_image_s3('bucket', 'uploads/ok.jpg'))
+        self.assertEqual(self.rekognition.calls, ['uploads/ok.jpg'])
+
+    def test_flagged_image(self):
+        self.rekognition.flag('uploads/bad.jpg')
+        self.assertFalse(rekognition_service.moderate_image_s3('bucket', 'uploads/bad.jpg'))
+
+    def test_min_confidence(self):
+        self.rekognition.flag('uploads/unsure.jpg', confidence=60.0)
+        self.assertTrue(rekognition_service.moderate_image_s3('bucket', 'uploads/unsure.jpg'))
+        self.assertFalse(rekognition_service.moderate_image_s3('bucket', 'uploads/unsure.jpg', min_confidence=50))
+
+    def test_s3_objects(self):
+        self.s3.put_object(Bucket='bucket', Key='uploads/a.jpg', Body=b'jpeg')
+        self.assertEqual(self.s3.head_object(Bucket='bucket', Key='uploads/a.jpg')['ContentLength'], 4)
+        self.s3.delete_object(Bucket='bucket', Key='uploads/a.jpg')
+        with self.assertRaises(ClientError):
+            self.s3.head_object(Bucket='bucket', Key='uploads/a.jpg')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+import os
+import sys
+
+# Add the parent directory to sys.path to import geo_service
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services import geo_service
+
+class TestBuildGeoFilter(unittest.TestCase):
+    def test_no_params(self):
+        self.assertIsNone(geo_service.build_geo_filter({}))
+
+    def test_bbox(self):
+        geo_filter = geo_service.build_geo_filter({'bbox': '144.9,-37.9,145.0,-37.8'})
+        polygon = geo_filter[geo_service.GEO_FIELD]['$geoWithin']['$geometry']
+        self.assertEqual(polygon['type'], 'Polygon')
+        ring = polygon['coordinates'][0]
+        self.assertEqual(ring[0], ring[-1])
+        self.assertIn([145.0, -37.8], ring)
+
+    def test_radius(self):
+        geo_filter = geo_service.build_geo_filter({'lat': '-37.8', 'lon': '144.9', 'radius_m': '500'})
+        center, radius = geo_filter[geo_service.GEO_FIELD]['$geoWithin']['$centerSphere']
+        self.assertEqual(center, [144.9, -37.8])
+        self.assertAlmostEqual(radius, 500 / geo_service.EARTH_RADIUS_M)
+
+    def test_invalid_bbox(self):
+        with self.assertRaises(ValueError):
+            geo_service.build_geo_filter({'bbox': '145.0,-37.8,144.9,-37.9'})
+        with self.assertRaises(ValueError):
+            geo_service.build_geo_filter({'bbox': '1,2,3'})
+
+    def test_incomplete_radius(self):
+        with self.assertRaises(ValueError):
+            geo_service.build_geo_filter({'lat': '-37.8', 'lon': '144.9'})
+
+    def test_bbox_and_radius_conflict(self):
+        with self.assertRaises(ValueError):
+            geo_service.build_geo_filter({'bbox': '144.9,-37.9,145.0,-37.8', 'radius_m': '10'})
+
+if __name__ == '__main__':
+    unittest.main()
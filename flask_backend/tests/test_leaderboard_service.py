@@ -0,0 +1,72 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fake_mongo import fake_client
+from services import db_service, leaderboard_service
+from services.leaderboard_service import (
+    LEADERBOARD_COLLECTION, UPLOAD_POINTS, VOTE_POINTS, get_top, get_user_rank, rebuild_leaderboard,
+    record_upload_approvals, record_vote
+)
+
+
+class TestLeaderboard(unittest.TestCase):
+    def setUp(self):
+        db_service.set_client(fake_client())
+        self.leaderboard = db_service.get_collection(LEADERBOARD_COLLECTION)
+
+    def tearDown(self):
+        db_service.set_client(None)
+
+    def entry(self, username):
+        doc = self.leaderboard.find_one({'_id': username})
+        return doc['points'], doc['vote_count'], doc['approved_uploads']
+
+    def test_record_vote(self):
+        record_vote('alice')
+        record_vote('alice')
+        record_vote(None)
+        self.assertEqual(self.entry('alice'), (2 * VOTE_POINTS, 2, 0))
+        self.assertEqual(self.leaderboard.count_documents({}), 1)
+
+    def test_record_upload_approvals(self):
+        record_vote('bob')
+        record_upload_approvals({'alice': 2, 'bob': 1, None: 1, 'carol': 0})
+        record_upload_approvals({'alice': -1})
+        self.assertEqual(self.entry('alice'), (UPLOAD_POINTS, 0, 1))
+        self.assertEqual(self.entry('bob'), (VOTE_POINTS + UPLOAD_POINTS, 1, 1))
+        self.assertIsNone(self.leaderboard.find_one({'_id': 'carol'}))
+
+    def test_rank(self):
+        record_upload_approvals({'alice': 1, 'bob': 1})
+        record_vote('carol')
+        self.assertEqual([entry['username'] for entry in get_top()], ['alice', 'bob', 'carol'])
+        # Ties are ordered by username
+        self.assertEqual(get_user_rank('bob')['rank'], 2)
+        self.assertEqual(get_user_rank('carol')['rank'], 3)
+        self.assertIsNone(get_user_rank('nobody'))
+
+    # mongomock has no $unionWith, so the upload counts use the Python loop
+    @patch.object(leaderboard_service, 'UPLOAD_STATS_MODE', 'python')
+    def test_rebuild(self):
+        # Drifted counters are replaced by what the votes and images say
+        record_upload_approvals({'alice': 7, 'ghost': 1})
+        db_service.get_collection('votes').insert_many([
+            {'username': 'alice', 'image_url': 'a'},
+            {'username': 'bob', 'image_url': 'a'},
+            {'username': None, 'image_url': 'b'},
+        ])
+        db_service.get_collection('toilets-victoria').insert_one({'Images': [
+            {'username': 'alice', 'approved_status': True},
+            {'username': 'bob', 'approved_status': False},
+        ]})
+        self.assertEqual(rebuild_leaderboard(), 2)
+        self.assertEqual(self.entry('alice'), (VOTE_POINTS + UPLOAD_POINTS, 1, 1))
+        self.assertEqual(self.entry('bob'), (VOTE_POINTS, 1, 0))
+        self.assertIsNone(self.leaderboard.find_one({'_id': 'ghost'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fake_mongo import fake_client
+from flask import Flask
+from services import cache_service, db_service
+from services.cache_service import bump_version
+from services.sync_service import SEQ_FIELD, reserve_sequence
+from routes.location_routes import location_bp
+
+
+class TestLocationsSince(unittest.TestCase):
+    def setUp(self):
+        db_service.set_client(fake_client())
+        app = Flask(__name__)
+        app.register_blueprint(location_bp)
+        self.client = app.test_client()
+
+    def tearDown(self):
+        db_service.set_client(None)
+
+    def test_since_with_several_types_is_rejected(self):
+        response = self.client.get('/locations?types=toilet,train&since=5')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('single type', response.get_json()['error'])
+
+    def test_since_with_one_type(self):
+        response = self.client.get('/locations?types=toilet&since=0')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('cursor', response.get_json()['toilet'])
+
+
+class TestCachedLocations(unittest.TestCase):
+    def setUp(self):
+        db_service.set_client(fake_client())
+        cache_service.clear()
+        app = Flask(__name__)
+        app.register_blueprint(location_bp)
+        self.client = app.test_client()
+        self.toilets = db_service.get_collection('toilets-victoria')
+        self.toilets.insert_one({'Tags': {'name': 'Loo'}, 'Images': []})
+
+    def tearDown(self):
+        db_service.set_client(None)
+        cache_service.clear()
+
+    def images(self):
+        return self.client.get('/toilet-location-points').get_json()[0]['Images']
+
+    def test_read_during_write_is_not_served_afterwards(self):
+        with reserve_sequence('toilets-victoria') as seq:
+            # Cached under the reserved version before the write lands
+            self.assertEqual(self.images(), [])
+            self.toilets.update_one({}, {'$push': {'Images': {'image_url': 'u'}}, '$set': {SEQ_FIELD: seq}})
+        self.assertEqual(self.images(), [{'image_url': 'u'}])
+
+    def test_matching_etag_is_not_modified(self):
+        first = self.client.get('/toilet-location-points')
+        self.assertTrue(first.headers['ETag'].startswith('W/'))
+        response = self.client.get('/toilet-location-points', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual((response.status_code, response.data), (304, b''))
+        # The gzipped body carries the same weak ETag
+        gzipped = self.client.get('/toilet-location-points', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(gzipped.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzipped.headers['ETag'], first.headers['ETag'])
+
+    def test_bump_version_invalidates(self):
+        etag = self.client.get('/toilet-location-points').headers['ETag']
+        self.toilets.update_one({}, {'$push': {'Images': {'image_url': 'u'}}})
+        # Served from the cache until the write path bumps the version
+        self.assertEqual(self.images(), [])
+        bump_version('toilets-victoria')
+        response = self.client.get('/toilet-location-points', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()[0]['Images'], [{'image_url': 'u'}])
+
+    def test_cache_is_bounded_by_bytes(self):
+        size = len(self.client.get('/toilet-location-points').data)
+        entry_size = next(iter(cache_service._responses.values())).size
+        self.assertGreater(entry_size, size)
+        with patch.object(cache_service, 'RESPONSE_CACHE_MAX_BYTES', entry_size * 2):
+            # Unknown parameters don't change the body but are cached separately
+            for n in range(4):
+                self.client.get(f'/toilet-location-points?v={n}')
+            self.assertLessEqual(cache_service._cached_bytes, entry_size * 2)
+            self.assertLessEqual(len(cache_service._responses), 2)
+
+
+class TestRemoveCommand(unittest.TestCase):
+    def setUp(self):
+        db_service.set_client(fake_client())
+        app = Flask(__name__)
+        app.register_blueprint(location_bp)
+        self.runner = app.test_cli_runner()
+
+    def tearDown(self):
+        db_service.set_client(None)
+
+    def test_invalid_arguments(self):
+        for args, message in ((['boats', '0' * 24], 'Invalid accessibility type'), (['toilet', 'nope'], 'not a valid location id')):
+            result = self.runner.invoke(args=['locations', 'remove'] + args)
+            self.assertEqual(result.exit_code, 2)
+            self.assertIn(message, result.output)
+
+    def test_missing_location(self):
+        result = self.runner.invoke(args=['locations', 'remove', 'toilet', '0' * 24])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('No location', result.output)
+
+
+if __name__ == '__main__':
+    unittest.main()
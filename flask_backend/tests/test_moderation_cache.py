@@ -0,0 +1,61 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+
+# Add the parent directory to sys.path to import the services
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services import aws_clients, moderation_cache, rekognition_service
+from services.fake_aws import install_fake_clients
+
+class TestModerationCache(unittest.TestCase):
+    def setUp(self):
+        moderation_cache.clear()
+        self.s3, self.rekognition = install_fake_clients()
+
+    def tearDown(self):
+        aws_clients.reset_clients()
+        moderation_cache.clear()
+
+    def moderate(self, key, body, min_confidence=80):
+        self.s3.put_object(Bucket='bucket', Key=key, Body=body)
+        etag = self.s3.head_object(Bucket='bucket', Key=key)['ETag']
+        return rekognition_service.moderate_image_s3('bucket', key, min_confidence, etag=etag)
+
+    def test_reupload_uses_cached_verdict(self):
+        self.rekognition.flag('uploads/1_photo.jpg')
+        self.assertFalse(self.moderate('uploads/1_photo.jpg', b'same photo'))
+        self.assertFalse(self.moderate('uploads/2_photo.jpg', b'same photo'))
+        self.assertEqual(self.rekognition.calls, ['uploads/1_photo.jpg'])
+        stats = moderation_cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (1, 1, 1))
+
+    def test_min_confidence_is_part_of_the_key(self):
+        self.moderate('uploads/a.jpg', b'photo', min_confidence=80)
+        self.moderate('uploads/a.jpg', b'photo', min_confidence=50)
+        self.assertEqual(len(self.rekognition.calls), 2)
+
+    def test_without_etag_is_not_cached(self):
+        rekognition_service.moderate_image_s3('bucket', 'uploads/a.jpg')
+        rekognition_service.moderate_image_s3('bucket', 'uploads/a.jpg')
+        self.assertEqual(len(self.rekognition.calls), 2)
+        self.assertEqual(moderation_cache.get_stats()['entries'], 0)
+
+    @patch.object(moderation_cache, 'MODERATION_CACHE_MAX_ENTRIES', 2)
+    def test_least_recently_used_is_evicted(self):
+        moderation_cache.store_result('"a"', 80, True)
+        moderation_cache.store_result('"b"', 80, True)
+        self.assertTrue(moderation_cache.get_result('"a"', 80))
+        moderation_cache.store_result('"c"', 80, False)
+        self.assertIsNone(moderation_cache.get_result('"b"', 80))
+        self.assertTrue(moderation_cache.get_result('"a"', 80))
+        self.assertFalse(moderation_cache.get_result('"c"', 80))
+
+    @patch.object(moderation_cache, 'MODERATION_CACHE_TTL_SECONDS', 0)
+    def test_expired_entries_miss(self):
+        moderation_cache.store_result('"a"', 80, True)
+        self.assertIsNone(moderation_cache.get_result('"a"', 80))
+        self.assertEqual(moderation_cache.get_stats()['entries'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+import unittest
+from unittest.mock import patch
+from datetime import datetime, timedelta
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fake_mongo import fake_client
+from services import aws_clients, db_service, moderation_cache, moderation_queue
+from services.fake_aws import install_fake_clients
+from services.moderation_service import ModerationError, moderate_upload
+from services.upload_index_service import PENDING, UPLOADS_COLLECTION
+
+BUCKET = 'bucket'
+
+
+class PipelineTestCase(unittest.TestCase):
+    def setUp(self):
+        db_service.set_client(fake_client())
+        self.s3, self.rekognition = install_fake_clients()
+        moderation_cache.clear()
+        self.locations = db_service.get_collection('toilets-victoria')
+        self.location_id = str(self.locations.insert_one({'Tags': {'name': 'Loo'}, 'Images': []}).inserted_id)
+
+    def tearDown(self):
+        aws_clients.reset_clients()
+        db_service.set_client(None)
+
+    def upload(self, key, body=None, **fields):
+        self.s3.put_object(Bucket=BUCKET, Key=key, Body=body or key.encode())
+        return {
+            'bucket_name': BUCKET,
+            's3_key': key,
+            'public_url': f'https://{BUCKET}.s3.amazonaws.com/{key}',
+            'accessibility_type': 'toilet',
+            'location_id': self.location_id,
+            'device_id': 'd1',
+            'username': 'alice',
+            **fields
+        }
+
+    def images(self):
+        return self.locations.find_one()['Images']
+
+
+class TestModerateUpload(PipelineTestCase):
+    def test_clean_image_is_added_once(self):
+        payload = self.upload('uploads/ok.jpg')
+        self.assertTrue(moderate_upload(payload)['is_clean'])
+        # A retried job finds the image it pushed before
+        self.assertTrue(moderate_upload(payload)['is_clean'])
+
+        images = self.images()
+        self.assertEqual(len(images), 1)
+        self.assertEqual(images[0]['s3_key'], 'uploads/ok.jpg')
+        self.assertFalse(images[0]['approved_status'])
+        self.assertTrue(images[0]['image_id'])
+        upload = db_service.get_collection(UPLOADS_COLLECTION).find_one()
+        self.assertEqual((upload['image_id'], upload['approval_state']), (images[0]['image_id'], PENDING))
+
+    def test_uploads_are_told_apart_by_key(self):
+        moderate_upload(self.upload('uploads/a.jpg'))
+        moderate_upload(self.upload('uploads/b.jpg'))
+        self.assertEqual([image['s3_key'] for image in self.images()], ['uploads/a.jpg', 'uploads/b.jpg'])
+
+    def test_flagged_image_is_deleted(self):
+        payload = self.upload('uploads/bad.jpg')
+        self.rekognition.flag('uploads/bad.jpg')
+        self.assertFalse(moderate_upload(payload)['is_clean'])
+        self.assertNotIn((BUCKET, 'uploads/bad.jpg'), self.s3.objects)
+        self.assertEqual(self.images(), [])
+
+    def test_permanent_failures(self):
+        missing_object = dict(self.upload('uploads/ok.jpg'), s3_key='uploads/missing.jpg')
+        no_public_url = dict(self.upload('uploads/ok.jpg'), public_url=None)
+        unknown_location = self.upload('uploads/ok.jpg', location_id='0' * 24)
+        for payload in (missing_object, no_public_url, unknown_location):
+            with self.assertRaises(ModerationError):
+                moderate_upload(payload)
+        self.assertEqual(self.images(), [])
+
+
+@patch.object(moderation_queue.workers, 'size', 0)
+class TestModerationQueue(PipelineTestCase):
+    def job(self, job_id):
+        return moderation_queue.get_job(job_id)
+
+    def expire_lease(self, job_id):
+        db_service.get_collection(moderation_queue.MODERATION_JOBS_COLLECTION).update_one(
+            {'_id': job_id}, {'$set': {'lease_expires_at': datetime.utcnow() - timedelta(seconds=1)}}
+        )
+
+    def test_jobs_run_to_completion(self):
+        clean = moderation_queue.enqueue(self.upload('uploads/ok.jpg'))
+        self.rekognition.flag('uploads/bad.jpg')
+        flagged = moderation_queue.enqueue(self.upload('uploads/bad.jpg'))
+        self.assertEqual(moderation_queue.process_available_jobs(), 2)
+        self.assertEqual(self.job(clean['_id'])['status'], moderation_queue.DONE)
+        self.assertEqual(self.job(flagged['_id'])['status'], moderation_queue.REJECTED)
+
+    def test_claim_and_lease_expiry(self):
+        job = moderation_queue.enqueue(self.upload('uploads/ok.jpg'))
+        claimed = moderation_queue.claim_job()
+        self.assertEqual((claimed['_id'], claimed['status'], claimed['attempts']), (job['_id'], moderation_queue.RUNNING, 1))
+        self.assertIsNone(moderation_queue.claim_job())
+
+        # The first worker died; its job goes to the next one
+        self.expire_lease(job['_id'])
+        reclaimed = moderation_queue.claim_job()
+        self.assertEqual((reclaimed['_id'], reclaimed['attempts']), (job['_id'], 2))
+
+        # The first worker's late result is ignored
+        moderation_queue.run_job(claimed)
+        self.assertEqual(self.job(job['_id'])['status'], moderation_queue.RUNNING)
+        moderation_queue.run_job(reclaimed)
+        self.assertEqual(self.job(job['_id'])['status'], moderation_queue.DONE)
+
+    def test_transient_error_is_retried_with_backoff(self):
+        job = moderation_queue.enqueue(self.upload('uploads/ok.jpg'))
+        with patch('services.moderation_queue.moderate_upload', side_effect=Exception('throttled')):
+            moderation_queue.run_job(moderation_queue.claim_job())
+        stored = self.job(job['_id'])
+        self.assertEqual((stored['status'], stored['error']), (moderation_queue.QUEUED, 'throttled'))
+        self.assertGreater(stored['available_at'], datetime.utcnow())
+        # Not due yet
+        self.assertIsNone(moderation_queue.claim_job())
+
+    def test_retry_delay_grows(self):
+        with patch.object(moderation_queue, 'RETRY_MAX_SECONDS', 1000):
+            for attempts in range(1, 5):
+                delay = moderation_queue.retry_delay(attempts)
+                full = moderation_queue.RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+                self.assertTrue(full / 2 <= delay <= full)
+
+    def test_gives_up_after_max_attempts(self):
+        job = moderation_queue.enqueue(self.upload('uploads/ok.jpg'))
+        jobs = db_service.get_collection(moderation_queue.MODERATION_JOBS_COLLECTION)
+        jobs.update_one({'_id': job['_id']}, {'$set': {'max_attempts': 2}})
+        with patch('services.moderation_queue.moderate_upload', side_effect=Exception('throttled')):
+            for _ in range(2):
+                jobs.update_one({'_id': job['_id']}, {'$set': {'available_at': datetime.utcnow()}})
+                moderation_queue.run_job(moderation_queue.claim_job())
+        self.assertEqual(self.job(job['_id'])['status'], moderation_queue.FAILED)
+
+    def test_permanent_failure_is_not_retried(self):
+        job = moderation_queue.enqueue(dict(self.upload('uploads/ok.jpg'), s3_key='uploads/missing.jpg'))
+        moderation_queue.process_available_jobs()
+        stored = self.job(job['_id'])
+        self.assertEqual((stored['status'], stored['attempts']), (moderation_queue.FAILED, 1))
+        self.assertIn('File not found', stored['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,9 +6,17 @@ import sys
 # Add the parent directory to sys.path to import rekognition_service
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from services import rekognition_service
+from services import aws_clients
 
 class TestModerateImageS3(unittest.TestCase):
-    @patch('services.rekognition_service.boto3.client')
+    def setUp(self):
+        # Clients are cached per process; start every test without one
+        aws_clients.reset_clients()
+
+    def tearDown(self):
+        aws_clients.reset_clients()
+
+    @patch('services.aws_clients.boto3.client')
     def test_image_is_clean(self, mock_boto_client):
         mock_rekognition = MagicMock()
         mock_rekognition.detect_moderation_labels.return_value = {'ModerationLabels': []}
@@ -16,7 +24,7 @@ class TestModerateImageS3(unittest.TestCase):
         is_clean = rekognition_service.moderate_image_s3('bucket', 'key')
         self.assertTrue(is_clean)
 
-    @patch('services.rekognition_service.boto3.client')
+    @patch('services.aws_clients.boto3.client')
     def test_image_is_not_clean(self, mock_boto_client):
         mock_rekognition = MagicMock()
         mock_rekognition.detect_moderation_labels.return_value = {
@@ -26,7 +34,7 @@ class TestModerateImageS3(unittest.TestCase):
         is_clean = rekognition_service.moderate_image_s3('bucket', 'key')
         self.assertFalse(is_clean)
 
-    @patch('services.rekognition_service.boto3.client')
+    @patch('services.aws_clients.boto3.client')
     def test_aws_error(self, mock_boto_client):
         mock_rekognition = MagicMock()
         mock_rekognition.detect_moderation_labels.side_effect = Exception('AWS error')
@@ -35,6 +43,20 @@ class TestModerateImageS3(unittest.TestCase):
         with self.assertRaises(Exception):
             rekognition_service.moderate_image_s3('bucket', 'key')
 
+    @patch('services.aws_clients.boto3.client')
+    def test_client_is_reused(self, mock_boto_client):
+        mock_boto_client.return_value.detect_moderation_labels.return_value = {'ModerationLabels': []}
+        rekognition_service.moderate_image_s3('bucket', 'key')
+        rekognition_service.moderate_image_s3('bucket', 'other-key')
+        mock_boto_client.assert_called_once()
+
+    def test_injected_client(self):
+        fake_rekognition = MagicMock()
+        fake_rekognition.detect_moderation_labels.return_value = {'ModerationLabels': []}
+        aws_clients.set_client('rekognition', fake_rekognition)
+        self.assertTrue(rekognition_service.moderate_image_s3('bucket', 'key'))
+        fake_rekognition.detect_moderation_labels.assert_called_once()
+
     @patch.dict(os.environ, {}, clear=True)
     def test_missing_env_vars(self):
         # The original function does not check for missing env vars, but if you add that, this will test it
@@ -0,0 +1,54 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fake_mongo import fake_client
+from flask import Flask
+from services import db_service
+from services.report_service import HOTSPOTS_COLLECTION, MAX_ISSUE_TYPE_LENGTH, REPORTS_COLLECTION
+from routes.report_routes import report_bp
+
+
+@patch('services.report_service.REPORT_WRITE_MODE', 'sync')
+class TestReportIssue(unittest.TestCase):
+    def setUp(self):
+        db_service.set_client(fake_client())
+        app = Flask(__name__)
+        app.register_blueprint(report_bp)
+        self.client = app.test_client()
+
+    def tearDown(self):
+        db_service.set_client(None)
+
+    def report(self, **fields):
+        return {'issue_type': 'Toilet', 'issues': ['Blocked'], 'latitude': -37.81, 'longitude': 144.96, **fields}
+
+    def test_report_is_stored_and_counted(self):
+        response = self.client.post('/report-issue', json=self.report(issue_type=' Toilet '))
+        self.assertEqual(response.status_code, 201)
+        report = db_service.get_collection(REPORTS_COLLECTION).find_one()
+        self.assertEqual(report['issue_type'], 'Toilet')
+        self.assertEqual(db_service.get_collection(HOTSPOTS_COLLECTION).find_one()['count'], 1)
+
+    def test_server_fields_are_not_taken_from_the_client(self):
+        response = self.client.post('/report-issue', json={
+            'issue_type': 'Toilet', 'location': 'Flinders St', 'timestamp': 'yesterday', '_id': 'mine'
+        })
+        self.assertEqual(response.status_code, 201)
+        report = db_service.get_collection(REPORTS_COLLECTION).find_one()
+        self.assertNotIn('location', report)
+        self.assertEqual(str(report['_id']), response.get_json()['report_id'])
+        self.assertNotEqual(report['timestamp'], 'yesterday')
+        self.assertEqual(db_service.get_collection(HOTSPOTS_COLLECTION).count_documents({}), 0)
+
+    def test_invalid_issue_type(self):
+        for issue_type in (None, '', '  ', ['Toilet'], {'a': 1}, 5, 'x' * (MAX_ISSUE_TYPE_LENGTH + 1)):
+            response = self.client.post('/report-issue', json=self.report(issue_type=issue_type))
+            self.assertEqual(response.status_code, 400, issue_type)
+        self.assertEqual(db_service.get_collection(REPORTS_COLLECTION).count_documents({}), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
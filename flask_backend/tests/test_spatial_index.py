@@ -0,0 +1,46 @@
+import unittest
+import random
+import os
+import sys
+
+# Add the parent directory to sys.path to import spatial_index
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.spatial_index import KDTree, project, haversine_m
+
+class TestKDTree(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(42)
+        self.points = [(rng.uniform(0, 1000), rng.uniform(0, 1000)) for _ in range(500)]
+        self.tree = KDTree(self.points)
+
+    def brute_force(self, x, y, k):
+        dists = sorted(((px - x) ** 2 + (py - y) ** 2, i) for i, (px, py) in enumerate(self.points))
+        return dists[:k]
+
+    def test_matches_brute_force(self):
+        rng = random.Random(7)
+        for _ in range(50):
+            x, y = rng.uniform(-100, 1100), rng.uniform(-100, 1100)
+            for k in (1, 5, 20):
+                self.assertEqual(self.tree.nearest(x, y, k), self.brute_force(x, y, k))
+
+    def test_k_larger_than_tree(self):
+        tree = KDTree([(0, 0), (1, 1)])
+        self.assertEqual([i for _, i in tree.nearest(0, 0, 10)], [0, 1])
+
+    def test_empty_tree(self):
+        self.assertEqual(KDTree([]).nearest(0, 0, 3), [])
+
+class TestDistances(unittest.TestCase):
+    def test_projection_close_to_haversine(self):
+        # Flinders Street Station to Southern Cross Station, roughly 1.2km apart
+        a = (-37.8183, 144.9671)
+        b = (-37.8184, 144.9526)
+        ax, ay = project(*a)
+        bx, by = project(*b)
+        planar = ((ax - bx) ** 2 + (ay - by) ** 2) ** 0.5
+        great_circle = haversine_m(*a, *b)
+        self.assertAlmostEqual(planar, great_circle, delta=great_circle * 0.02)
+
+if __name__ == '__main__':
+    unittest.main()
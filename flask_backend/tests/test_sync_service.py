@@ -0,0 +1,76 @@
+import unittest
+from datetime import datetime, timedelta
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fake_mongo import fake_client
+from services import db_service
+from services.sync_service import (
+    RESERVATIONS_COLLECTION, RESERVATION_TIMEOUT_SECONDS, SEQ_FIELD, committed_sequence, get_changes,
+    remove_location, reserve_sequence
+)
+
+COLLECTION = 'trams-victoria'
+
+
+class TestDeltaSync(unittest.TestCase):
+    def setUp(self):
+        db_service.set_client(fake_client())
+        self.collection = db_service.get_collection(COLLECTION)
+
+    def tearDown(self):
+        db_service.set_client(None)
+
+    def write(self, name):
+        with reserve_sequence(COLLECTION) as seq:
+            return self.collection.insert_one({'name': name, SEQ_FIELD: seq}).inserted_id
+
+    def names(self, changes):
+        return sorted(doc['name'] for doc in changes['updated'])
+
+    def test_cursor_does_not_resend(self):
+        self.write('a')
+        self.write('b')
+        changes = get_changes(self.collection, 0)
+        self.assertEqual(self.names(changes), ['a', 'b'])
+        # Each write bumps the version when it reserves and again when it is done
+        self.assertEqual(changes['cursor'], 4)
+        self.assertEqual(get_changes(self.collection, changes['cursor'])['updated'], [])
+
+        self.write('c')
+        changes = get_changes(self.collection, changes['cursor'])
+        self.assertEqual(self.names(changes), ['c'])
+
+    def test_write_in_progress_holds_cursor_back(self):
+        self.write('a')
+        with reserve_sequence(COLLECTION) as slow_seq:
+            # A later write lands first while the slow one is still in progress
+            self.write('b')
+            changes = get_changes(self.collection, 0)
+            self.assertEqual(changes['cursor'], 2)
+            self.collection.insert_one({'name': 'slow', SEQ_FIELD: slow_seq})
+        changes = get_changes(self.collection, changes['cursor'])
+        self.assertEqual(self.names(changes), ['b', 'slow'])
+        self.assertEqual(changes['cursor'], 6)
+
+    def test_abandoned_reservation_expires(self):
+        self.write('a')
+        db_service.get_collection(RESERVATIONS_COLLECTION).insert_one({
+            'collection': COLLECTION,
+            'floor': 0,
+            'reserved_at': datetime.utcnow() - timedelta(seconds=RESERVATION_TIMEOUT_SECONDS + 1)
+        })
+        self.assertEqual(committed_sequence(COLLECTION), 2)
+
+    def test_removed_locations(self):
+        location_id = self.write('a')
+        cursor = get_changes(self.collection, 0)['cursor']
+        self.assertTrue(remove_location(COLLECTION, str(location_id)))
+        changes = get_changes(self.collection, cursor)
+        self.assertEqual(changes['removed'], [str(location_id)])
+        self.assertEqual(db_service.get_collection(RESERVATIONS_COLLECTION).count_documents({}), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fake_mongo import fake_client
+from services import db_service
+from services.upload_index_service import UPLOADS_COLLECTION, find_device_uploads
+
+
+class TestFindDeviceUploads(unittest.TestCase):
+    def setUp(self):
+        db_service.set_client(fake_client())
+        # Legacy uploads have no upload time
+        db_service.get_collection(UPLOADS_COLLECTION).insert_many([
+            {'device_id': 'd1', 'image_url': f'u{i}', 'uploaded_at': uploaded_at}
+            for i, uploaded_at in enumerate(['2024-01-03', None, '2024-01-01', None, '2024-01-02'])
+        ])
+
+    def tearDown(self):
+        db_service.set_client(None)
+
+    def test_pages_include_uploads_without_time(self):
+        urls, cursor = [], None
+        while True:
+            page, cursor = find_device_uploads('d1', 2, cursor)
+            urls += [upload['image_url'] for upload in page]
+            if not cursor:
+                break
+        self.assertEqual(urls, ['u0', 'u4', 'u2', 'u3', 'u1'])
+        self.assertEqual(urls, [upload['image_url'] for upload in find_device_uploads('d1')])
+
+
+if __name__ == '__main__':
+    unittest.main()
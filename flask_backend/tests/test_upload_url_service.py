@@ -0,0 +1,58 @@
+import unittest
+from unittest.mock import patch
+import base64
+import json
+import os
+import sys
+
+# Add the parent directory to sys.path to import the services
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import boto3
+from services import upload_url_service
+
+class TestSignUpload(unittest.TestCase):
+    def setUp(self):
+        # Signing is done locally, so dummy credentials are enough
+        self.s3 = boto3.client(
+            's3', region_name='ap-southeast-2',
+            aws_access_key_id='test-key', aws_secret_access_key='test-secret'
+        )
+
+    def test_presigned_put(self):
+        upload = upload_url_service.sign_upload(self.s3, 'bucket', 'ap-southeast-2', 'uploads/a.jpg', 'image/jpeg')
+        self.assertIn('uploads/a.jpg', upload['upload_url'])
+        self.assertIn('Signature', upload['upload_url'])
+        self.assertEqual(upload['public_url'], 'https://bucket.s3.ap-southeast-2.amazonaws.com/uploads/a.jpg')
+        self.assertNotIn('fields', upload)
+
+    def test_presigned_post_limits_size_and_type(self):
+        upload = upload_url_service.sign_upload(
+            self.s3, 'bucket', 'ap-southeast-2', 'uploads/a.png', 'image/png', method='post'
+        )
+        self.assertEqual(upload['fields']['key'], 'uploads/a.png')
+        self.assertEqual(upload['fields']['Content-Type'], 'image/png')
+        policy = json.loads(base64.b64decode(upload['fields']['policy']))
+        self.assertIn({'Content-Type': 'image/png'}, policy['conditions'])
+        self.assertIn(['content-length-range', 1, upload_url_service.MAX_UPLOAD_BYTES], policy['conditions'])
+
+class TestParseUploadFiles(unittest.TestCase):
+    def test_defaults_content_type(self):
+        files = upload_url_service.parse_upload_files([{'filename': 'a.jpg'}, {'filename': 'b.png', 'content_type': 'image/png'}])
+        self.assertEqual([f['content_type'] for f in files], ['image/jpeg', 'image/png'])
+
+    def test_rejects_bad_input(self):
+        for files in (None, [], [{}], [{'filename': 'a.exe', 'content_type': 'application/x-msdownload'}]):
+            with self.assertRaises(ValueError):
+                upload_url_service.parse_upload_files(files)
+
+    @patch.object(upload_url_service, 'MAX_UPLOAD_FILES', 2)
+    def test_rejects_too_many_files(self):
+        with self.assertRaises(ValueError):
+            upload_url_service.parse_upload_files([{'filename': f'{i}.jpg'} for i in range(3)])
+
+    def test_unique_keys(self):
+        keys = {upload_url_service.upload_key('photo.jpg', unique=True) for _ in range(5)}
+        self.assertEqual(len(keys), 5)
+
+if __name__ == '__main__':
+    unittest.main()
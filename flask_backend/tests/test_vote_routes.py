@@ -0,0 +1,81 @@
+import unittest
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fake_mongo import fake_client
+from flask import Flask
+from services import db_service
+from services.vote_service import VOTES_COLLECTION
+from services.upload_index_service import APPROVED, PENDING, UPLOADS_COLLECTION
+from routes.vote_routes import vote_bp
+
+
+class TestDeviceUploads(unittest.TestCase):
+    def setUp(self):
+        db_service.set_client(fake_client())
+        app = Flask(__name__)
+        app.register_blueprint(vote_bp)
+        self.client = app.test_client()
+        db_service.get_collection(UPLOADS_COLLECTION).insert_many([
+            {'device_id': 'd1', 'username': 'a', 'approval_state': APPROVED},
+            {'device_id': 'd1', 'username': 'a', 'approval_state': APPROVED},
+            {'device_id': 'd1', 'username': 'a', 'approval_state': PENDING},
+            {'device_id': 'd2', 'username': 'b', 'approval_state': APPROVED},
+        ])
+
+    def tearDown(self):
+        db_service.set_client(None)
+
+    def test_counts_approved_uploads_of_device(self):
+        response = self.client.get('/api/uploads/device/d1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), {'device_id': 'd1', 'total_uploads': 2})
+
+    def test_unknown_device(self):
+        response = self.client.get('/api/uploads/device/nope')
+        self.assertEqual(response.get_json()['total_uploads'], 0)
+
+
+class TestVoteBatch(unittest.TestCase):
+    def setUp(self):
+        db_service.set_client(fake_client())
+        app = Flask(__name__)
+        app.register_blueprint(vote_bp)
+        self.client = app.test_client()
+
+    def tearDown(self):
+        db_service.set_client(None)
+
+    def vote(self, device_id='d', image_url='u', **fields):
+        return {'device_id': device_id, 'location_id': 'l', 'image_url': image_url, 'is_accurate': True, **fields}
+
+    def test_legacy_duplicate_votes(self):
+        # Left behind when the unique index could not be built
+        db_service.get_collection(VOTES_COLLECTION).insert_many([self.vote(), self.vote()])
+        response = self.client.post('/api/votes/batch', json=[self.vote(), self.vote(image_url='v')])
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual((body['recorded'], body['duplicates']), (1, 1))
+        self.assertEqual([result['status'] for result in body['results']], ['duplicate', 'recorded'])
+
+    def test_non_string_keys_are_rejected(self):
+        for vote in (self.vote(device_id=['d']), self.vote(image_url={'u': 1})):
+            response = self.client.post('/api/vote', json=vote)
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(db_service.get_collection(VOTES_COLLECTION).count_documents({}), 0)
+
+    def test_non_string_keys_are_invalid_in_batch(self):
+        response = self.client.post('/api/votes/batch', json=[
+            self.vote(device_id=['d']), self.vote(image_url='v'), self.vote(image_url={'u': 1})
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = response.get_json()['results']
+        self.assertEqual([result['status'] for result in results], ['invalid', 'recorded', 'invalid'])
+        self.assertIn('device_id', results[0]['error'])
+        self.assertIn('image_url', results[2]['error'])
+        self.assertEqual(db_service.get_collection(VOTES_COLLECTION).count_documents({}), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
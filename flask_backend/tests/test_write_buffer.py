@@ -0,0 +1,96 @@
+import unittest
+import threading
+import os
+import sys
+
+# Add the parent directory to sys.path to import write_buffer
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.write_buffer import BufferFull, WriteBuffer
+
+class FakeCollection:
+    """Records insert_many batches; can be made to fail a number of times."""
+
+    def __init__(self, failures=0):
+        self.batches = []
+        self.failures = failures
+        self.written = threading.Event()
+
+    def insert_many(self, docs):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError('write failed')
+        self.batches.append(list(docs))
+        self.written.set()
+
+class PoisonCollection(FakeCollection):
+    """Fails every batch that holds a document marked bad."""
+
+    def insert_many(self, docs):
+        if any(d.get('bad') for d in docs):
+            raise RuntimeError('document rejected')
+        super().insert_many(docs)
+
+class TestWriteBuffer(unittest.TestCase):
+    def test_flushes_by_size(self):
+        collection = FakeCollection()
+        buffer = WriteBuffer(collection.insert_many, batch_size=3, flush_seconds=5)
+        for i in range(3):
+            buffer.submit({'n': i})
+        self.assertTrue(collection.written.wait(2))
+        self.assertEqual(collection.batches, [[{'n': 0}, {'n': 1}, {'n': 2}]])
+        buffer.close()
+
+    def test_flushes_by_time(self):
+        collection = FakeCollection()
+        buffer = WriteBuffer(collection.insert_many, batch_size=100, flush_seconds=0.05)
+        buffer.submit({'n': 1})
+        self.assertTrue(collection.written.wait(2))
+        self.assertEqual(collection.batches, [[{'n': 1}]])
+        buffer.close()
+
+    def test_full_buffer_raises(self):
+        release = threading.Event()
+        buffer = WriteBuffer(lambda docs: release.wait(5), max_size=2, batch_size=1, flush_seconds=0.01)
+        buffer.submit({'n': 1})
+        # The flusher holds the first document while blocked on the write
+        while buffer.pending():
+            pass
+        buffer.submit({'n': 2})
+        buffer.submit({'n': 3})
+        with self.assertRaises(BufferFull):
+            buffer.submit({'n': 4})
+        release.set()
+        buffer.close()
+
+    def test_close_drains_pending(self):
+        collection = FakeCollection()
+        # Neither the batch size nor the flush interval is reached before close()
+        buffer = WriteBuffer(collection.insert_many, batch_size=10, flush_seconds=60)
+        for i in range(5):
+            buffer.submit({'n': i})
+        self.assertEqual(collection.batches, [])
+        buffer.close()
+        self.assertEqual(sorted(d['n'] for batch in collection.batches for d in batch), list(range(5)))
+        self.assertEqual(buffer.pending(), 0)
+
+    def test_failed_write_is_retried(self):
+        collection = FakeCollection(failures=1)
+        buffer = WriteBuffer(collection.insert_many, batch_size=1, flush_seconds=0.01)
+        buffer.submit({'n': 1})
+        self.assertTrue(collection.written.wait(3))
+        self.assertEqual(collection.batches, [[{'n': 1}]])
+        buffer.close()
+
+    def test_failing_document_is_dropped(self):
+        collection = PoisonCollection()
+        buffer = WriteBuffer(collection.insert_many, batch_size=4, flush_seconds=5, max_attempts=2)
+        with self.assertLogs('services.write_buffer', 'ERROR') as logs:
+            for doc in ({'n': 0}, {'n': 1, 'bad': True}, {'n': 2}, {'n': 3}):
+                buffer.submit(doc)
+            buffer.close()
+        # The rest of the batch is written and only the bad document is dropped
+        self.assertEqual(sorted(d['n'] for batch in collection.batches for d in batch), [0, 2, 3])
+        self.assertIn("'bad': True", logs.output[0])
+
+if __name__ == '__main__':
+    unittest.main()
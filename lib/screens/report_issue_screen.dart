@@ -9,7 +9,11 @@ import '../utils/pattern_painters.dart';
 import 'package:flutter/services.dart';
 
 class ReportIssueScreen extends StatefulWidget {
-  const ReportIssueScreen({super.key});
+  // Where the reported location is, when opened from a location's details
+  final double? latitude;
+  final double? longitude;
+
+  const ReportIssueScreen({super.key, this.latitude, this.longitude});
 
   @override
   ReportIssueScreenState createState() => ReportIssueScreenState();
@@ -115,6 +119,10 @@ class ReportIssueScreenState extends State<ReportIssueScreen> with SingleTickerP
             .where((entry) => entry.value)
             .map((entry) => entry.key)
             .toList(),
+        if (widget.latitude != null && widget.longitude != null) ...{
+          'latitude': widget.latitude,
+          'longitude': widget.longitude,
+        },
       };
 
       // Send report to server
@@ -290,6 +290,7 @@ class _UploadPageState extends State<UploadPage> {
       final uploadUrl = uploadData['upload_url'];
       final publicUrl = uploadData['public_url'];
       final s3Key = uploadData['s3_key'];
+      final locationId = uploadData['location_id'];
 
       // Step 2: Upload image to S3
       final file = File(_selectedImage!.path);
@@ -307,6 +308,7 @@ class _UploadPageState extends State<UploadPage> {
         headers: {'Content-Type': 'application/json'},
         body: jsonEncode({
           's3_key': s3Key,
+          'location_id': locationId,
           'public_url': publicUrl,
           'device_id': deviceId,
           'username': username,
@@ -316,7 +318,8 @@ class _UploadPageState extends State<UploadPage> {
         }),
       );
 
-      if (modResponse.statusCode == 200) {
+      // 202: moderation was queued; the image shows up once it passes and is approved
+      if (modResponse.statusCode == 200 || modResponse.statusCode == 202) {
         setState(() => _selectedImage = null);
         ScaffoldMessenger.of(context).showSnackBar(
           const SnackBar(content: Text('Image uploaded successfully! Awaiting approval.'), backgroundColor: Colors.green),
@@ -479,7 +479,10 @@ class LocationBottomSheet extends StatelessWidget {
                       onPressed: () {
                         Navigator.push(
                           context,
-                          MaterialPageRoute(builder: (_) => ReportIssueScreen()),
+                          MaterialPageRoute(builder: (_) => ReportIssueScreen(
+                            latitude: (data['Location_Lat'] as num?)?.toDouble(),
+                            longitude: (data['Location_Lon'] as num?)?.toDouble(),
+                          )),
                         );
                       },
                       icon: Icon(